@@ -0,0 +1,41 @@
+"""
+Cost of building arrays with the standard library's map.
+
+map pushes once per element, so with a push that copies its input the time
+per element grows with the array. With the persistent vector behind Array it
+should stay roughly flat as the array grows.
+
+    python benchmarks/array_push.py [--engine tree]
+"""
+
+import time
+from argparse import ArgumentParser
+
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.objects import Array, Integer
+from writing_an_interpreter.repl import ENGINES, execute_string, load_standard_library
+
+SIZES = [12_500, 25_000, 50_000, 100_000]
+
+
+def main():
+    argparse = ArgumentParser()
+    argparse.add_argument("--engine", choices=sorted(ENGINES), default="tree")
+    args = argparse.parse_args()
+
+    environment = load_standard_library(Environment(), args.engine)
+
+    print(f"{'elements':>10} {'seconds':>9} {'us/element':>11}")
+    for size in SIZES:
+        environment["xs"] = Array(elements=[Integer(i) for i in range(size)])
+
+        start = time.perf_counter()
+        result = execute_string("map(xs, fn(x) { x + 1 })", environment, args.engine)
+        seconds = time.perf_counter() - start
+
+        assert len(result.elements) == size
+        print(f"{size:>10} {seconds:>9.2f} {seconds / size * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Cost of reducing and combining arrays of integers.
+
+Arrays of integers are stored unboxed in an IntArray, so the sum, min, max,
+sort and abs builtins and the element-wise add_arrays, sub_arrays and
+mul_arrays run in C. The standard library's reduce is timed alongside for
+comparison on the smaller sizes.
+
+    python benchmarks/int_arrays.py [--engine tree]
+"""
+
+import time
+from argparse import ArgumentParser
+
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.objects import Array, Integer
+from writing_an_interpreter.repl import ENGINES, execute_string, load_standard_library
+
+SIZES = [10_000, 100_000, 1_000_000]
+PROGRAMS = [
+    "sum(xs)",
+    "min(xs)",
+    "max(xs)",
+    "sort(xs)",
+    "abs(sub_arrays(xs, ys))",
+    "mul_arrays(xs, ys)",
+]
+# reduce runs through the interpreter once per element
+REDUCE = "reduce(xs, 0, add)"
+REDUCE_LIMIT = 100_000
+
+
+def main():
+    argparse = ArgumentParser()
+    argparse.add_argument("--engine", choices=sorted(ENGINES), default="tree")
+    args = argparse.parse_args()
+
+    environment = load_standard_library(Environment(), args.engine)
+
+    print(f"{'elements':>10} {'program':>24} {'seconds':>9}")
+    for size in SIZES:
+        environment["xs"] = Array([Integer(i * 7919 % size) for i in range(size)])
+        environment["ys"] = Array([Integer(i) for i in range(size)])
+
+        programs = PROGRAMS + [REDUCE] if size <= REDUCE_LIMIT else PROGRAMS
+        for program in programs:
+            start = time.perf_counter()
+            execute_string(program, environment, args.engine)
+            seconds = time.perf_counter() - start
+            print(f"{size:>10} {program:>24} {seconds:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Throughput of the lexer and parser on large generated scripts.
+
+The source is a small program with functions, strings, arrays and hashes
+repeated until it reaches each size. Lexing is timed by pulling every token,
+and parsing includes the lexing it drives.
+
+    python benchmarks/lexer.py
+"""
+
+import time
+
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.parser import Parser
+from writing_an_interpreter.tokens import TokenType
+
+SIZES = [1_000_000, 4_000_000]
+
+SAMPLE = """
+let add = fn(first, second) {
+    # sum two values
+    let total = first + second * 2;
+    if (total > 100) { return total - 100; } else { return total; }
+};
+let words = ["alpha", "beta\\tgamma", "delta\\n"];
+let table = {"key": add(1, 2), 3: words[0], true: !false};
+puts(len(words) == 3, table["key"] != 4);
+"""
+
+
+def generate(size: int) -> str:
+    return SAMPLE * (size // len(SAMPLE) + 1)
+
+
+def main():
+    print(f"{'bytes':>10} {'tokens':>10} {'lex s':>8} {'parse s':>8} {'MB/s':>7}")
+    for size in SIZES:
+        source = generate(size)
+
+        start = time.perf_counter()
+        lexer = Lexer(source)
+        count = 1
+        while lexer.next_token().type != TokenType.EOF:
+            count += 1
+        lex_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parser = Parser(Lexer(source))
+        parser.parse_program()
+        parse_seconds = time.perf_counter() - start
+        assert not parser.errors
+
+        rate = len(source) / lex_seconds / 1e6
+        print(
+            f"{len(source):>10} {count:>10} {lex_seconds:>8.3f} "
+            f"{parse_seconds:>8.3f} {rate:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Parse time of deeply nested and very long expressions.
+
+Each shape is nested 10,000 deep, past Python's recursion limit, and the
+chains join 1,000,000 terms with an operator. Parsing includes the lexing
+it drives.
+
+    python benchmarks/nesting.py
+"""
+
+import time
+
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.parser import Parser
+
+DEPTH = 10_000
+TERMS = 1_000_000
+
+SOURCES = {
+    "parentheses": "(" * DEPTH + "1" + ")" * DEPTH,
+    "prefix": "-" * DEPTH + "1",
+    "right nested sum": "1 + (" * DEPTH + "1" + ")" * DEPTH,
+    "arrays": "[" * DEPTH + "]" * DEPTH,
+    "calls": "f(" * DEPTH + "1" + ")" * DEPTH,
+    "indexes": "a" + "[0]" * DEPTH,
+    "hashes": '{"a": ' * DEPTH + "1" + "}" * DEPTH,
+    "functions": "fn() { " * DEPTH + "1" + " }" * DEPTH,
+    "ifs": "if (x) { " * DEPTH + "1" + " }" * DEPTH,
+    "sum chain": " + ".join(["x"] * TERMS),
+    "mixed chain": " * ".join(["x + y"] * (TERMS // 2)),
+}
+
+
+def main():
+    print(f"{'source':>18} {'bytes':>10} {'parse s':>8}")
+    for name, source in SOURCES.items():
+        start = time.perf_counter()
+        parser = Parser(Lexer(source))
+        parser.parse_program()
+        seconds = time.perf_counter() - start
+        assert not parser.errors
+
+        print(f"{name:>18} {len(source):>10} {seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Per-node cost of evaluator dispatch.
+
+Times monkey_eval on one node of each type against a structural match that
+tests the node classes in the order the evaluator used to, with both calling
+the same handlers. The difference is what the dispatch table saves on every
+evaluation of that node type.
+
+    python benchmarks/node_dispatch.py
+"""
+
+import timeit
+
+from writing_an_interpreter import evaluator
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    Identifier,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    PrefixExpression,
+    ReturnStatement,
+    StringLiteral,
+)
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.parser import Parser
+
+NUMBER = 200_000
+
+SAMPLES = {
+    "ExpressionStatement": "1",
+    "IntegerLiteral": "1",
+    "BooleanExpression": "true",
+    "PrefixExpression": "-1",
+    "InfixExpression": "1 + 2",
+    "IfExpression": "if (true) { 1 }",
+    "ReturnStatement": "return 1",
+    "LetStatement": "let a = 1",
+    "Identifier": "x",
+    "FunctionLiteral": "fn(a) { a }",
+    "CallExpression": "f(1)",
+    "StringLiteral": '"a"',
+    "ArrayLiteral": "[1]",
+    "IndexExpression": "a[0]",
+    "HashLiteral": "{1: 2}",
+}
+
+
+def match_eval(node, environment):
+    """
+    The evaluator's previous sequential dispatch, kept for comparison
+    """
+    match node:
+        case BlockStatement():
+            return evaluator.eval_block_statement(node, environment)
+        case ExpressionStatement():
+            return evaluator.eval_expression_statement(node, environment)
+        case IntegerLiteral():
+            return evaluator.eval_integer_literal(node, environment)
+        case BooleanExpression():
+            return evaluator.eval_boolean_expression(node, environment)
+        case PrefixExpression():
+            return evaluator.eval_prefix_node(node, environment)
+        case InfixExpression():
+            return evaluator.eval_infix_node(node, environment)
+        case IfExpression():
+            return evaluator.eval_if_expression(node, environment)
+        case ReturnStatement():
+            return evaluator.eval_return_statement(node, environment)
+        case LetStatement():
+            return evaluator.eval_let_statement(node, environment)
+        case Identifier():
+            return evaluator.eval_identifier(node, environment)
+        case FunctionLiteral():
+            return evaluator.eval_function_literal(node, environment)
+        case CallExpression():
+            return evaluator.eval_call_expression(node, environment)
+        case StringLiteral():
+            return evaluator.eval_string_literal(node, environment)
+        case ArrayLiteral():
+            return evaluator.eval_array_literal(node, environment)
+        case IndexExpression():
+            return evaluator.eval_index_node(node, environment)
+        case HashLiteral():
+            return evaluator.eval_hash_literal(node, environment)
+        case _:
+            return None
+
+
+def sample_node(name: str, source: str):
+    statement = Parser(Lexer(source)).parse_program().statements[0]
+    if name.endswith("Statement"):
+        return statement
+    return statement.expression
+
+
+def time_per_node(function, node, environment) -> float:
+    seconds = min(
+        timeit.repeat(lambda: function(node, environment), number=NUMBER, repeat=3)
+    )
+    return seconds / NUMBER * 1e9
+
+
+def main():
+    environment = Environment()
+    evaluator.monkey_eval(
+        Parser(Lexer("let x = 1; let a = [1]; let f = fn(x) { x };")).parse_program(),
+        environment,
+    )
+
+    print(f"{'node':<20} {'match (ns)':>11} {'table (ns)':>11} {'saved':>7}")
+    for name, source in SAMPLES.items():
+        node = sample_node(name, source)
+        before = time_per_node(match_eval, node, environment)
+        after = time_per_node(evaluator.monkey_eval, node, environment)
+        print(f"{name:<20} {before:>11.0f} {after:>11.0f} {before - after:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
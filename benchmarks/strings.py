@@ -0,0 +1,76 @@
+"""
+Cost of splitting a puzzle input into lines.
+
+The standard library used to define split in Monkey, walking the string one
+character at a time with first, rest and +. It is timed here against the
+split and lines builtins on advent_of_code/day_1_input.txt repeated up to
+100 times.
+
+    python benchmarks/strings.py [--engine tree]
+"""
+
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.objects import String
+from writing_an_interpreter.repl import ENGINES, execute_string
+
+INPUT = Path(__file__).parent.parent / "advent_of_code" / "day_1_input.txt"
+REPEATS = [1, 10, 100]
+
+# the split that standard_library.🐵 used to define
+MONKEY_SPLIT = """
+let monkey_split = fn(string, splitVal) {
+    let iter = fn(string, out, current) {
+        if (len(string) == 0) {
+            return push(out, current);
+        };
+        let val = first(string);
+        if (val == splitVal) {
+            let out = push(out, current);
+            let current = "";
+        } else {
+            let current = current + val;
+        };
+        return iter(rest(string), out, current)
+    };
+    return iter(string, [], "");
+};
+"""
+PROGRAMS = [
+    'len(monkey_split(data, "\\n"))',
+    'len(split(data, "\\n"))',
+    "len(lines(data))",
+]
+# the Monkey split takes a call per character
+MONKEY_LIMIT = 10
+
+
+def main():
+    argparse = ArgumentParser()
+    argparse.add_argument("--engine", choices=sorted(ENGINES), default="tree")
+    args = argparse.parse_args()
+
+    # engines without tail calls recurse once per character
+    sys.setrecursionlimit(100_000)
+    environment = Environment()
+    execute_string(MONKEY_SPLIT, environment, args.engine)
+    text = INPUT.read_text()
+
+    print(f"{'bytes':>10} {'program':>30} {'seconds':>9}")
+    for repeats in REPEATS:
+        environment["data"] = String(text * repeats)
+
+        programs = PROGRAMS if repeats <= MONKEY_LIMIT else PROGRAMS[1:]
+        for program in programs:
+            start = time.perf_counter()
+            execute_string(program, environment, args.engine)
+            seconds = time.perf_counter() - start
+            print(f"{len(text) * repeats:>10} {program:>30} {seconds:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,23 @@ import getpass
 from argparse import ArgumentParser
 from pathlib import Path
 
-from writing_an_interpreter import repl
+from writing_an_interpreter import optimizer, repl, transpiler
 from writing_an_interpreter.environment import Environment
 
 
-def run_repl():
+def run_repl(engine: str):
     user = getpass.getuser()
     print(f"Hello {user}! This is the Monkey programming language!")
     print("Feel free to type in commands")
-    repl.start()
+    repl.start(engine)
 
 
-def execute_file(path: Path):
-    contents = path.read_text()
+def execute_file(path: Path, engine: str):
     environment = Environment()
-    environment = repl.load_standard_library(environment)
-    repl.execute_string(contents, environment)
+    environment = repl.load_standard_library(environment, engine)
+    # the file is read as it is parsed rather than all at once
+    with path.open() as file:
+        repl.execute_string(file, environment, engine)
 
 
 if __name__ == "__main__":
@@ -26,9 +27,29 @@ if __name__ == "__main__":
         "path", nargs="?", help="Path of the file to be exeucted", default=""
     )
 
+    argparse.add_argument(
+        "--engine",
+        choices=sorted(repl.ENGINES),
+        default="tree",
+        help="Execution engine used to run the program",
+    )
+    argparse.add_argument(
+        "--dump-python",
+        action="store_true",
+        help="Print the Python source generated by the python engine",
+    )
+
+    argparse.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Run programs exactly as parsed, without the AST optimizer",
+    )
+
     args = argparse.parse_args()
+    transpiler.DEBUG = args.dump_python
+    optimizer.ENABLED = not args.no_optimize
 
     if args.path:
-        execute_file(Path(args.path))
+        execute_file(Path(args.path), args.engine)
     else:
-        run_repl()
+        run_repl(args.engine)
@@ -1,6 +1,7 @@
 from abc import abstractmethod
 from collections.abc import Sequence
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any, Callable
 
 from writing_an_interpreter.tokens import Token
 
@@ -30,6 +31,13 @@ class Expression(Node):
 class Identifier(Expression):
     token: Token
     value: str
+    # (depth, slot) filled in by the resolver, None for globals
+    address: tuple[int, int] | None = field(default=None, compare=False)
+    # addresses of the same name in enclosing functions, for when the slot at
+    # address is still empty because its let statement has not run
+    fallbacks: tuple[tuple[int, int], ...] = field(default=(), compare=False)
+    # (environment, epoch, builtin) for the last global lookup
+    cache: tuple | None = field(default=None, compare=False)
 
     def expression_node(self):
         return None
@@ -150,6 +158,8 @@ class InfixExpression(Expression):
     left: Expression
     operator: str
     right: Expression
+    # fast path installed by the evaluator once it has seen the operand types
+    specialization: Callable | bool | None = field(default=None, compare=False)
 
     def expression_node(self):
         return None
@@ -225,6 +235,8 @@ class FunctionLiteral(Expression):
     token: Token
     parameters: list[Identifier]
     body: BlockStatement
+    # size of a call's frame, filled in by the resolver
+    num_locals: int | None = field(default=None, compare=False)
 
     def expression_node(self):
         return None
@@ -341,12 +353,15 @@ class HashLiteral(Expression):
 @dataclass
 class Program(Sequence):
     statements: list[Statement]
+    # where each statement came from, for a program from parser.parse_source
+    source: Any = field(default=None, compare=False, repr=False)
 
-    def __init__(self, statements: list | None = None):
+    def __init__(self, statements: list | None = None, source: Any = None):
         if statements is None:
             self.statements = []
         else:
             self.statements = statements
+        self.source = source
 
     def token_literal(self) -> str:
         if len(self.statements) > 0:
@@ -365,3 +380,57 @@ class Program(Sequence):
 
     def __repr__(self):
         return self.__str__()
+
+
+def children(node: Node) -> list[Node]:
+    match node:
+        case Program() | BlockStatement():
+            return list(node.statements)
+        case ExpressionStatement():
+            return [node.expression]
+        case LetStatement():
+            return [node.value]
+        case ReturnStatement():
+            return [node.return_value]
+        case PrefixExpression():
+            return [node.right]
+        case InfixExpression():
+            return [node.left, node.right]
+        case IfExpression():
+            nodes = [node.condition, node.consequence]
+            if node.alternative is not None:
+                nodes.append(node.alternative)
+            return nodes
+        case FunctionLiteral():
+            return [node.body]
+        case CallExpression():
+            return [node.function, *node.arguments]
+        case ArrayLiteral():
+            return list(node.elements)
+        case IndexExpression():
+            return [node.left, node.index]
+        case HashLiteral():
+            nodes = []
+            for key, val in node.pairs.items():
+                nodes.extend([key, val])
+            return nodes
+        case _:
+            return []
+
+
+def let_names(function: "FunctionLiteral") -> list[str]:
+    """
+    The names that let statements bind in a function's body, outside any
+    function nested in it, in the order they appear
+    """
+    names = []
+    stack: list[Node] = [function.body]
+    while stack:
+        node = stack.pop()
+        match node:
+            case FunctionLiteral():
+                continue
+            case LetStatement():
+                names.append(node.name.value)
+        stack.extend(reversed(children(node)))
+    return names
@@ -1,23 +1,35 @@
-from copy import deepcopy
+import operator
+from array import array
 from pathlib import Path
+from typing import Callable
 
-from writing_an_interpreter.evaluator import new_error
+from writing_an_interpreter.evaluator import (
+    apply_function,
+    is_error,
+    is_truthy,
+    new_error,
+)
 from writing_an_interpreter.objects import (
+    FALSE,
+    NULL,
+    TRUE,
     Array,
     Boolean,
     Builtin,
+    Error,
+    Function,
     Hash,
     Integer,
-    Null,
+    IntArray,
+    Object,
     ObjectType,
     String,
+    integer_elements,
+    integer_values,
     is_hashable,
+    key_object,
 )
 
-TRUE = Boolean(True)
-FALSE = Boolean(False)
-NULL = Null()
-
 
 def run_len(*args):
     if len(args) != 1:
@@ -27,7 +39,7 @@ def run_len(*args):
     [arg] = args
     match arg:
         case String():
-            return Integer(value=len(arg.value))
+            return Integer(value=arg.length())
         case Array():
             return Integer(value=len(arg.elements))
         case Hash():
@@ -50,8 +62,8 @@ def run_first(*args):
                 return arg.elements[0]
             return NULL
         case ObjectType.STRING:
-            if len(arg.value) > 0:
-                return String(arg.value[0])
+            if arg.length() > 0:
+                return arg.char_at(0)
             return NULL
         case _:
             return new_error(
@@ -72,8 +84,8 @@ def run_last(*args):
                 return arg.elements[-1]
             return NULL
         case ObjectType.STRING:
-            if len(arg.value) > 0:
-                return String(arg.value[-1])
+            if arg.length() > 0:
+                return arg.char_at(-1)
             return NULL
         case _:
             return new_error(
@@ -90,12 +102,12 @@ def run_rest(*args):
     [arg] = args
     match arg.type:
         case ObjectType.ARRAY:
-            if len(arg.elements) > 1:
+            if len(arg.elements) > 0:
                 return Array(arg.elements[1:])
             return NULL
         case ObjectType.STRING:
-            if len(arg.value) > 1:
-                return String(arg.value[1:])
+            if arg.length() > 0:
+                return arg.slice(1, arg.length())
             return NULL
         case _:
             return new_error(
@@ -103,6 +115,33 @@ def run_rest(*args):
             )
 
 
+def run_slice(*args):
+    if len(args) != 3:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=3", argslen=len(args)
+        )
+
+    [arg, start, stop] = args
+    if start.type != ObjectType.INTEGER or stop.type != ObjectType.INTEGER:
+        return new_error(
+            "start and end of 'slice' must be INTEGER, got {start} and {stop}",
+            start=start.type,
+            stop=stop.type,
+        )
+
+    match arg.type:
+        case ObjectType.ARRAY:
+            return Array(elements=arg.elements[start.value : stop.value])
+        case ObjectType.STRING:
+            # negative positions count from the end, as in Python
+            start, stop, _ = slice(start.value, stop.value).indices(arg.length())
+            return arg.slice(start, max(start, stop))
+        case _:
+            return new_error(
+                "argument to 'slice' must be ARRAY or STRING, got {arg}", arg=arg.type
+            )
+
+
 def run_push(*args):
     if len(args) != 2:
         return new_error(
@@ -113,9 +152,7 @@ def run_push(*args):
     if arr.type != ObjectType.ARRAY:
         return new_error("argument to 'push' must be ARRAY, got {arg}", arg=arr.type)
 
-    elements = deepcopy(arr.elements)
-    elements.append(val)
-    return Array(elements=elements)
+    return Array(elements=arr.elements.append(val))
 
 
 def run_sort(*args):
@@ -131,6 +168,9 @@ def run_sort(*args):
     if len(arr.elements) == 0:
         return Array([])
 
+    if isinstance(arr.elements, IntArray):
+        return Array(elements=IntArray(array("q", sorted(arr.elements.values()))))
+
     types = {val.type for val in arr.elements}
 
     if len(types) > 1:
@@ -144,20 +184,17 @@ def run_sort(*args):
     type_ = types.pop()
     match type_:
         case ObjectType.INTEGER:
-            elements = deepcopy(arr.elements)
-            values = [e.value for e in elements]
+            values = [e.value for e in arr.elements]
             values = sorted(values)
             elements = [Integer(val) for val in values]
             return Array(elements=elements)
         case ObjectType.STRING:
-            elements = deepcopy(arr.elements)
-            values = [e.value for e in elements]
+            values = [e.value for e in arr.elements]
             values = sorted(values)
             elements = [String(val) for val in values]
             return Array(elements=elements)
         case ObjectType.BOOLEAN:
-            elements = deepcopy(arr.elements)
-            values = [e.value for e in elements]
+            values = [e.value for e in arr.elements]
             values = sorted(values)
             elements = [Boolean(val) for val in values]
             return Array(elements=elements)
@@ -167,6 +204,228 @@ def run_sort(*args):
             )
 
 
+def integer_reduction(name: str, reduce: Callable, empty: Object, args) -> Object:
+    """
+    Reduce an array of integers with a Python builtin, which runs in C over
+    the unboxed values of an IntArray
+    """
+    if len(args) != 1:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=1", argslen=len(args)
+        )
+
+    [arr] = args
+    if arr.type != ObjectType.ARRAY:
+        return new_error(
+            "argument to '{name}' must be ARRAY, got {arg}", name=name, arg=arr.type
+        )
+
+    values = integer_values(arr.elements)
+    if values is None:
+        return new_error(
+            "argument to '{name}' must be ARRAY of INTEGER, got {types}",
+            name=name,
+            types=element_types(arr),
+        )
+    if len(values) == 0:
+        return empty
+    return Integer(reduce(values))
+
+
+def run_sum(*args):
+    return integer_reduction("sum", sum, Integer(0), args)
+
+
+def run_min(*args):
+    return integer_reduction("min", min, NULL, args)
+
+
+def run_max(*args):
+    return integer_reduction("max", max, NULL, args)
+
+
+def run_abs(*args):
+    if len(args) != 1:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=1", argslen=len(args)
+        )
+
+    [arg] = args
+    match arg.type:
+        case ObjectType.INTEGER:
+            return Integer(abs(arg.value))
+        case ObjectType.ARRAY:
+            values = integer_values(arg.elements)
+            if values is None:
+                return new_error(
+                    "argument to 'abs' must be ARRAY of INTEGER, got {types}",
+                    types=element_types(arg),
+                )
+            return Array(elements=integer_elements(map(abs, values)))
+        case _:
+            return new_error(
+                "argument to 'abs' must be INTEGER or ARRAY, got {arg}", arg=arg.type
+            )
+
+
+def element_wise(name: str, function: Callable, args) -> Object:
+    """
+    Combine two arrays of integers of the same length element by element,
+    mapping a Python operator over their unboxed values
+    """
+    if len(args) != 2:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=2", argslen=len(args)
+        )
+
+    values = []
+    for arr in args:
+        if arr.type != ObjectType.ARRAY:
+            return new_error(
+                "argument to '{name}' must be ARRAY, got {arg}",
+                name=name,
+                arg=arr.type,
+            )
+        arr_values = integer_values(arr.elements)
+        if arr_values is None:
+            return new_error(
+                "argument to '{name}' must be ARRAY of INTEGER, got {types}",
+                name=name,
+                types=element_types(arr),
+            )
+        values.append(arr_values)
+
+    [left, right] = values
+    if len(left) != len(right):
+        return new_error(
+            "arguments to '{name}' must have the same length, got {left} and {right}",
+            name=name,
+            left=len(left),
+            right=len(right),
+        )
+    return Array(elements=integer_elements(map(function, left, right)))
+
+
+def run_add_arrays(*args):
+    return element_wise("add_arrays", operator.add, args)
+
+
+def run_sub_arrays(*args):
+    return element_wise("sub_arrays", operator.sub, args)
+
+
+def run_mul_arrays(*args):
+    return element_wise("mul_arrays", operator.mul, args)
+
+
+def element_types(arr: Array) -> str:
+    types = ", ".join(val.type for val in arr.elements)
+    return f"[{types}]"
+
+
+# How a builtin calls each engine's functions, keyed by their type. Engines
+# with a function type of their own add it when they are imported.
+function_callers: dict[type, Callable[[Object, list[Object]], Object | None]] = {
+    Function: apply_function,
+}
+
+
+def bind_callback(function: Object) -> Callable[[list[Object]], Object | None]:
+    """
+    A Python callable that calls function with a list of arguments, looked
+    up once so that a builtin calling it in a loop pays no dispatch per call
+    """
+    if type(function) is Builtin:
+        builtin = function.function
+        return lambda args: builtin(*args)
+
+    call = function_callers.get(type(function))
+    if call is None:
+        return lambda args: new_error("not a function: {type}", type=function.type)
+    return lambda args: call(function, args)
+
+
+def iterable_error(name: str, arg: Object) -> Error | None:
+    if arg.type in (ObjectType.ARRAY, ObjectType.STRING):
+        return None
+    return new_error(
+        "argument to '{name}' must be ARRAY or STRING, got {arg}",
+        name=name,
+        arg=arg.type,
+    )
+
+
+def iterate(arg: Array | String):
+    """
+    The elements of an array or the characters of a string
+    """
+    if arg.type == ObjectType.STRING:
+        return map(String, arg.value)
+    return arg.elements
+
+
+def run_map(*args):
+    if len(args) != 2:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=2", argslen=len(args)
+        )
+
+    [arr, function] = args
+    error = iterable_error("map", arr)
+    if error is not None:
+        return error
+
+    call = bind_callback(function)
+    results = []
+    for element in iterate(arr):
+        result = call([element])
+        if is_error(result):
+            return result
+        results.append(result)
+    return Array(elements=results)
+
+
+def run_filter(*args):
+    if len(args) != 2:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=2", argslen=len(args)
+        )
+
+    [arr, function] = args
+    error = iterable_error("filter", arr)
+    if error is not None:
+        return error
+
+    call = bind_callback(function)
+    results = []
+    for element in iterate(arr):
+        keep = call([element])
+        if is_error(keep):
+            return keep
+        if is_truthy(keep):
+            results.append(element)
+    return Array(elements=results)
+
+
+def run_reduce(*args):
+    if len(args) != 3:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=3", argslen=len(args)
+        )
+
+    [arr, result, function] = args
+    error = iterable_error("reduce", arr)
+    if error is not None:
+        return error
+
+    call = bind_callback(function)
+    for element in iterate(arr):
+        result = call([result, element])
+        if is_error(result):
+            return result
+    return result
+
+
 def run_puts(*args):
     for arg in args:
         print(arg.inspect())
@@ -189,9 +448,9 @@ def run_contains(*args):
         return new_error("unusable as hash key: {index_type}", index_type=val.type)
 
     if val.hash() in hash_.pairs:
-        return Boolean(True)
+        return TRUE
     else:
-        return Boolean(False)
+        return FALSE
 
 
 def run_keys(*args):
@@ -204,7 +463,7 @@ def run_keys(*args):
     if hash_.type != ObjectType.HASH:
         return new_error("argument to 'keys' must be HASH, got {arg}", arg=hash_.type)
 
-    elements = [pair.key for pair in hash_.pairs.values()]
+    elements = [key_object(key) for key in hash_.pairs]
     return Array(elements=elements)
 
 
@@ -218,10 +477,178 @@ def run_values(*args):
     if hash_.type != ObjectType.HASH:
         return new_error("argument to 'values' must be HASH, got {arg}", arg=hash_.type)
 
-    elements = [pair.value for pair in hash_.pairs.values()]
+    elements = hash_.pairs.values()
     return Array(elements=elements)
 
 
+def run_put(*args):
+    if len(args) != 3:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=3", argslen=len(args)
+        )
+
+    [hash_, key, val] = args
+    if hash_.type != ObjectType.HASH:
+        return new_error("argument to 'put' must be HASH, got {arg}", arg=hash_.type)
+
+    if not is_hashable(key):
+        return new_error("unusable as hash key: {index_type}", index_type=key.type)
+
+    return Hash(pairs=hash_.pairs.put(key.hash(), val))
+
+
+def run_delete(*args):
+    if len(args) != 2:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=2", argslen=len(args)
+        )
+
+    [hash_, key] = args
+    if hash_.type != ObjectType.HASH:
+        return new_error("argument to 'delete' must be HASH, got {arg}", arg=hash_.type)
+
+    if not is_hashable(key):
+        return new_error("unusable as hash key: {index_type}", index_type=key.type)
+
+    return Hash(pairs=hash_.pairs.delete(key.hash()))
+
+
+def run_merge(*args):
+    if len(args) != 2:
+        return new_error(
+            "wrong number of arguments. got={argslen}, want=2", argslen=len(args)
+        )
+
+    [left, right] = args
+    if left.type != ObjectType.HASH or right.type != ObjectType.HASH:
+        return new_error(
+            "arguments to 'merge' must be HASH, got {left} and {right}",
+            left=left.type,
+            right=right.type,
+        )
+
+    return Hash(pairs=left.pairs.merge(right.pairs))
+
+
+def check_arguments(name: str, args: tuple, *types: ObjectType) -> Error | None:
+    """
+    An Error unless args has one argument of each of types, in order
+    """
+    if len(args) != len(types):
+        return new_error(
+            "wrong number of arguments. got={argslen}, want={want}",
+            argslen=len(args),
+            want=len(types),
+        )
+    for arg, want in zip(args, types):
+        if arg.type != want:
+            return new_error(
+                "argument to '{name}' must be {want}, got {arg}",
+                name=name,
+                want=want,
+                arg=arg.type,
+            )
+    return None
+
+
+def strings(values: list[str]) -> Array:
+    return Array(elements=[String(value) for value in values])
+
+
+def run_split(*args):
+    error = check_arguments("split", args, ObjectType.STRING, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    [string, separator] = args
+    if not separator.length():
+        return new_error("separator for 'split' must not be empty")
+    return strings(string.value.split(separator.value))
+
+
+def run_join(*args):
+    error = check_arguments("join", args, ObjectType.ARRAY, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    [arr, separator] = args
+    if any(element.type != ObjectType.STRING for element in arr.elements):
+        return new_error(
+            "argument to 'join' must be ARRAY of STRING, got {types}",
+            types=element_types(arr),
+        )
+    return String(separator.value.join(element.value for element in arr.elements))
+
+
+def run_trim(*args):
+    error = check_arguments("trim", args, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    return String(args[0].value.strip())
+
+
+def run_find(*args):
+    error = check_arguments("find", args, ObjectType.STRING, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    [string, target] = args
+    return Integer(string.value.find(target.value))
+
+
+def run_replace(*args):
+    error = check_arguments(
+        "replace", args, ObjectType.STRING, ObjectType.STRING, ObjectType.STRING
+    )
+    if error is not None:
+        return error
+
+    [string, old, new] = args
+    if not old.length():
+        return new_error("string to 'replace' must not be empty")
+    return String(string.value.replace(old.value, new.value))
+
+
+def run_substr(*args):
+    error = check_arguments(
+        "substr", args, ObjectType.STRING, ObjectType.INTEGER, ObjectType.INTEGER
+    )
+    if error is not None:
+        return error
+
+    [string, start, length] = args
+    # a negative start counts from the end, as in slice
+    start, stop, _ = slice(start.value, None).indices(string.length())
+    stop = min(stop, start + max(length.value, 0))
+    return string.slice(start, stop)
+
+
+def run_lines(*args):
+    error = check_arguments("lines", args, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    return strings(args[0].value.splitlines())
+
+
+def run_starts_with(*args):
+    error = check_arguments("starts_with", args, ObjectType.STRING, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    [string, prefix] = args
+    return TRUE if string.value.startswith(prefix.value) else FALSE
+
+
+def run_chars(*args):
+    error = check_arguments("chars", args, ObjectType.STRING)
+    if error is not None:
+        return error
+
+    return strings(list(args[0].value))
+
+
 def run_read_file(*args):
     if len(args) != 1:
         return new_error(
@@ -280,11 +707,34 @@ builtins = {
     "last": Builtin(run_last),
     "rest": Builtin(run_rest),
     "push": Builtin(run_push),
+    "slice": Builtin(run_slice),
     "sort": Builtin(run_sort),
+    "sum": Builtin(run_sum),
+    "min": Builtin(run_min),
+    "max": Builtin(run_max),
+    "abs": Builtin(run_abs),
+    "add_arrays": Builtin(run_add_arrays),
+    "sub_arrays": Builtin(run_sub_arrays),
+    "mul_arrays": Builtin(run_mul_arrays),
+    "map": Builtin(run_map),
+    "filter": Builtin(run_filter),
+    "reduce": Builtin(run_reduce),
     "puts": Builtin(run_puts),
     "contains": Builtin(run_contains),
     "keys": Builtin(run_keys),
     "values": Builtin(run_values),
+    "put": Builtin(run_put),
+    "delete": Builtin(run_delete),
+    "merge": Builtin(run_merge),
+    "split": Builtin(run_split),
+    "join": Builtin(run_join),
+    "trim": Builtin(run_trim),
+    "find": Builtin(run_find),
+    "replace": Builtin(run_replace),
+    "substr": Builtin(run_substr),
+    "lines": Builtin(run_lines),
+    "starts_with": Builtin(run_starts_with),
+    "chars": Builtin(run_chars),
     "read_file": Builtin(run_read_file),
     "int": Builtin(run_int),
 }
@@ -0,0 +1,370 @@
+import operator
+from dataclasses import dataclass
+from typing import Callable
+
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    Identifier,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    Node,
+    PrefixExpression,
+    Program,
+    ReturnStatement,
+    StringLiteral,
+)
+from writing_an_interpreter.builtins import builtins, function_callers
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    MonkeyError,
+    check,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    is_truthy,
+    new_error,
+)
+from writing_an_interpreter.objects import (
+    Array,
+    Builtin,
+    Hash,
+    Integer,
+    Object,
+    ObjectType,
+    ReturnValue,
+    String,
+    is_hashable,
+)
+
+Code = Callable[[Environment], Object | None]
+
+integer_operators = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.floordiv,
+}
+
+comparison_operators = {
+    "<": operator.lt,
+    ">": operator.gt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@dataclass
+class Procedure(Object):
+    parameters: list[Identifier]
+    body: BlockStatement
+    code: Code
+    environment: Environment
+    type: ObjectType = ObjectType.FUNCTION
+
+    def inspect(self):
+        args = ", ".join(str(p) for p in self.parameters)
+        body = self.body
+
+        return f"fn({args}){{\n{body}\n}}"
+
+
+def compile_node(node: Node) -> Code:
+    match node:
+        case Program():
+            return compile_program(node)
+        case BlockStatement():
+            return compile_block_statement(node)
+        case ExpressionStatement():
+            return compile_node(node.expression)
+        case LetStatement():
+            return compile_let_statement(node)
+        case ReturnStatement():
+            return compile_return_statement(node)
+        case IntegerLiteral():
+            return compile_constant(Integer(value=node.value))
+        case StringLiteral():
+            return compile_constant(String(value=node.value))
+        case BooleanExpression():
+            return compile_constant(TRUE if node.value else FALSE)
+        case PrefixExpression():
+            return compile_prefix_expression(node)
+        case InfixExpression():
+            return compile_infix_expression(node)
+        case IfExpression():
+            return compile_if_expression(node)
+        case Identifier():
+            return compile_identifier(node)
+        case FunctionLiteral():
+            return compile_function_literal(node)
+        case CallExpression():
+            return compile_call_expression(node)
+        case ArrayLiteral():
+            return compile_array_literal(node)
+        case IndexExpression():
+            return compile_index_expression(node)
+        case HashLiteral():
+            return compile_hash_literal(node)
+        case _:
+            return compile_constant(None)
+
+
+def compile_program(program: Program) -> Code:
+    statements = [compile_node(s) for s in program.statements]
+
+    def run_program(environment):
+        result = None
+        for statement in statements:
+            result = statement(environment)
+            if type(result) is ReturnValue:
+                return result.value
+        return result
+
+    return run_program
+
+
+def compile_block_statement(block: BlockStatement) -> Code:
+    statements = [compile_node(s) for s in block.statements]
+
+    if len(statements) == 1:
+        return statements[0]
+
+    def run_block(environment):
+        result = None
+        for statement in statements:
+            result = statement(environment)
+            if type(result) is ReturnValue:
+                return result
+        return result
+
+    return run_block
+
+
+def compile_let_statement(node: LetStatement) -> Code:
+    name = node.name.value
+    value = compile_node(node.value)
+
+    def run_let(environment):
+        environment[name] = value(environment)
+
+    return run_let
+
+
+def compile_return_statement(node: ReturnStatement) -> Code:
+    value = compile_node(node.return_value)
+
+    def run_return(environment):
+        return ReturnValue(value(environment))
+
+    return run_return
+
+
+def compile_constant(obj: Object | None) -> Code:
+    def run_constant(environment):
+        return obj
+
+    return run_constant
+
+
+def compile_prefix_expression(node: PrefixExpression) -> Code:
+    op = node.operator
+    right = compile_node(node.right)
+
+    if op == "-":
+
+        def run_minus(environment):
+            value = right(environment)
+            if type(value) is Integer:
+                return Integer(-value.value)
+            return check(eval_prefix_expression(op, value))
+
+        return run_minus
+
+    def run_prefix(environment):
+        return check(eval_prefix_expression(op, right(environment)))
+
+    return run_prefix
+
+
+def compile_infix_expression(node: InfixExpression) -> Code:
+    op = node.operator
+    left = compile_node(node.left)
+    right = compile_node(node.right)
+
+    if op in integer_operators:
+        fast = integer_operators[op]
+
+        def run_arithmetic(environment):
+            lhs = left(environment)
+            rhs = right(environment)
+            if type(lhs) is Integer and type(rhs) is Integer:
+                return Integer(fast(lhs.value, rhs.value))
+            return check(eval_infix_expression(op, lhs, rhs))
+
+        return run_arithmetic
+
+    if op in comparison_operators:
+        compare = comparison_operators[op]
+
+        def run_comparison(environment):
+            lhs = left(environment)
+            rhs = right(environment)
+            if type(lhs) is Integer and type(rhs) is Integer:
+                return TRUE if compare(lhs.value, rhs.value) else FALSE
+            return check(eval_infix_expression(op, lhs, rhs))
+
+        return run_comparison
+
+    def run_infix(environment):
+        lhs = left(environment)
+        rhs = right(environment)
+        return check(eval_infix_expression(op, lhs, rhs))
+
+    return run_infix
+
+
+def compile_if_expression(node: IfExpression) -> Code:
+    condition = compile_node(node.condition)
+    consequence = compile_node(node.consequence)
+    if node.alternative is None:
+        alternative = compile_constant(NULL)
+    else:
+        alternative = compile_node(node.alternative)
+
+    def run_if(environment):
+        if is_truthy(condition(environment)):
+            return consequence(environment)
+        return alternative(environment)
+
+    return run_if
+
+
+def compile_identifier(node: Identifier) -> Code:
+    name = node.value
+
+    def run_identifier(environment):
+        scope = environment
+        while scope is not None:
+            store = scope.store
+            if name in store:
+                return store[name]
+            scope = scope.outer
+        if name in builtins:
+            return builtins[name]
+        raise MonkeyError(new_error(f"identifier not found: {name}"))
+
+    return run_identifier
+
+
+def compile_function_literal(node: FunctionLiteral) -> Code:
+    parameters = node.parameters
+    body_node = node.body
+    body = compile_node(body_node)
+
+    def run_function_literal(environment):
+        return Procedure(
+            parameters=parameters, body=body_node, code=body, environment=environment
+        )
+
+    return run_function_literal
+
+
+def compile_call_expression(node: CallExpression) -> Code:
+    function = compile_node(node.function)
+    arguments = [compile_node(a) for a in node.arguments]
+
+    def run_call(environment):
+        callee = function(environment)
+        args = [argument(environment) for argument in arguments]
+        return apply_function(callee, args)
+
+    return run_call
+
+
+def apply_function(function: Object, args: list[Object]) -> Object | None:
+    if type(function) is Procedure:
+        parameters = function.parameters
+        if len(args) < len(parameters):
+            raise MonkeyError(
+                new_error(
+                    "wrong number of arguments: want={want}, got={got}",
+                    want=len(parameters),
+                    got=len(args),
+                )
+            )
+        store = {param.value: arg for param, arg in zip(parameters, args)}
+        result = function.code(Environment(store=store, outer=function.environment))
+        if type(result) is ReturnValue:
+            return result.value
+        return result
+    if type(function) is Builtin:
+        return check(function.function(*args))
+    raise MonkeyError(new_error("not a function: {type}", type=function.type))
+
+
+def call_procedure(function: Procedure, args: list[Object]) -> Object | None:
+    """
+    Call function from a builtin, which reports errors by returning them
+    """
+    try:
+        return apply_function(function, args)
+    except MonkeyError as e:
+        return e.error
+
+
+function_callers[Procedure] = call_procedure
+
+
+def compile_array_literal(node: ArrayLiteral) -> Code:
+    elements = [compile_node(e) for e in node.elements]
+
+    def run_array_literal(environment):
+        return Array(elements=[element(environment) for element in elements])
+
+    return run_array_literal
+
+
+def compile_index_expression(node: IndexExpression) -> Code:
+    left = compile_node(node.left)
+    index_ = compile_node(node.index)
+
+    def run_index(environment):
+        return check(eval_index_expression(left(environment), index_(environment)))
+
+    return run_index
+
+
+def compile_hash_literal(node: HashLiteral) -> Code:
+    pairs = [(compile_node(k), compile_node(v)) for k, v in node.pairs.items()]
+
+    def run_hash_literal(environment):
+        result = {}
+        for key_code, value_code in pairs:
+            key = key_code(environment)
+            if not is_hashable(key):
+                raise MonkeyError(
+                    new_error("unusable as hash key: {key_type}", key_type=type(key))
+                )
+            result[key.hash()] = value_code(environment)
+        return Hash(pairs=result)
+
+    return run_hash_literal
+
+
+def run(program: Program, environment: Environment) -> Object | None:
+    code = compile_node(program)
+    try:
+        return code(environment)
+    except MonkeyError as e:
+        return e.error
@@ -0,0 +1,473 @@
+from dataclasses import dataclass, field
+from enum import IntEnum, auto
+
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    Identifier,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    Node,
+    children,
+    let_names,
+    PrefixExpression,
+    Program,
+    ReturnStatement,
+    StringLiteral,
+)
+from writing_an_interpreter.objects import Integer, Object, String
+
+
+class CompileError(Exception):
+    """
+    Raised when a node cannot be lowered to bytecode
+    """
+
+
+class Opcode(IntEnum):
+    CONSTANT = auto()  # CONSTANT <constant index>
+    POP = auto()
+    TRUE = auto()
+    FALSE = auto()
+    NULL = auto()
+    NONE = auto()  # the "no value" produced by let statements and empty blocks
+
+    ADD = auto()
+    SUB = auto()
+    MUL = auto()
+    DIV = auto()
+    EQ = auto()
+    NOT_EQ = auto()
+    LT = auto()
+    GT = auto()
+    MINUS = auto()
+    BANG = auto()
+
+    JUMP = auto()  # JUMP <address>
+    JUMP_NOT_TRUTHY = auto()  # JUMP_NOT_TRUTHY <address>
+
+    GET_GLOBAL = auto()  # GET_GLOBAL <name constant index>
+    SET_GLOBAL = auto()  # SET_GLOBAL <name constant index>
+    GET_LOCAL = auto()  # GET_LOCAL <slot>
+    SET_LOCAL = auto()  # SET_LOCAL <slot>
+    GET_CELL = auto()  # GET_CELL <slot>
+    SET_CELL = auto()  # SET_CELL <slot>
+    LOAD_CELL = auto()  # LOAD_CELL <slot>, pushes the cell itself
+    GET_FREE = auto()  # GET_FREE <free index>
+    LOAD_FREE = auto()  # LOAD_FREE <free index>, pushes the cell itself
+
+    ARRAY = auto()  # ARRAY <element count>
+    HASH = auto()  # HASH <pair count>
+    INDEX = auto()
+
+    CALL = auto()  # CALL <argument count>
+    RETURN_VALUE = auto()
+    CLOSURE = auto()  # CLOSURE <constant index> <free count>
+
+
+operand_widths = {
+    Opcode.CONSTANT: 1,
+    Opcode.JUMP: 1,
+    Opcode.JUMP_NOT_TRUTHY: 1,
+    Opcode.GET_GLOBAL: 1,
+    Opcode.SET_GLOBAL: 1,
+    Opcode.GET_LOCAL: 1,
+    Opcode.SET_LOCAL: 1,
+    Opcode.GET_CELL: 1,
+    Opcode.SET_CELL: 1,
+    Opcode.LOAD_CELL: 1,
+    Opcode.GET_FREE: 1,
+    Opcode.LOAD_FREE: 1,
+    Opcode.ARRAY: 1,
+    Opcode.HASH: 1,
+    Opcode.CALL: 1,
+    Opcode.CLOSURE: 2,
+}
+
+infix_opcodes = {
+    "+": Opcode.ADD,
+    "-": Opcode.SUB,
+    "*": Opcode.MUL,
+    "/": Opcode.DIV,
+    "==": Opcode.EQ,
+    "!=": Opcode.NOT_EQ,
+    "<": Opcode.LT,
+    ">": Opcode.GT,
+}
+
+prefix_opcodes = {
+    "-": Opcode.MINUS,
+    "!": Opcode.BANG,
+}
+
+
+def make(op: Opcode, *operands: int) -> list[int]:
+    return [int(op), *operands]
+
+
+def disassemble(instructions: list[int]) -> str:
+    lines = []
+    ip = 0
+    while ip < len(instructions):
+        op = Opcode(instructions[ip])
+        width = operand_widths.get(op, 0)
+        operands = instructions[ip + 1 : ip + 1 + width]
+        args = "".join(f" {operand}" for operand in operands)
+        lines.append(f"{ip:04d} {op.name}{args}")
+        ip += 1 + width
+    return "\n".join(lines)
+
+
+@dataclass
+class CompiledFunction:
+    instructions: list[int]
+    constants: list
+    num_locals: int
+    num_parameters: int
+    cell_slots: list[int]
+    local_names: list[str]
+    free_names: list[str]
+    literal: FunctionLiteral
+    # the free variables to try, by local slot or free index, when a binding
+    # is empty because its let has not run
+    local_fallbacks: dict[int, list[int]]
+    free_fallbacks: dict[int, list[int]]
+
+
+@dataclass
+class Bytecode:
+    instructions: list[int]
+    constants: list[Object | CompiledFunction | str]
+
+
+class SymbolKind(IntEnum):
+    GLOBAL = auto()
+    LOCAL = auto()
+    CELL = auto()
+    FREE = auto()
+
+
+@dataclass
+class Scope:
+    """
+    The names visible inside one function body.
+
+    Locals that are captured by a nested function live in cells so that the
+    closure sees later rebindings, just like the tree-walker's shared
+    Environment.
+
+    A local stays empty until its let runs, and a lookup then falls back on
+    the bindings of the same name in enclosing functions and then on the
+    globals. So every binding that a name could be found in is captured,
+    innermost first, in its chain.
+    """
+
+    outer: "Scope | None"
+    cells: set[str]
+    parameters: set[str] = field(default_factory=set)
+    symbols: dict[str, tuple[SymbolKind, int]] = field(default_factory=dict)
+    chains: dict[str, list[tuple[SymbolKind, int]]] = field(default_factory=dict)
+    captured: dict[tuple[SymbolKind, int], int] = field(default_factory=dict)
+    local_names: list[str] = field(default_factory=list)
+    cell_slots: list[int] = field(default_factory=list)
+    free: list[tuple[SymbolKind, int]] = field(default_factory=list)
+    free_names: list[str] = field(default_factory=list)
+    instructions: list[int] = field(default_factory=list)
+
+    def define(self, name: str) -> tuple[SymbolKind, int]:
+        symbol = self.symbols.get(name)
+        if symbol is not None:
+            return symbol
+
+        slot = len(self.local_names)
+        self.local_names.append(name)
+        if name in self.cells:
+            self.cell_slots.append(slot)
+            symbol = (SymbolKind.CELL, slot)
+        else:
+            symbol = (SymbolKind.LOCAL, slot)
+        self.symbols[name] = symbol
+        return symbol
+
+    def resolve(self, name: str) -> tuple[SymbolKind, int]:
+        chain = self.chain(name)
+        return chain[0] if chain else (SymbolKind.GLOBAL, -1)
+
+    def chain(self, name: str) -> list[tuple[SymbolKind, int]]:
+        """
+        The bindings a lookup of name could find, innermost first, ending
+        at a parameter since one is never empty
+        """
+        if name in self.chains:
+            return self.chains[name]
+
+        chain = []
+        if name in self.symbols:
+            chain.append(self.symbols[name])
+        if self.outer is not None and name not in self.parameters:
+            for symbol in self.outer.chain(name):
+                chain.append(self.capture(name, symbol))
+        self.chains[name] = chain
+        return chain
+
+    def capture(
+        self, name: str, symbol: tuple[SymbolKind, int]
+    ) -> tuple[SymbolKind, int]:
+        if symbol[0] == SymbolKind.LOCAL:
+            raise CompileError(f"{name} is captured but was not allocated a cell")
+        if symbol not in self.captured:
+            self.captured[symbol] = len(self.free)
+            self.free.append(symbol)
+            self.free_names.append(name)
+        return (SymbolKind.FREE, self.captured[symbol])
+
+    def fallbacks(self) -> tuple[dict[int, list[int]], dict[int, list[int]]]:
+        """
+        The free indices to try after each local slot and free index
+        """
+        local_fallbacks, free_fallbacks = {}, {}
+        for chain in self.chains.values():
+            if len(chain) < 2:
+                continue
+            (kind, index), rest = chain[0], [free for _, free in chain[1:]]
+            if kind == SymbolKind.FREE:
+                free_fallbacks[index] = rest
+            else:
+                local_fallbacks[index] = rest
+        return local_fallbacks, free_fallbacks
+
+
+def free_names(function: FunctionLiteral) -> set[str]:
+    """
+    Every name a function might look up outside its own parameters.
+
+    This over-approximates (let-bound names are kept), which only ever costs
+    an unnecessary cell in the enclosing function.
+    """
+    names = set()
+    stack = [function.body]
+    while stack:
+        node = stack.pop()
+        match node:
+            case Identifier():
+                names.add(node.value)
+            case FunctionLiteral():
+                names |= free_names(node)
+            case _:
+                stack.extend(children(node))
+    return names - {p.value for p in function.parameters}
+
+
+def captured_names(function: FunctionLiteral) -> set[str]:
+    names = set()
+    stack = [function.body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, FunctionLiteral):
+            names |= free_names(node)
+        else:
+            stack.extend(children(node))
+    return names
+
+
+class Compiler:
+    constants: list[Object | CompiledFunction | str]
+    names: dict[str, int]
+    scope: Scope
+
+    def __init__(self):
+        self.constants = []
+        self.names = {}
+        self.scope = Scope(outer=None, cells=set())
+
+    def bytecode(self) -> Bytecode:
+        return Bytecode(instructions=self.scope.instructions, constants=self.constants)
+
+    def emit(self, op: Opcode, *operands: int) -> int:
+        position = len(self.scope.instructions)
+        self.scope.instructions.extend(make(op, *operands))
+        return position
+
+    def change_operand(self, position: int, operand: int):
+        self.scope.instructions[position + 1] = operand
+
+    def add_constant(self, obj: Object | CompiledFunction) -> int:
+        self.constants.append(obj)
+        return len(self.constants) - 1
+
+    def add_name(self, name: str) -> int:
+        if name not in self.names:
+            self.names[name] = len(self.constants)
+            self.constants.append(name)
+        return self.names[name]
+
+    def is_global_scope(self) -> bool:
+        return self.scope.outer is None
+
+    def compile(self, node: Node):
+        match node:
+            case Program():
+                self.compile_statements(node.statements)
+            case BlockStatement():
+                self.compile_statements(node.statements)
+            case ExpressionStatement():
+                self.compile(node.expression)
+            case LetStatement():
+                self.compile_let_statement(node)
+            case ReturnStatement():
+                self.compile(node.return_value)
+                self.emit(Opcode.RETURN_VALUE)
+            case IntegerLiteral():
+                self.emit(Opcode.CONSTANT, self.add_constant(Integer(node.value)))
+            case StringLiteral():
+                self.emit(Opcode.CONSTANT, self.add_constant(String(node.value)))
+            case BooleanExpression():
+                self.emit(Opcode.TRUE if node.value else Opcode.FALSE)
+            case PrefixExpression():
+                self.compile(node.right)
+                if node.operator not in prefix_opcodes:
+                    raise CompileError(f"unknown operator: {node.operator}")
+                self.emit(prefix_opcodes[node.operator])
+            case InfixExpression():
+                self.compile(node.left)
+                self.compile(node.right)
+                if node.operator not in infix_opcodes:
+                    raise CompileError(f"unknown operator: {node.operator}")
+                self.emit(infix_opcodes[node.operator])
+            case IfExpression():
+                self.compile_if_expression(node)
+            case Identifier():
+                self.load_symbol(node.value)
+            case FunctionLiteral():
+                self.compile_function_literal(node)
+            case CallExpression():
+                self.compile(node.function)
+                for argument in node.arguments:
+                    self.compile(argument)
+                self.emit(Opcode.CALL, len(node.arguments))
+            case ArrayLiteral():
+                for element in node.elements:
+                    self.compile(element)
+                self.emit(Opcode.ARRAY, len(node.elements))
+            case IndexExpression():
+                self.compile(node.left)
+                self.compile(node.index)
+                self.emit(Opcode.INDEX)
+            case HashLiteral():
+                for key, val in node.pairs.items():
+                    self.compile(key)
+                    self.compile(val)
+                self.emit(Opcode.HASH, len(node.pairs))
+            case _:
+                raise CompileError(f"cannot compile {type(node).__name__}")
+
+    def compile_statements(self, statements: list):
+        """
+        Leave the value of the final statement on the stack.
+
+        Let statements and empty blocks have no value, which is pushed as
+        NONE so that results match the tree-walking evaluator.
+        """
+        if not statements:
+            self.emit(Opcode.NONE)
+            return
+
+        *init, last = statements
+        for statement in init:
+            self.compile(statement)
+            if isinstance(statement, ExpressionStatement):
+                self.emit(Opcode.POP)
+
+        self.compile(last)
+        if isinstance(last, LetStatement):
+            self.emit(Opcode.NONE)
+
+    def compile_let_statement(self, node: LetStatement):
+        name = node.name.value
+        if self.is_global_scope():
+            self.compile(node.value)
+            self.emit(Opcode.SET_GLOBAL, self.add_name(name))
+            return
+
+        self.compile(node.value)
+        kind, slot = self.scope.define(name)
+
+        if kind == SymbolKind.CELL:
+            self.emit(Opcode.SET_CELL, slot)
+        else:
+            self.emit(Opcode.SET_LOCAL, slot)
+
+    def compile_if_expression(self, node: IfExpression):
+        self.compile(node.condition)
+        jump_not_truthy = self.emit(Opcode.JUMP_NOT_TRUTHY, 0)
+
+        self.compile(node.consequence)
+        jump = self.emit(Opcode.JUMP, 0)
+
+        self.change_operand(jump_not_truthy, len(self.scope.instructions))
+        if node.alternative is None:
+            self.emit(Opcode.NULL)
+        else:
+            self.compile(node.alternative)
+
+        self.change_operand(jump, len(self.scope.instructions))
+
+    def compile_function_literal(self, node: FunctionLiteral):
+        self.scope = Scope(outer=self.scope, cells=captured_names(node))
+        for parameter in node.parameters:
+            self.scope.define(parameter.value)
+            self.scope.parameters.add(parameter.value)
+        for name in let_names(node):
+            self.scope.define(name)
+
+        self.compile(node.body)
+        self.emit(Opcode.RETURN_VALUE)
+
+        scope = self.scope
+        self.scope = scope.outer
+        local_fallbacks, free_fallbacks = scope.fallbacks()
+
+        function = CompiledFunction(
+            instructions=scope.instructions,
+            constants=self.constants,
+            num_locals=len(scope.local_names),
+            num_parameters=len(node.parameters),
+            cell_slots=scope.cell_slots,
+            local_names=scope.local_names,
+            free_names=scope.free_names,
+            literal=node,
+            local_fallbacks=local_fallbacks,
+            free_fallbacks=free_fallbacks,
+        )
+        for kind, index in scope.free:
+            if kind == SymbolKind.CELL:
+                self.emit(Opcode.LOAD_CELL, index)
+            else:
+                self.emit(Opcode.LOAD_FREE, index)
+        self.emit(Opcode.CLOSURE, self.add_constant(function), len(scope.free))
+
+    def load_symbol(self, name: str):
+        kind, index = self.scope.resolve(name)
+        match kind:
+            case SymbolKind.GLOBAL:
+                self.emit(Opcode.GET_GLOBAL, self.add_name(name))
+            case SymbolKind.LOCAL:
+                self.emit(Opcode.GET_LOCAL, index)
+            case SymbolKind.CELL:
+                self.emit(Opcode.GET_CELL, index)
+            case SymbolKind.FREE:
+                self.emit(Opcode.GET_FREE, index)
+
+
+def compile_program(program: Program) -> Bytecode:
+    compiler = Compiler()
+    compiler.compile(program)
+    return compiler.bytecode()
@@ -6,8 +6,15 @@ if TYPE_CHECKING:
 
 
 class Environment(MutableMapping):
+    """
+    Name-based bindings. epoch counts the names that have been added or
+    removed, so a lookup cached against the epoch stays valid until a new
+    binding could shadow it.
+    """
+
     store: dict[str, "Object"]
     outer: "Environment | None"
+    epoch: int
 
     def __init__(
         self,
@@ -19,6 +26,7 @@ class Environment(MutableMapping):
         else:
             self.store = store
         self.outer = outer
+        self.epoch = 0
 
     def __getitem__(self, key: str):
         if key in self.store:
@@ -30,9 +38,12 @@ class Environment(MutableMapping):
         return self.outer[key]
 
     def __setitem__(self, key: str, val: "Object"):
+        if key not in self.store:
+            self.epoch += 1
         self.store[key] = val
 
     def __delitem__(self, key: str):
+        self.epoch += 1
         return self.store.__delitem__(key)
 
     def __iter__(self):
@@ -40,3 +51,34 @@ class Environment(MutableMapping):
 
     def __len__(self):
         return self.store.__len__()
+
+
+class Unbound:
+    """
+    The contents of a slot whose let has not run yet, which unlike None is
+    never the value of a binding
+    """
+
+    __slots__ = ()
+
+
+UNBOUND = Unbound()
+
+
+class Frame:
+    """
+    The bindings of one function call, held in the slots the resolver assigned
+    to them. Globals stay in a name-based Environment.
+    """
+
+    __slots__ = ("slots", "outer", "globals")
+
+    def __init__(
+        self,
+        slots: list["Object | Unbound | None"],
+        outer: "Frame | None",
+        globals: Environment,
+    ):
+        self.slots = slots
+        self.outer = outer
+        self.globals = globals
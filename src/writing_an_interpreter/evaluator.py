@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+
 from writing_an_interpreter.ast import (
     ArrayLiteral,
     BlockStatement,
@@ -19,110 +21,187 @@ from writing_an_interpreter.ast import (
     ReturnStatement,
     StringLiteral,
 )
-from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.environment import UNBOUND, Environment, Frame
 from writing_an_interpreter.objects import (
     Array,
     Boolean,
     Builtin,
+    FALSE,
+    NULL,
+    TRUE,
     Error,
     Function,
     Hash,
-    HashPair,
     Integer,
     Null,
     Object,
     ObjectType,
     ReturnValue,
     String,
+    concat,
     is_hashable,
 )
+from writing_an_interpreter.resolver import resolve
+
+
+@dataclass
+class TailCall:
+    """
+    A call in tail position, left for apply_function to run in its loop so
+    that tail recursion does not grow the Python stack
+    """
+
+    function: Object
+    args: list[Object]
+
+
+@dataclass
+class SpecializationCounters:
+    """
+    How many infix nodes switched to an integer fast path, and how many times
+    a specialized node met a non-integer operand and fell back for good
+    """
+
+    specialized: int = 0
+    deoptimized: int = 0
+
+
+specialization_counters = SpecializationCounters()
+
+# the specialization of an infix node that only takes the generic path
+GENERIC = False
+
+
+def monkey_eval(node: Node, environment: Environment | Frame) -> Object | None:
+    evaluate = node_evaluators.get(type(node))
+    if evaluate is None:
+        return None
+    return evaluate(node, environment)
+
+
+def eval_expression_statement(
+    node: ExpressionStatement, environment: Environment | Frame
+) -> Object | None:
+    return monkey_eval(node.expression, environment)
+
+
+def eval_integer_literal(node: IntegerLiteral, environment: Environment | Frame):
+    return Integer(value=node.value)
+
+
+def eval_boolean_expression(
+    node: BooleanExpression, environment: Environment | Frame
+) -> Boolean:
+    return TRUE if node.value else FALSE
+
+
+def eval_string_literal(node: StringLiteral, environment: Environment | Frame):
+    return String(value=node.value)
+
+
+def eval_prefix_node(node: PrefixExpression, environment: Environment | Frame):
+    right = monkey_eval(node.right, environment)
+    if is_error(right):
+        return right
+
+    return eval_prefix_expression(node.operator, right)
+
+
+def eval_infix_node(node: InfixExpression, environment: Environment | Frame):
+    left = monkey_eval(node.left, environment)
+    if is_error(left):
+        return left
+
+    right = monkey_eval(node.right, environment)
+    if is_error(right):
+        return right
+
+    fast = node.specialization
+    if fast:
+        if type(left) is Integer and type(right) is Integer:
+            return fast(left, right)
+        deoptimize(node)
+    elif fast is None:
+        specialize(node, left, right)
+    return eval_infix_expression(node.operator, left, right)
 
-TRUE = Boolean(True)
-FALSE = Boolean(False)
-NULL = Null()
-
-
-def monkey_eval(node: Node, environment: Environment) -> Object:
-    match node:
-        case Program():
-            return eval_program(node, environment)
-        case BlockStatement():
-            return eval_block_statement(node, environment)
-        case ExpressionStatement():
-            return monkey_eval(node.expression, environment)
-        case IntegerLiteral():
-            return Integer(value=node.value)
-        case BooleanExpression():
-            return native_bool_to_bool_object(node.value)
-        case PrefixExpression():
-            right = monkey_eval(node.right, environment)
-            if is_error(right):
-                return right
-
-            return eval_prefix_expression(node.operator, right)
-        case InfixExpression():
-            left = monkey_eval(node.left, environment)
-            if is_error(left):
-                return left
-
-            right = monkey_eval(node.right, environment)
-            if is_error(right):
-                return right
-
-            return eval_infix_expression(node.operator, left, right)
-        case IfExpression():
-            return eval_if_expression(node, environment)
-        case ReturnStatement():
-            val = monkey_eval(node.return_value, environment)
-            return val if is_error(val) else ReturnValue(val)
-
-        case LetStatement():
-            val = monkey_eval(node.value, environment)
-            if is_error(val):
-                return val
-            environment[node.name.value] = val
-        case Identifier():
-            return eval_identifier(node, environment)
-        case FunctionLiteral():
-            params = node.parameters
-            body = node.body
-            return Function(parameters=params, body=body, environment=environment)
-        case CallExpression():
-            function = monkey_eval(node.function, environment)
-            if is_error(function):
-                return function
-
-            args = eval_expressions(node.arguments, environment)
-            if len(args) == 1 and is_error(args[0]):
-                return args[0]
-            return apply_function(function, args)
-
-        case StringLiteral():
-            return String(value=node.value)
-        case ArrayLiteral():
-            elements = eval_expressions(node.elements, environment)
-
-            if len(elements) == 1 and is_error(elements[0]):
-                return elements[0]
-
-            return Array(elements=elements)
-        case IndexExpression():
-            left = monkey_eval(node.left, environment)
-            if is_error(left):
-                return left
-
-            index_ = monkey_eval(node.index, environment)
-            if is_error(index_):
-                return index_
-
-            return eval_index_expression(left, index_)
-        case HashLiteral():
-            return eval_hash_literal(node, environment)
-        case _:
-            return None
+
+def specialize(node: InfixExpression, left: Object, right: Object):
+    """
+    Pick a node's specialization from the operands of its first evaluation
+    """
+    fast = GENERIC
+    if type(left) is Integer and type(right) is Integer:
+        fast = infix_operators.get((ObjectType.INTEGER, node.operator), GENERIC)
+    if fast:
+        specialization_counters.specialized += 1
+    object.__setattr__(node, "specialization", fast)
+
+
+def deoptimize(node: InfixExpression):
+    specialization_counters.deoptimized += 1
+    object.__setattr__(node, "specialization", GENERIC)
+
+
+def eval_return_statement(node: ReturnStatement, environment: Environment | Frame):
+    val = monkey_eval(node.return_value, environment)
+    return val if is_error(val) else ReturnValue(val)
+
+
+def eval_let_statement(node: LetStatement, environment: Environment | Frame):
+    val = monkey_eval(node.value, environment)
+    if is_error(val):
+        return val
+    address = node.name.address
+    if address is not None and type(environment) is Frame:
+        environment.slots[address[1]] = val
+    else:
+        environment[node.name.value] = val
+
+
+def eval_function_literal(node: FunctionLiteral, environment: Environment | Frame):
+    return Function(
+        parameters=node.parameters,
+        body=node.body,
+        environment=environment,
+        num_locals=node.num_locals,
+    )
+
+
+def eval_call_expression(node: CallExpression, environment: Environment | Frame):
+    function = monkey_eval(node.function, environment)
+    if is_error(function):
+        return function
+
+    args = eval_expressions(node.arguments, environment)
+    if len(args) == 1 and is_error(args[0]):
+        return args[0]
+    return apply_function(function, args)
+
+
+def eval_array_literal(node: ArrayLiteral, environment: Environment | Frame):
+    elements = eval_expressions(node.elements, environment)
+
+    if len(elements) == 1 and is_error(elements[0]):
+        return elements[0]
+
+    return Array(elements=elements)
+
+
+def eval_index_node(node: IndexExpression, environment: Environment | Frame):
+    left = monkey_eval(node.left, environment)
+    if is_error(left):
+        return left
+
+    index_ = monkey_eval(node.index, environment)
+    if is_error(index_):
+        return index_
+
+    return eval_index_expression(left, index_)
 
 
 def eval_program(program: Program, environment: Environment):
+    resolve(program)
     result = None
 
     for statement in program.statements:
@@ -159,15 +238,12 @@ def native_bool_to_bool_object(inputs: bool) -> Boolean:
 
 
 def eval_prefix_expression(operator: str, right: Object) -> Object:
-    match operator:
-        case "!":
-            return eval_bang_operator_expression(right)
-        case "-":
-            return eval_minus_prefix_operator_expression(right)
-        case _:
-            return new_error(
-                "unknown operator: {operator}{type}", operator=operator, type=right.type
-            )
+    evaluate = prefix_operators.get(operator)
+    if evaluate is None:
+        return new_error(
+            "unknown operator: {operator}{type}", operator=operator, type=right.type
+        )
+    return evaluate(right)
 
 
 def eval_bang_operator_expression(right: Object) -> Object:
@@ -187,6 +263,12 @@ def eval_minus_prefix_operator_expression(right: Object) -> Object:
     return Integer(value=-right.value)
 
 
+prefix_operators = {
+    "!": eval_bang_operator_expression,
+    "-": eval_minus_prefix_operator_expression,
+}
+
+
 def eval_infix_expression(operator: str, left: Object, right: Object) -> Object:
     if left.type != right.type:
         return new_error(
@@ -195,10 +277,10 @@ def eval_infix_expression(operator: str, left: Object, right: Object) -> Object:
             operator=operator,
             right_type=right.type,
         )
-    elif left.type == ObjectType.INTEGER and right.type == ObjectType.INTEGER:
-        return eval_integer_infix_expression(operator, left, right)
-    elif left.type == ObjectType.STRING and right.type == ObjectType.STRING:
-        return eval_string_infix_expression(operator, left, right)
+
+    evaluate = infix_operators.get((left.type, operator))
+    if evaluate is not None:
+        return evaluate(left, right)
     elif operator == "==":
         return native_bool_to_bool_object(left == right)
     elif operator == "!=":
@@ -212,52 +294,33 @@ def eval_infix_expression(operator: str, left: Object, right: Object) -> Object:
     )
 
 
-def eval_integer_infix_expression(
-    operator: str, left: Integer, right: Integer
-) -> Integer:
-    match operator:
-        case "+":
-            return Integer(left.value + right.value)
-        case "-":
-            return Integer(left.value - right.value)
-        case "*":
-            return Integer(left.value * right.value)
-        case "/":
-            return Integer(left.value // right.value)
-        case "<":
-            return native_bool_to_bool_object(left.value < right.value)
-        case ">":
-            return native_bool_to_bool_object(left.value > right.value)
-        case "==":
-            return native_bool_to_bool_object(left.value == right.value)
-        case "!=":
-            return native_bool_to_bool_object(left.value != right.value)
-        case _:
-            return new_error(
-                "unknown operator:{left_type} {operator} {right_type}",
-                left_type=left.type,
-                operator=operator,
-                right_type=right.type,
-            )
-
-
-def eval_string_infix_expression(
-    operator: str, left: String, right: String
-) -> String | Error:
-    match operator:
-        case "+":
-            return String(left.value + right.value)
-        case "==":
-            return Boolean(left.value == right.value)
-        case "!=":
-            return Boolean(left.value != right.value)
-        case _:
-            return new_error(
-                "unknown operator: {left_type} {operator} {right_type}",
-                left_type=left.type,
-                operator=operator,
-                right_type=right.type,
-            )
+# handlers for operators whose meaning depends on the operand type, keyed by
+# (type, operator) so each one is found with a single lookup
+infix_operators = {
+    (ObjectType.INTEGER, "+"): lambda left, right: Integer(left.value + right.value),
+    (ObjectType.INTEGER, "-"): lambda left, right: Integer(left.value - right.value),
+    (ObjectType.INTEGER, "*"): lambda left, right: Integer(left.value * right.value),
+    (ObjectType.INTEGER, "/"): lambda left, right: Integer(left.value // right.value),
+    (ObjectType.INTEGER, "<"): lambda left, right: (
+        TRUE if left.value < right.value else FALSE
+    ),
+    (ObjectType.INTEGER, ">"): lambda left, right: (
+        TRUE if left.value > right.value else FALSE
+    ),
+    (ObjectType.INTEGER, "=="): lambda left, right: (
+        TRUE if left.value == right.value else FALSE
+    ),
+    (ObjectType.INTEGER, "!="): lambda left, right: (
+        TRUE if left.value != right.value else FALSE
+    ),
+    (ObjectType.STRING, "+"): concat,
+    (ObjectType.STRING, "=="): lambda left, right: (
+        TRUE if left.value == right.value else FALSE
+    ),
+    (ObjectType.STRING, "!="): lambda left, right: (
+        TRUE if left.value != right.value else FALSE
+    ),
+}
 
 
 def eval_if_expression(expression: IfExpression, environment: Environment) -> Object:
@@ -272,15 +335,75 @@ def eval_if_expression(expression: IfExpression, environment: Environment) -> Ob
     return NULL
 
 
-def eval_identifier(identifier: Identifier, environment: Environment) -> Object:
+def eval_identifier(identifier: Identifier, environment: Environment | Frame) -> Object:
+    if type(environment) is Frame:
+        address = identifier.address
+        if address is not None:
+            frame = environment
+            depth, slot = address
+            for _ in range(depth):
+                frame = frame.outer
+            value = frame.slots[slot]
+            if value is UNBOUND:
+                return eval_unbound(identifier, environment)
+            return value
+        environment = environment.globals
+    return eval_name(identifier, environment)
+
+
+def eval_unbound(identifier: Identifier, frame: Frame) -> Object:
+    """
+    Look up a local whose slot is empty because its let has not run, in the
+    enclosing functions that bind the same name and then by name
+    """
+    for depth, slot in identifier.fallbacks:
+        outer = frame
+        for _ in range(depth):
+            outer = outer.outer
+        value = outer.slots[slot]
+        if value is not UNBOUND:
+            return value
+    return eval_name(identifier, frame.globals)
+
+
+def eval_name(identifier: Identifier, environment: Environment) -> Object:
+    name = identifier.value
+    while environment.outer is not None:
+        store = environment.store
+        if name in store:
+            return store[name]
+        environment = environment.outer
+    return eval_global(identifier, environment)
+
+
+def eval_global(identifier: Identifier, environment: Environment) -> Object:
+    """
+    Look a name up in the global environment, caching where it was found on
+    the Identifier until the environment's epoch says a new binding could
+    shadow it.
+    """
+    cache = identifier.cache
+    if cache is not None and cache[0] is environment and cache[1] == environment.epoch:
+        builtin = cache[2]
+        if builtin is None:
+            return environment.store[identifier.value]
+        return builtin
+
     # importing here to avoid circular import
     from writing_an_interpreter.builtins import builtins
 
-    if identifier.value in environment:
-        return environment[identifier.value]
-    if identifier.value in builtins:
-        return builtins[identifier.value]
-    return new_error(f"identifier not found: {identifier.value}")
+    name = identifier.value
+    if name in environment.store:
+        builtin = None
+    elif name in builtins:
+        builtin = builtins[name]
+    else:
+        return new_error(f"identifier not found: {name}")
+
+    object.__setattr__(identifier, "cache", (environment, environment.epoch, builtin))
+    if builtin is None:
+        return environment.store[name]
+    return builtin
 
 
 def eval_expressions(
@@ -320,46 +443,116 @@ def eval_array_index_expression(array: Array, index_: Integer) -> Object:
 
 def eval_string_index_expression(string: String, index_: Integer) -> Object:
     idx = index_.value
-    max_idx = len(string.value) - 1
+    max_idx = string.length() - 1
 
     if idx < 0 or idx > max_idx:
         return NULL
 
-    return String(string.value[idx])
+    return string.char_at(idx)
 
 
 def eval_hash_index_expression(hash_obj: Hash, index_: Integer) -> Object:
     if not is_hashable(index_):
         return new_error("unusable as hash key: {index_type}", index_type=index_.type)
-    hash_key = index_.hash()
-    if hash_key not in hash_obj.pairs:
-        return NULL
-
-    return hash_obj.pairs[hash_key].value
+    return hash_obj.pairs.get(index_.hash(), NULL)
 
 
 def apply_function(function: Function, args: list[Object]):
-    match function:
-        case Function():
-            extended_environment = extend_function_environment(function, args)
-            evaluated = monkey_eval(function.body, extended_environment)
+    while isinstance(function, Function):
+        if len(args) < len(function.parameters):
+            return new_error(
+                "wrong number of arguments: want={want}, got={got}",
+                want=len(function.parameters),
+                got=len(args),
+            )
+        extended_environment = extend_function_environment(function, args)
+        evaluated = eval_tail_block(function.body, extended_environment)
+        if not isinstance(evaluated, TailCall):
             return unwrap_return_value(evaluated)
+        function, args = evaluated.function, evaluated.args
+
+    match function:
         case Builtin():
             return function.function(*args)
         case _:
             return new_error("not a function: {type}", type=function.type)
 
 
-def extend_function_environment(function: Function, args: list[Object]):
+def eval_tail_block(block: BlockStatement, environment: Environment, tail=True):
+    """
+    Evaluate a function body, returning calls in tail position as TailCalls.
+
+    A call is in tail position when it is returned, or when it is the last
+    expression of a block whose value is the function's result. Branches of
+    an if statement in the middle of a block are not in tail position, but a
+    return inside them still is.
+    """
+    result = None
+    last = len(block.statements) - 1
+
+    for idx, statement in enumerate(block.statements):
+        match statement:
+            case ReturnStatement(return_value=CallExpression()):
+                return eval_tail_call(statement.return_value, environment)
+            case ExpressionStatement(expression=CallExpression()) if (
+                tail and idx == last
+            ):
+                return eval_tail_call(statement.expression, environment)
+            case ExpressionStatement(expression=IfExpression()):
+                is_tail = tail and idx == last
+                result = eval_tail_if(statement.expression, environment, is_tail)
+            case _:
+                result = monkey_eval(statement, environment)
+
+        if isinstance(result, TailCall):
+            return result
+        if result is not None and result.type in [
+            ObjectType.RETURN_VALUE,
+            ObjectType.ERROR,
+        ]:
+            return result
+
+    return result
+
+
+def eval_tail_if(expression: IfExpression, environment: Environment, tail: bool):
+    condition = monkey_eval(expression.condition, environment)
+    if is_error(condition):
+        return condition
+
+    if is_truthy(condition):
+        return eval_tail_block(expression.consequence, environment, tail)
+    elif expression.alternative is not None:
+        return eval_tail_block(expression.alternative, environment, tail)
+    return NULL
+
+
+def eval_tail_call(node: CallExpression, environment: Environment):
+    function = monkey_eval(node.function, environment)
+    if is_error(function):
+        return function
+
+    args = eval_expressions(node.arguments, environment)
+    if len(args) == 1 and is_error(args[0]):
+        return args[0]
+    return TailCall(function=function, args=args)
+
+
+def extend_function_environment(
+    function: Function, args: list[Object]
+) -> Environment | Frame:
+    if function.num_locals is not None:
+        slots = args[: len(function.parameters)]
+        slots.extend([UNBOUND] * (function.num_locals - len(slots)))
+        outer = function.environment
+        if type(outer) is Frame:
+            return Frame(slots, outer, outer.globals)
+        return Frame(slots, None, outer)
+
     environment = Environment(outer=function.environment)
 
-    for idx, param in enumerate(function.parameters):
-        try:
-            environment[param.value] = args[idx]
-        except Exception as e:
-            arguments = args
-            breakpoint()
-            print(e)
+    for param, arg in zip(function.parameters, args):
+        environment[param.value] = arg
 
     return environment
 
@@ -389,6 +582,22 @@ def is_error(obj: Object) -> bool:
     return obj.type == ObjectType.ERROR
 
 
+class MonkeyError(Exception):
+    """
+    Unwinds compiled code back to the program when an Error is produced
+    """
+
+    def __init__(self, error: Error):
+        super().__init__(error.message)
+        self.error = error
+
+
+def check(result: Object) -> Object:
+    if type(result) is Error:
+        raise MonkeyError(result)
+    return result
+
+
 def eval_hash_literal(node, environment: Environment):
     pairs = {}
 
@@ -405,5 +614,26 @@ def eval_hash_literal(node, environment: Environment):
         if is_error(val):
             return val
 
-        pairs[hashed] = HashPair(key=key, value=val)
+        pairs[hashed] = val
     return Hash(pairs=pairs)
+
+
+node_evaluators = {
+    Program: eval_program,
+    BlockStatement: eval_block_statement,
+    ExpressionStatement: eval_expression_statement,
+    IntegerLiteral: eval_integer_literal,
+    BooleanExpression: eval_boolean_expression,
+    PrefixExpression: eval_prefix_node,
+    InfixExpression: eval_infix_node,
+    IfExpression: eval_if_expression,
+    ReturnStatement: eval_return_statement,
+    LetStatement: eval_let_statement,
+    Identifier: eval_identifier,
+    FunctionLiteral: eval_function_literal,
+    CallExpression: eval_call_expression,
+    StringLiteral: eval_string_literal,
+    ArrayLiteral: eval_array_literal,
+    IndexExpression: eval_index_node,
+    HashLiteral: eval_hash_literal,
+}
@@ -0,0 +1,294 @@
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# an entry is stored as a (hash, key, value, position) tuple
+Leaf = tuple
+
+
+class BitmapNode:
+    """
+    A trie node holding only the children that are present.
+
+    Bit i of bitmap is set when the node has a child for the i-th 5-bit chunk
+    of a key's hash, and that child sits at the number of lower set bits in
+    children. A child is either a leaf or another node.
+    """
+
+    __slots__ = ("bitmap", "children")
+
+    def __init__(self, bitmap: int, children: list):
+        self.bitmap = bitmap
+        self.children = children
+
+
+class CollisionNode:
+    """
+    Leaves whose keys have exactly the same hash
+    """
+
+    __slots__ = ("hash", "leaves")
+
+    def __init__(self, hash_: int, leaves: list[Leaf]):
+        self.hash = hash_
+        self.leaves = leaves
+
+
+EMPTY = BitmapNode(0, [])
+
+
+class PersistentMap(Mapping):
+    """
+    An immutable mapping stored as a hash array mapped trie.
+
+    put and delete return a new map that shares every node off the path to
+    the changed key with the old one, so each update copies at most a few
+    32-slot nodes rather than the whole mapping. Like a dict, iteration
+    follows the order in which keys were first inserted.
+    """
+
+    __slots__ = ("count", "root", "next_position", "ordered")
+
+    count: int
+    root: BitmapNode
+    next_position: int
+    # the leaves in insertion order, gathered the first time they are needed
+    ordered: tuple[Leaf, ...] | None
+
+    def __init__(self, items: Mapping | Iterable[tuple[Any, Any]] = ()):
+        if isinstance(items, Mapping):
+            items = items.items()
+
+        count, root, position = 0, EMPTY, 0
+        for key, value in items:
+            hash_ = hash(key) & HASH_MASK
+            root, added = put(root, 0, (hash_, key, value, position))
+            if added:
+                count += 1
+                position += 1
+
+        self.count = count
+        self.root = root
+        self.next_position = position
+        self.ordered = None
+
+    @classmethod
+    def from_parts(
+        cls, count: int, root: BitmapNode, next_position: int
+    ) -> "PersistentMap":
+        mapping = cls.__new__(cls)
+        mapping.count = count
+        mapping.root = root
+        mapping.next_position = next_position
+        mapping.ordered = None
+        return mapping
+
+    def find(self, key: Any) -> Leaf | None:
+        hash_ = hash(key) & HASH_MASK
+        node, shift = self.root, 0
+        while True:
+            if type(node) is CollisionNode:
+                for leaf in node.leaves:
+                    if leaf[1] == key:
+                        return leaf
+                return None
+
+            bit = 1 << ((hash_ >> shift) & MASK)
+            if not node.bitmap & bit:
+                return None
+            child = node.children[(node.bitmap & (bit - 1)).bit_count()]
+            if type(child) is tuple:
+                if child[0] == hash_ and child[1] == key:
+                    return child
+                return None
+            node, shift = child, shift + BITS
+
+    def put(self, key: Any, value: Any) -> "PersistentMap":
+        hash_ = hash(key) & HASH_MASK
+        root, added = put(self.root, 0, (hash_, key, value, self.next_position))
+        if not added:
+            return self.from_parts(self.count, root, self.next_position)
+        return self.from_parts(self.count + 1, root, self.next_position + 1)
+
+    def delete(self, key: Any) -> "PersistentMap":
+        hash_ = hash(key) & HASH_MASK
+        root = delete(self.root, 0, hash_, key)
+        if root is self.root:
+            return self
+        if root is None:
+            root = EMPTY
+        elif type(root) is not BitmapNode:
+            root = BitmapNode(1 << (leaf_hash(root) & MASK), [root])
+        return self.from_parts(self.count - 1, root, self.next_position)
+
+    def merge(self, other: Mapping) -> "PersistentMap":
+        """
+        This map with every entry of other put into it in turn
+        """
+        merged = self
+        for key, value in other.items():
+            merged = merged.put(key, value)
+        return merged
+
+    def leaves(self) -> tuple[Leaf, ...]:
+        """
+        The leaves in insertion order. The map never changes, so they are
+        walked and sorted once and kept for later iterations
+        """
+        if self.ordered is not None:
+            return self.ordered
+        leaves = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if type(node) is CollisionNode:
+                leaves.extend(node.leaves)
+                continue
+            for child in node.children:
+                if type(child) is tuple:
+                    leaves.append(child)
+                else:
+                    stack.append(child)
+        leaves.sort(key=lambda leaf: leaf[3])
+        self.ordered = tuple(leaves)
+        return self.ordered
+
+    def items(self):
+        return [(leaf[1], leaf[2]) for leaf in self.leaves()]
+
+    def values(self):
+        return [leaf[2] for leaf in self.leaves()]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        leaf = self.find(key)
+        return default if leaf is None else leaf[2]
+
+    def __contains__(self, key: Any) -> bool:
+        return self.find(key) is not None
+
+    def __getitem__(self, key: Any) -> Any:
+        leaf = self.find(key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf[2]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return (leaf[1] for leaf in self.leaves())
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+
+def leaf_hash(node: Leaf | CollisionNode) -> int:
+    return node[0] if type(node) is tuple else node.hash
+
+
+def put(
+    node: BitmapNode | CollisionNode, shift: int, leaf: Leaf
+) -> tuple[BitmapNode | CollisionNode, bool]:
+    """
+    Copy the path from node down to where leaf belongs, returning the new node
+    and whether leaf's key was not already present.
+
+    A key that is already present keeps its original position.
+    """
+    hash_, key = leaf[0], leaf[1]
+
+    if type(node) is CollisionNode:
+        if node.hash != hash_:
+            # the collision moves one level down, beside the new leaf
+            wrapped = BitmapNode(1 << ((node.hash >> shift) & MASK), [node])
+            return put(wrapped, shift, leaf)
+        for idx, old in enumerate(node.leaves):
+            if old[1] == key:
+                leaves = list(node.leaves)
+                leaves[idx] = (hash_, key, leaf[2], old[3])
+                return CollisionNode(hash_, leaves), False
+        return CollisionNode(hash_, [*node.leaves, leaf]), True
+
+    bit = 1 << ((hash_ >> shift) & MASK)
+    idx = (node.bitmap & (bit - 1)).bit_count()
+    children = list(node.children)
+
+    if not node.bitmap & bit:
+        children.insert(idx, leaf)
+        return BitmapNode(node.bitmap | bit, children), True
+
+    child = children[idx]
+    if type(child) is tuple:
+        if child[0] == hash_ and child[1] == key:
+            children[idx] = (hash_, key, leaf[2], child[3])
+            return BitmapNode(node.bitmap, children), False
+        children[idx] = join(shift + BITS, child, leaf)
+        return BitmapNode(node.bitmap, children), True
+
+    children[idx], added = put(child, shift + BITS, leaf)
+    return BitmapNode(node.bitmap, children), added
+
+
+def join(shift: int, first: Leaf, second: Leaf) -> BitmapNode | CollisionNode:
+    """
+    The smallest subtree holding two leaves whose hashes agree below shift
+    """
+    if first[0] == second[0]:
+        return CollisionNode(first[0], [first, second])
+
+    first_idx = (first[0] >> shift) & MASK
+    second_idx = (second[0] >> shift) & MASK
+    if first_idx == second_idx:
+        return BitmapNode(1 << first_idx, [join(shift + BITS, first, second)])
+    children = [first, second] if first_idx < second_idx else [second, first]
+    return BitmapNode((1 << first_idx) | (1 << second_idx), children)
+
+
+def delete(node: BitmapNode | CollisionNode, shift: int, hash_: int, key: Any):
+    """
+    Copy the path from node down to key without it.
+
+    Returns node itself when key is missing, None when nothing is left and
+    a bare leaf when only one is, so that the parent can hold it directly.
+    """
+    if type(node) is CollisionNode:
+        leaves = [leaf for leaf in node.leaves if leaf[1] != key]
+        if len(leaves) == len(node.leaves):
+            return node
+        if len(leaves) == 1:
+            return leaves[0]
+        return CollisionNode(node.hash, leaves)
+
+    bit = 1 << ((hash_ >> shift) & MASK)
+    if not node.bitmap & bit:
+        return node
+    idx = (node.bitmap & (bit - 1)).bit_count()
+    child = node.children[idx]
+
+    if type(child) is tuple:
+        if child[0] != hash_ or child[1] != key:
+            return node
+        new_child = None
+    else:
+        new_child = delete(child, shift + BITS, hash_, key)
+        if new_child is child:
+            return node
+
+    children = list(node.children)
+    bitmap = node.bitmap
+    if new_child is None:
+        del children[idx]
+        bitmap &= ~bit
+    else:
+        children[idx] = new_child
+
+    if not children:
+        return None
+    if len(children) == 1 and type(children[0]) is tuple:
+        return children[0]
+    return BitmapNode(bitmap, children)
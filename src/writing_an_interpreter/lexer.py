@@ -1,143 +1,245 @@
+import codecs
+import re
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterator
+from mmap import mmap
+from typing import BinaryIO, TextIO
+
 from writing_an_interpreter.tokens import Token, TokenType, keywords
 
+# One alternative per kind of lexeme, tried in order at each position. Only
+# the groups that need handling are named: whitespace and comments are
+# skipped and anything else is a single illegal character. A string that
+# stops at a backslash keeps it, so that a chunk ending part way through an
+# escape sequence is carried over to the next.
+TOKEN_PATTERN = re.compile(
+    r"""
+      [ \t\r\n]+ | \#[^\n]*
+    | (?P<ident>[A-Za-z_]+)
+    | (?P<int>[0-9]+)
+    | "(?P<string>(?:[^"\\]|\\.)*\\?)"?
+    | (?P<operator>==|!=|[-=+!*/<>,;:(){}\[\]])
+    | (?P<illegal>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+ESCAPE_PATTERN = re.compile(r"\\(.)", re.DOTALL)
+NEWLINE_PATTERN = re.compile(r"\n")
+
+escapes = {"n": "\n", "r": "\r", "t": "\t", "\\": "\\", '"': '"'}
+operators = {token_type.text: token_type for token_type in TokenType}
+# token types by their code
+token_types = tuple(TokenType)
+
+# characters, or bytes for binary sources, lexed at a time
+CHUNK_SIZE = 1 << 14
+
+Source = str | TextIO | BinaryIO | mmap | bytes
+
+
+def read_chunks(source: Source, start: int = 0) -> Iterator[str]:
+    """
+    The text of source from start, a piece at a time.
+
+    Strings are cut up too, so that a parser that stops early only pays to
+    lex what it read. Binary sources are decoded as UTF-8 through an
+    incremental decoder, so a character split between two chunks is still
+    read once. Only strings can start part way through.
+    """
+    if isinstance(source, str):
+        for idx in range(start, len(source), CHUNK_SIZE):
+            yield source[idx : idx + CHUNK_SIZE]
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    if isinstance(source, (mmap, bytes)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield decoder.decode(view[start : start + CHUNK_SIZE])
+    else:
+        while chunk := source.read(CHUNK_SIZE):
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def unescape(literal: str) -> str:
+    """
+    The text of a string literal, with unknown escape sequences left as written
+    """
+    if "\\" not in literal:
+        return literal
+    return ESCAPE_PATTERN.sub(lambda match: escapes.get(match[1], match[0]), literal)
+
+
+class TokenTable:
+    """
+    Tokens stored as parallel arrays of type codes and source offsets.
+
+    A token costs 17 bytes here rather than a Token object and its literal,
+    which are only built when asked for. That saving is for callers of
+    tokenize that keep the table: the Lexer, and so the parser, turns every
+    entry into a Token as it goes, since the AST holds Tokens. Offsets count
+    from the start of the whole source, and offset is where text starts in
+    it, so that tables over successive chunks of a stream agree. A string's
+    start is its opening quote, while its end is that of its text.
+    """
+
+    __slots__ = ("text", "offset", "types", "starts", "ends")
+
+    text: str
+    offset: int
+    types: array
+    starts: array
+    ends: array
+
+    def __init__(self, text: str, offset: int = 0):
+        self.text = text
+        self.offset = offset
+        self.types = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def type(self, idx: int) -> TokenType:
+        return token_types[self.types[idx]]
+
+    def literal(self, idx: int) -> str:
+        start = self.starts[idx] - self.offset
+        if self.types[idx] == TokenType.STRING:
+            start += 1
+        return self.text[start : self.ends[idx] - self.offset]
+
+    def token(self, idx: int) -> Token:
+        token_type = token_types[self.types[idx]]
+        literal = self.literal(idx)
+        if token_type is TokenType.STRING:
+            return Token(token_type, literal, unescape(literal), self.starts[idx])
+        return Token(token_type, literal, start=self.starts[idx])
+
+    def __iter__(self) -> Iterator[Token]:
+        text, offset = self.text, self.offset
+        STRING = TokenType.STRING
+        for code, start, end in zip(self.types, self.starts, self.ends):
+            token_type = token_types[code]
+            if token_type is STRING:
+                literal = text[start - offset + 1 : end - offset]
+                yield Token(token_type, literal, unescape(literal), start)
+            else:
+                yield Token(
+                    token_type, text[start - offset : end - offset], None, start
+                )
+
+
+def tokenize(text: str, offset: int = 0, final: bool = True) -> tuple[TokenTable, int]:
+    """
+    A table of the tokens in text, which starts at offset in the source.
+
+    Unless text is the final part of the source, the last token that touches
+    its end may continue into the next part, so it is left out. Also returns
+    where the tokens that were read stop.
+    """
+    IDENT, INT, STRING = TokenType.IDENT, TokenType.INT, TokenType.STRING
+    ILLEGAL = TokenType.ILLEGAL
+    table = TokenTable(text, offset)
+    add_type, add_start, add_end = (
+        table.types.append,
+        table.starts.append,
+        table.ends.append,
+    )
+    size = len(text)
+
+    for match in TOKEN_PATTERN.finditer(text):
+        if not final and match.end() == size:
+            return table, match.start()
+
+        kind = match.lastgroup
+        if kind is None:
+            continue
+
+        start, end = match.span(kind)
+        if kind == "ident":
+            add_type(keywords.get(match[kind], IDENT))
+        elif kind == "operator":
+            add_type(operators[match[kind]])
+        elif kind == "int":
+            add_type(INT)
+        elif kind == "string":
+            add_type(STRING)
+            start -= 1
+        else:
+            add_type(ILLEGAL)
+        add_start(start + offset)
+        add_end(end + offset)
+    return table, size
 
-class Lexer:
-    inputs: str
-    position: int = 0
-    read_position: int = 0
-    current: str = ""
 
-    def __init__(self, inputs: str):
+class Lexer:
+    """
+    Splits source code into tokens in a single pass of TOKEN_PATTERN.
+
+    The source is either a string or a file or memory map that is read a
+    chunk at a time as tokens are asked for, so only the text of tokens that
+    have not been returned yet is held in memory. The offset of every line
+    is kept so that a token's start can be turned into a line and column.
+
+    A string can also be lexed from part way through, from the start of a
+    token, when the tokens before it are already known.
+    """
+
+    inputs: Source
+    start: int
+    tokens: Iterator[Token]
+    # the line start is on, and where each line from there on starts
+    first_line: int
+    line_starts: array
+
+    def __init__(self, inputs: Source, start: int = 0):
         self.inputs = inputs
-        self.read_char()
-
-    def read_char(self):
-        if self.read_position >= len(self.inputs):
-            self.current = ""
-        else:
-            self.current = self.inputs[self.read_position]
-        self.position = self.read_position
-        self.read_position += 1
-
-    def next_token(self):
-        self.skip_whitespace()
-        if self.current == "#":
-            self.skip_comments()
-        match self.current:
-            case "=":
-                if self.peek_char() == "=":
-                    first = self.current
-                    self.read_char()
-                    token = Token(TokenType.EQ, first + self.current)
-                else:
-                    token = Token(TokenType.ASSIGN, self.current)
-            case "+":
-                token = Token(TokenType.PLUS, self.current)
-            case "-":
-                token = Token(TokenType.MINUS, self.current)
-            case "!":
-                if self.peek_char() == "=":
-                    first = self.current
-                    self.read_char()
-                    token = Token(TokenType.NOT_EQ, first + self.current)
-                else:
-                    token = Token(TokenType.BANG, self.current)
-            case "*":
-                token = Token(TokenType.ASTERISK, self.current)
-            case "/":
-                token = Token(TokenType.SLASH, self.current)
-            case "<":
-                token = Token(TokenType.LT, self.current)
-            case ">":
-                token = Token(TokenType.GT, self.current)
-            case ",":
-                token = Token(TokenType.COMMA, self.current)
-            case ";":
-                token = Token(TokenType.SEMICOLON, self.current)
-            case ":":
-                token = Token(TokenType.COLON, self.current)
-            case "(":
-                token = Token(TokenType.LPAREN, self.current)
-            case ")":
-                token = Token(TokenType.RPAREN, self.current)
-            case "{":
-                token = Token(TokenType.LBRACE, self.current)
-            case "}":
-                token = Token(TokenType.RBRACE, self.current)
-            case "[":
-                token = Token(TokenType.LBRACKET, self.current)
-            case "]":
-                token = Token(TokenType.RBRACKET, self.current)
-            case "":
-                token = Token(TokenType.EOF, "")
-            case '"':
-                token = Token(TokenType.STRING, self.read_string())
-            case _:
-                if self.is_letter(self.current):
-                    literal = self.read_identifier()
-                    return Token(keywords.get(literal, TokenType.IDENT), literal)
-                elif self.is_number(self.current):
-                    literal = self.read_number()
-                    return Token(keywords.get(literal, TokenType.INT), literal)
-                else:
-                    token = Token(TokenType.ILLEGAL, self.current)
-
-        self.read_char()
-        return token
-
-    def is_letter(self, char: str):
-        if not char:
-            return False
-
-        if not isinstance(char, str) or len(char) > 1:
-            raise ValueError(f"Expected string of length 1. Found: {char}")
-
-        is_lowercase = ord("a") <= ord(char) <= ord("z")
-        is_uppercase = ord("A") <= ord(char) <= ord("Z")
-        is_underscore = char == "_"
-
-        return is_lowercase | is_uppercase | is_underscore
-
-    def is_number(self, char: str):
-        if not char:
-            return False
-
-        if not isinstance(char, str) or len(char) > 1:
-            raise ValueError(f"Expected string of length 1. Found: {char}")
-
-        return ord("0") <= ord(char) <= ord("9")
-
-    def read_identifier(self):
-        start = self.position
-        while self.is_letter(self.current):
-            self.read_char()
-
-        return self.inputs[start : self.position]
-
-    def read_string(self):
-        start = self.position + 1
-        self.read_char()
-        while self.current not in ['"', ""]:
-            self.read_char()
-        return self.inputs[start : self.position]
-
-    def read_number(self):
-        start = self.position
-        while self.is_number(self.current):
-            self.read_char()
-
-        return self.inputs[start : self.position]
-
-    def skip_whitespace(self):
-        while self.current in {" ", "\n", "\t", "\r"}:
-            self.read_char()
-
-    def skip_comments(self):
-        while self.read_position < len(self.inputs) and self.current != "\n":
-            self.read_char()
-
-    def peek_char(self):
-        if self.read_position >= len(self.inputs):
-            return ""
+        self.start = start
+        self.tokens = self.scan()
+        if start:
+            self.first_line = inputs.count("\n", 0, start) + 1
+            self.line_starts = array("q", [inputs.rfind("\n", 0, start) + 1])
         else:
-            return self.inputs[self.read_position]
+            self.first_line = 1
+            self.line_starts = array("q", [0])
+
+    def next_token(self) -> Token:
+        return next(self.tokens)
+
+    def line_column(self, offset: int) -> tuple[int, int]:
+        """
+        The line and column, both counted from 1, of an offset in the source
+        """
+        idx = bisect_right(self.line_starts, offset)
+        return self.first_line + idx - 1, offset - self.line_starts[idx - 1] + 1
+
+    def scan(self) -> Iterator[Token]:
+        """
+        Tokens of the source, lexed a chunk at a time into a TokenTable whose
+        entries are turned into Tokens one by one, so only a chunk's table is
+        held at once
+        """
+        rest, offset = "", self.start
+        for chunk in read_chunks(self.inputs, self.start):
+            text = rest + chunk if rest else chunk
+            table, end = tokenize(text, offset, final=False)
+            self.add_lines(text, offset, end)
+            yield from table
+            rest, offset = text[end:], offset + end
+
+        table, end = tokenize(rest, offset)
+        self.add_lines(rest, offset, end)
+        yield from table
+
+        eof = Token(TokenType.EOF, "", start=offset + end)
+        while True:
+            yield eof
+
+    def add_lines(self, text: str, offset: int, end: int):
+        add = self.line_starts.append
+        for match in NEWLINE_PATTERN.finditer(text, 0, end):
+            add(match.end() + offset)
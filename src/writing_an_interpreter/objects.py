@@ -1,10 +1,18 @@
 from abc import abstractmethod
+from array import array
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable
+from typing import Callable, ClassVar
 
 from writing_an_interpreter.ast import BlockStatement, Identifier
-from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.environment import Environment, Frame
+from writing_an_interpreter.hamt import PersistentMap
+from writing_an_interpreter.vector import (
+    PersistentVector,
+    VectorSlice,
+    sequence_equal,
+)
 
 
 class ObjectType(str, Enum):
@@ -21,6 +29,13 @@ class ObjectType(str, Enum):
 
 
 class Object:
+    """
+    Values are __slots__ classes with their type stored on the class, so an
+    instance holds nothing but its value
+    """
+
+    __slots__ = ()
+
     type: ObjectType
 
     @abstractmethod
@@ -28,62 +43,128 @@ class Object:
         pass
 
 
-@dataclass(frozen=True)
+# as in CPython, integers in this range are allocated once and then shared
+SMALL_INTEGER_MIN = -5
+SMALL_INTEGER_MAX = 256
+
+
 class Integer(Object):
+    __slots__ = ("value",)
+
+    type = ObjectType.INTEGER
     value: int
-    type: ObjectType = ObjectType.INTEGER
+
+    def __new__(cls, value: int):
+        if SMALL_INTEGER_MIN <= value <= SMALL_INTEGER_MAX:
+            return SMALL_INTEGERS[value - SMALL_INTEGER_MIN]
+        integer = object.__new__(cls)
+        integer.value = value
+        return integer
 
     def hash(self):
-        return HashKey(type=self.type, value=self.value)
+        return self.value
 
     def inspect(self):
         return str(self.value)
 
+    def __eq__(self, other):
+        if type(other) is not Integer:
+            return NotImplemented
+        return self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return f"Integer(value={self.value!r})"
+
+
+def preallocate(value: int) -> Integer:
+    integer = object.__new__(Integer)
+    integer.value = value
+    return integer
+
+
+SMALL_INTEGERS = tuple(
+    preallocate(value) for value in range(SMALL_INTEGER_MIN, SMALL_INTEGER_MAX + 1)
+)
+
 
-@dataclass(frozen=True)
 class Boolean(Object):
+    """
+    There are only two booleans, TRUE and FALSE, and Boolean(value) returns
+    one of them
+    """
+
+    __slots__ = ("value",)
+
+    type = ObjectType.BOOLEAN
     value: bool
-    type: ObjectType = ObjectType.BOOLEAN
+
+    def __new__(cls, value: bool):
+        return TRUE if value else FALSE
 
     def inspect(self):
         return str(self.value)
 
     def hash(self):
-        return HashKey(type=self.type, value=1 if self.value else 0)
+        return BOOLEAN_KEYS[self.value]
+
+    def __repr__(self):
+        return f"Boolean(value={self.value!r})"
 
 
-@dataclass
 class Null(Object):
-    type: ObjectType = ObjectType.NULL
+    """
+    Null() always returns the single NULL object
+    """
+
+    __slots__ = ()
+
+    type = ObjectType.NULL
+
+    def __new__(cls):
+        return NULL
 
     def inspect(self):
         return "null"
 
+    def __repr__(self):
+        return "Null()"
+
 
-@dataclass
+TRUE = object.__new__(Boolean)
+TRUE.value = True
+FALSE = object.__new__(Boolean)
+FALSE.value = False
+NULL = object.__new__(Null)
+
+
+@dataclass(slots=True)
 class ReturnValue(Object):
     value: Object
-    type: ObjectType = ObjectType.RETURN_VALUE
+    type: ClassVar[ObjectType] = ObjectType.RETURN_VALUE
 
     def inspect(self):
         return self.value.inspect()
 
 
-@dataclass
+@dataclass(slots=True)
 class Error(Object):
     message: Object
-    type: ObjectType = ObjectType.RETURN_VALUE
+    type: ClassVar[ObjectType] = ObjectType.ERROR
 
     def inspect(self):
         return f"ERROR: {self.message}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Function(Object):
     parameters: list[Identifier]
     body: BlockStatement
-    environment: Environment
-    type: ObjectType = ObjectType.FUNCTION
+    environment: Environment | Frame
+    type: ClassVar[ObjectType] = ObjectType.FUNCTION
+    num_locals: int | None = None
 
     def inspect(self):
         args = ", ".join(str(p) for p in self.parameters)
@@ -92,67 +173,341 @@ class Function(Object):
         return f"fn({args}){{\n{body}\n}}"
 
 
-@dataclass(frozen=True)
 class String(Object):
+    __slots__ = ("value",)
+
+    type = ObjectType.STRING
     value: str
-    type: ObjectType = ObjectType.STRING
+
+    def __init__(self, value: str):
+        self.value = value
 
     def inspect(self):
         return f'"{self.value}"'
 
     def hash(self):
-        return HashKey(value=hash(self.value), type=ObjectType.STRING)
+        return self.value
+
+    def length(self) -> int:
+        return len(self.value)
 
+    def char_at(self, idx: int) -> "String":
+        return String(self.value[idx])
+
+    def slice(self, start: int, stop: int) -> "String":
+        return slice_string(self.value, start, stop)
 
-@dataclass
+    def __eq__(self, other):
+        if not isinstance(other, String):
+            return NotImplemented
+        return self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return f"String(value={self.value!r})"
+
+
+class StringView(String):
+    """
+    A substring that shares its text with the string it was sliced from
+    """
+
+    __slots__ = ("text", "start", "stop")
+
+    text: str
+    start: int
+    stop: int
+
+    def __init__(self, text: str, start: int, stop: int):
+        self.text = text
+        self.start = start
+        self.stop = stop
+
+    @property
+    def value(self) -> str:
+        return self.text[self.start : self.stop]
+
+    def length(self) -> int:
+        return self.stop - self.start
+
+    def char_at(self, idx: int) -> String:
+        if idx < 0:
+            idx += self.stop - self.start
+        return String(self.text[self.start + idx])
+
+    def slice(self, start: int, stop: int) -> String:
+        return slice_string(self.text, self.start + start, self.start + stop)
+
+
+def slice_string(text: str, start: int, stop: int) -> String:
+    """
+    Characters start to stop of text, shared rather than copied unless the
+    result is under a quarter of text, as with slice_vector
+    """
+    if (stop - start) * 4 < len(text):
+        return String(text[start:stop])
+    return StringView(text, start, stop)
+
+
+# concatenations up to this length are copied into a flat string straight away
+SHORT_STRING = 32
+
+
+class StringRope(String):
+    """
+    The concatenation of two strings, kept as a tree until its text is needed.
+
+    Indexing, hashing, comparing or printing a rope flattens it once and keeps
+    the result, so building a string by repeated concatenation costs linear
+    rather than quadratic time.
+    """
+
+    __slots__ = ("left", "right", "size", "flat")
+
+    left: String | None
+    right: String | None
+    size: int
+    flat: str | None
+
+    def __init__(self, left: String, right: String):
+        self.left = left
+        self.right = right
+        self.size = left.length() + right.length()
+        self.flat = None
+
+    @property
+    def value(self) -> str:
+        if self.flat is None:
+            parts = []
+            # iterative, as a string built one character at a time is a deep tree
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if type(node) is StringRope and node.flat is None:
+                    stack.append(node.right)
+                    stack.append(node.left)
+                else:
+                    parts.append(node.value)
+            self.flat = "".join(parts)
+            self.left = None
+            self.right = None
+        return self.flat
+
+    def length(self) -> int:
+        return self.size
+
+
+def concat(left: String, right: String) -> String:
+    """
+    Join two strings, copying short results and growing a rope otherwise
+    """
+    if left.length() + right.length() <= SHORT_STRING:
+        return String(left.value + right.value)
+    if (
+        type(left) is StringRope
+        and left.flat is None
+        and left.right.length() + right.length() <= SHORT_STRING
+    ):
+        # appending a little at a time fills the last leaf rather than making
+        # a new node per character
+        return StringRope(left.left, String(left.right.value + right.value))
+    return StringRope(left, right)
+
+
+@dataclass(slots=True)
 class Builtin(Object):
     function: Callable
-    type: ObjectType = ObjectType.BUILTIN
+    type: ClassVar[ObjectType] = ObjectType.BUILTIN
 
     def inspect(self):
         return "builtin function"
 
 
-@dataclass
+class IntArray(Sequence):
+    """
+    The elements of an array whose elements are all integers, stored
+    unboxed in a shared array('q') and boxed into Integers only as they are
+    read.
+
+    Like VectorSlice, an IntArray can be a window onto part of its data, so
+    rest and slice share storage rather than copying it. Appending to one
+    turns it into a PersistentVector, which an array of mixed types needs
+    anyway and which keeps later appends cheap.
+    """
+
+    __slots__ = ("data", "start", "stop")
+
+    data: array
+    start: int
+    stop: int
+
+    def __init__(self, data: array, start: int = 0, stop: int | None = None):
+        self.data = data
+        self.start = start
+        self.stop = len(data) if stop is None else stop
+
+    @classmethod
+    def from_values(cls, values: Iterable[int]) -> "IntArray | None":
+        """
+        An IntArray holding values, or None if one does not fit in 64 bits
+        """
+        try:
+            return cls(array("q", values))
+        except OverflowError:
+            return None
+
+    def values(self) -> array:
+        if self.start == 0 and self.stop == len(self.data):
+            return self.data
+        return self.data[self.start : self.stop]
+
+    def append(self, value: Object) -> PersistentVector:
+        return PersistentVector(self).append(value)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, idx):
+        length = self.stop - self.start
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(length)
+            if step != 1:
+                return IntArray(self.values()[idx])
+            stop = max(start, stop)
+            # as with slice_vector, small slices are copied
+            if (stop - start) * 4 < len(self.data):
+                return IntArray(self.data[self.start + start : self.start + stop])
+            return IntArray(self.data, self.start + start, self.start + stop)
+        if idx < 0:
+            idx += length
+        if not 0 <= idx < length:
+            raise IndexError("array index out of range")
+        return Integer(self.data[self.start + idx])
+
+    def __iter__(self):
+        return map(Integer, self.values())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IntArray):
+            return self.values() == other.values()
+        return sequence_equal(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"IntArray({self.values().tolist()!r})"
+
+
+def integer_values(elements: Sequence[Object]) -> array | list[int] | None:
+    """
+    The values of an array's elements if they are all integers, else None
+    """
+    if isinstance(elements, IntArray):
+        return elements.values()
+    values = []
+    for element in elements:
+        if type(element) is not Integer:
+            return None
+        values.append(element.value)
+    return values
+
+
+def integer_elements(values: Iterable[int]) -> IntArray | PersistentVector:
+    """
+    Elements holding values, unboxed unless one does not fit in 64 bits
+    """
+    values = list(values)
+    elements = IntArray.from_values(values) if values else None
+    if elements is None:
+        return PersistentVector(Integer(value) for value in values)
+    return elements
+
+
 class Array(Object):
-    elements: list[Object]
-    type: ObjectType = ObjectType.ARRAY
+    __slots__ = ("elements",)
+
+    type = ObjectType.ARRAY
+    elements: PersistentVector | VectorSlice | IntArray
+
+    def __init__(
+        self, elements: PersistentVector | VectorSlice | IntArray | list[Object]
+    ):
+        if not isinstance(elements, (PersistentVector, VectorSlice, IntArray)):
+            elements = list(elements)
+            values = integer_values(elements) if elements else None
+            if values is not None:
+                elements = IntArray.from_values(values) or elements
+            if not isinstance(elements, IntArray):
+                elements = PersistentVector(elements)
+        self.elements = elements
 
     def inspect(self):
         elements = ", ".join(e.inspect() for e in self.elements)
         return f"[{elements}]"
 
+    def __eq__(self, other):
+        if type(other) is not Array:
+            return NotImplemented
+        return self.elements == other.elements
 
-@dataclass(frozen=True)
-class HashKey:
-    value: int
-    type: ObjectType = ObjectType.ARRAY
+    __hash__ = None
 
+    def __repr__(self):
+        return f"Array(elements={self.elements!r})"
 
-@dataclass
-class HashPair:
-    key: Object
-    value: Object
+
+# Python's True and False equal 1 and 0, so boolean keys carry their type
+BOOLEAN_KEYS = ((ObjectType.BOOLEAN, False), (ObjectType.BOOLEAN, True))
 
 
-@dataclass
 class Hash(Object):
-    pairs: dict[HashKey, HashPair]
-    type: ObjectType = ObjectType.HASH
+    """
+    A mapping from the native keys returned by the hash methods of integers,
+    strings and booleans to the values stored under them
+    """
+
+    __slots__ = ("pairs",)
+
+    type = ObjectType.HASH
+    pairs: PersistentMap
+
+    def __init__(self, pairs: PersistentMap | dict):
+        if not isinstance(pairs, PersistentMap):
+            pairs = PersistentMap(pairs)
+        self.pairs = pairs
 
     def inspect(self):
         pairs = []
-        for pair in self.pairs.values():
-            key = pair.key.inspect()
-            val = pair.value.inspect()
-            pairs.append(f"{key}: {val}")
+        for key, val in self.pairs.items():
+            pairs.append(f"{key_object(key).inspect()}: {val.inspect()}")
         pairs = ", ".join(pairs)
         return f"{{{pairs}}}"
 
+    def __eq__(self, other):
+        if type(other) is not Hash:
+            return NotImplemented
+        return self.pairs == other.pairs
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Hash(pairs={self.pairs!r})"
+
+
+def key_object(key: int | str | tuple) -> Object:
+    """
+    The object that a native hash key was made from
+    """
+    match key:
+        case int():
+            return Integer(key)
+        case str():
+            return String(key)
+        case (ObjectType.BOOLEAN, value):
+            return Boolean(value)
+
 
 def is_hashable(obj: Object):
-    try:
-        hash(obj)
-        return True
-    except TypeError:
-        return False
+    return isinstance(obj, (Integer, String, Boolean))
@@ -0,0 +1,275 @@
+from dataclasses import replace
+from typing import Callable
+
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    Expression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    Node,
+    PrefixExpression,
+    Program,
+    ReturnStatement,
+    Statement,
+    StringLiteral,
+)
+from writing_an_interpreter.evaluator import (
+    eval_infix_expression,
+    eval_prefix_expression,
+    is_truthy,
+    native_bool_to_bool_object,
+)
+from writing_an_interpreter.objects import Boolean, Integer, Object, String
+from writing_an_interpreter.tokens import Token, TokenType
+
+# run the optimizer between parsing and evaluation
+ENABLED = True
+
+Pass = Callable[[Program], Program]
+
+Constant = IntegerLiteral | BooleanExpression | StringLiteral
+
+
+class Rewriter:
+    """
+    Base class for passes that rebuild the tree bottom-up.
+
+    Children are rewritten before their parent, so rewrite always sees
+    operands that have already been simplified. rewrite_statements gets each
+    block's statements after they have been rewritten, and may add or remove
+    statements.
+    """
+
+    def __call__(self, program: Program) -> Program:
+        return self.visit(program)
+
+    def rewrite(self, node: Node) -> Node:
+        return node
+
+    def rewrite_statements(self, statements: list[Statement]) -> list[Statement]:
+        return statements
+
+    def visit_statements(self, statements: list[Statement]) -> list[Statement]:
+        return self.rewrite_statements([self.visit(s) for s in statements])
+
+    def visit(self, node: Node | None) -> Node | None:
+        match node:
+            case Program():
+                return Program(self.visit_statements(node.statements))
+            case BlockStatement():
+                node = replace(node, statements=self.visit_statements(node.statements))
+            case ExpressionStatement():
+                node = replace(node, expression=self.visit(node.expression))
+            case LetStatement():
+                node = replace(node, value=self.visit(node.value))
+            case ReturnStatement():
+                node = replace(node, return_value=self.visit(node.return_value))
+            case PrefixExpression():
+                node = replace(node, right=self.visit(node.right))
+            case InfixExpression():
+                node = replace(
+                    node, left=self.visit(node.left), right=self.visit(node.right)
+                )
+            case IfExpression():
+                node = replace(
+                    node,
+                    condition=self.visit(node.condition),
+                    consequence=self.visit(node.consequence),
+                    alternative=self.visit(node.alternative),
+                )
+            case FunctionLiteral():
+                node = replace(node, body=self.visit(node.body))
+            case CallExpression():
+                node = replace(
+                    node,
+                    function=self.visit(node.function),
+                    arguments=[self.visit(a) for a in node.arguments],
+                )
+            case ArrayLiteral():
+                node = replace(node, elements=[self.visit(e) for e in node.elements])
+            case IndexExpression():
+                node = replace(
+                    node, left=self.visit(node.left), index=self.visit(node.index)
+                )
+            case HashLiteral():
+                pairs = {self.visit(k): self.visit(v) for k, v in node.pairs.items()}
+                node = replace(node, pairs=pairs)
+        return self.rewrite(node)
+
+
+class PassManager:
+    """
+    Runs a list of passes over a program in order.
+
+    A pass is any callable that takes a Program and returns a Program, so
+    new optimizations can be added with register without touching the
+    existing ones.
+    """
+
+    passes: list[Pass]
+
+    def __init__(self, passes: list[Pass] | None = None):
+        self.passes = [] if passes is None else list(passes)
+
+    def register(self, pass_: Pass) -> Pass:
+        self.passes.append(pass_)
+        return pass_
+
+    def run(self, program: Program) -> Program:
+        for pass_ in self.passes:
+            program = pass_(program)
+        return program
+
+
+def is_constant(node: Node | None) -> bool:
+    return isinstance(node, (IntegerLiteral, BooleanExpression, StringLiteral))
+
+
+def constant_value(node: Constant) -> Object:
+    match node:
+        case IntegerLiteral():
+            return Integer(node.value)
+        case BooleanExpression():
+            return native_bool_to_bool_object(node.value)
+        case StringLiteral():
+            return String(node.value)
+
+
+def to_literal(obj: Object) -> Constant | None:
+    match obj:
+        case Integer():
+            token = Token(type=TokenType.INT, literal=str(obj.value))
+            return IntegerLiteral(token=token, value=obj.value)
+        case Boolean():
+            if obj.value:
+                token = Token(type=TokenType.TRUE, literal="true")
+            else:
+                token = Token(type=TokenType.FALSE, literal="false")
+            return BooleanExpression(token=token, value=obj.value)
+        case String():
+            token = Token(type=TokenType.STRING, literal=obj.value)
+            return StringLiteral(token=token, value=obj.value)
+        case _:
+            # errors are left for the program to report when it runs
+            return None
+
+
+def is_pure(node: Expression | None) -> bool:
+    """
+    Whether evaluating node can neither fail nor have side effects
+    """
+    match node:
+        case IntegerLiteral() | BooleanExpression() | StringLiteral():
+            return True
+        case FunctionLiteral():
+            return True
+        case ArrayLiteral():
+            return all(is_pure(e) for e in node.elements)
+        case HashLiteral():
+            return all(is_constant(k) and is_pure(v) for k, v in node.pairs.items())
+        case _:
+            return False
+
+
+class ConstantFolding(Rewriter):
+    """
+    Replaces prefix and infix expressions on literals with their value
+    """
+
+    def rewrite(self, node: Node) -> Node:
+        match node:
+            case PrefixExpression() if is_constant(node.right):
+                result = eval_prefix_expression(
+                    node.operator, constant_value(node.right)
+                )
+            case InfixExpression() if is_constant(node.left) and is_constant(
+                node.right
+            ):
+                if node.operator == "/" and node.right.value == 0:
+                    return node
+                result = eval_infix_expression(
+                    node.operator, constant_value(node.left), constant_value(node.right)
+                )
+            case _:
+                return node
+
+        literal = to_literal(result)
+        return node if literal is None else literal
+
+
+def chosen_branch(node: IfExpression) -> BlockStatement | None:
+    if is_truthy(constant_value(node.condition)):
+        return node.consequence
+    return node.alternative
+
+
+class BranchPruning(Rewriter):
+    """
+    Replaces if expressions with constant conditions by the branch they take.
+
+    Blocks do not introduce a scope, so a branch used as a statement can be
+    spliced into the enclosing block. A branch used as a value is only
+    replaced when it is a single expression.
+    """
+
+    def rewrite(self, node: Node) -> Node:
+        if not isinstance(node, IfExpression) or not is_constant(node.condition):
+            return node
+
+        branch = chosen_branch(node)
+        if branch is not None and len(branch.statements) == 1:
+            [statement] = branch.statements
+            if isinstance(statement, ExpressionStatement):
+                return statement.expression
+        return node
+
+    def rewrite_statements(self, statements: list[Statement]) -> list[Statement]:
+        result = []
+        for idx, statement in enumerate(statements):
+            is_last = idx == len(statements) - 1
+            match statement:
+                case ExpressionStatement(expression=IfExpression()) if is_constant(
+                    statement.expression.condition
+                ):
+                    branch = chosen_branch(statement.expression)
+                    if branch is not None and branch.statements:
+                        result.extend(branch.statements)
+                    elif is_last:
+                        # an empty branch still gives the block its value
+                        result.append(statement)
+                case _:
+                    result.append(statement)
+        return result
+
+
+class DeadStatementElimination(Rewriter):
+    """
+    Drops expression statements whose value is never used and whose
+    evaluation cannot have an effect. The last statement of a block is its
+    value, so it is always kept.
+    """
+
+    def rewrite_statements(self, statements: list[Statement]) -> list[Statement]:
+        last = len(statements) - 1
+        return [
+            s
+            for idx, s in enumerate(statements)
+            if idx == last
+            or not (isinstance(s, ExpressionStatement) and is_pure(s.expression))
+        ]
+
+
+passes = PassManager([ConstantFolding(), BranchPruning(), DeadStatementElimination()])
+
+
+def optimize(program: Program) -> Program:
+    return passes.run(program)
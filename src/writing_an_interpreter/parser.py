@@ -1,5 +1,9 @@
+from bisect import bisect_left
+from collections.abc import Generator, Iterator
+from dataclasses import dataclass
 from enum import IntEnum, auto
-from typing import Callable
+from types import GeneratorType
+from typing import Any, Callable
 
 from writing_an_interpreter.ast import (
     ArrayLiteral,
@@ -19,6 +23,7 @@ from writing_an_interpreter.ast import (
     PrefixExpression,
     Program,
     ReturnStatement,
+    Statement,
     StringLiteral,
 )
 from writing_an_interpreter.lexer import Lexer
@@ -27,9 +32,32 @@ from writing_an_interpreter.tokens import Token, TokenType
 
 class ParseError(Exception):
     """
-    Raised when parsing fails
+    Raised when parsing fails, at an offset, line and column of the source
+    when the token it failed on came from one
     """
 
+    line: int | None
+    column: int | None
+    offset: int | None
+
+    def __init__(
+        self,
+        message: str,
+        line: int | None = None,
+        column: int | None = None,
+        offset: int | None = None,
+    ):
+        super().__init__(message)
+        self.line = line
+        self.column = column
+        self.offset = offset
+
+    def __str__(self):
+        message = super().__str__()
+        if self.line is None:
+            return message
+        return f"line {self.line}, column {self.column}: {message}"
+
 
 class Precedence(IntEnum):
     LOWEST = auto()
@@ -57,10 +85,27 @@ precedences = {
 
 
 class Parser:
+    """
+    A Pratt parser that keeps its place in nested input on explicit stacks
+    rather than by recursing.
+
+    Parse functions that need to parse something else first are generators.
+    They yield the precedence to parse an expression at, or another parse
+    function's generator, and are sent back what it parsed. run carries on
+    with what they yield on a stack of its own, and parse_expression keeps
+    prefix and infix parse functions waiting for an operand on a stack of
+    operators, so nesting is limited by memory rather than by Python's
+    recursion limit.
+    """
+
     lexer: Lexer
     token: Token
     next: Token
     errors: list[Exception]
+    # how many function literals enclose the current token
+    function_depth: int
+    # whether a return statement has been parsed outside any function
+    top_level_return: bool
     prefix_parse_functions: dict[TokenType, Callable]
     infix_parse_functions: dict[TokenType, Callable]
 
@@ -70,6 +115,8 @@ class Parser:
         self.next = self.lexer.next_token()
 
         self.errors = []
+        self.function_depth = 0
+        self.top_level_return = False
 
         self.prefix_parse_functions = {}
         self.register_prefix(TokenType.IDENT, self.parse_identifier)
@@ -112,23 +159,68 @@ class Parser:
             self.next_token()
             return True
         else:
-            self.errors.append(
-                ParseError(
-                    f"expected next token to be {token_type}, got {self.next.type} instead"
-                )
+            self.error(
+                f"expected next token to be {token_type}, got {self.next.type} instead",
+                self.next,
             )
             return False
 
-    def parse_program(self):
-        statements = []
+    def error(self, message: str, token: Token):
+        if token.start < 0:
+            self.errors.append(ParseError(message))
+            return
+        line, column = self.lexer.line_column(token.start)
+        self.errors.append(ParseError(message, line, column, token.start))
 
+    def parse_program(self):
+        return Program(statements=list(self.parse_statements()))
+
+    def parse_statements(self) -> Iterator[Statement]:
+        """
+        Yield top-level statements as soon as each is parsed, so that a
+        program can be run without holding all of it in memory
+        """
+        for _, statement, _, _ in self.parse_spans():
+            if statement:
+                yield statement
+
+    def parse_spans(
+        self,
+    ) -> Iterator[tuple[int, Statement | None, int, list[ParseError]]]:
+        """
+        Yield each top-level statement, or None where one failed to parse,
+        with the offset it starts at, the offset that the last token looked
+        at to parse it ends at, and its errors
+        """
         while self.token.type != TokenType.EOF:
-            if statement := self.parse_statement():
-                statements.append(statement)
+            start, num_errors = self.token.start, len(self.errors)
+            statement = self.run(self.parse_statement())
+            reach = token_end(self.next)
+            yield start, statement, reach, self.errors[num_errors:]
             self.next_token()
-        return Program(statements=statements)
 
-    def parse_statement(self):
+    def run(self, routine: Generator) -> Any:
+        """
+        Run a parse function to the end, along with everything it yields,
+        and return what it parsed
+        """
+        stack, value = [routine], None
+        while True:
+            try:
+                request = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value = stop.value
+                continue
+
+            if type(request) is Precedence:
+                request = self.parse_expression(request)
+            stack.append(request)
+            value = None
+
+    def parse_statement(self) -> Generator:
         match self.token.type:
             case TokenType.LET:
                 return self.parse_let_statement()
@@ -149,7 +241,7 @@ class Parser:
 
         self.next_token()
 
-        value = self.parse_expression(Precedence.LOWEST)
+        value = yield Precedence.LOWEST
 
         if self.peek_token_is(TokenType.SEMICOLON):
             self.next_token()
@@ -158,10 +250,12 @@ class Parser:
 
     def parse_return_statement(self):
         token = self.token
+        if not self.function_depth:
+            self.top_level_return = True
 
         self.next_token()
 
-        return_value = self.parse_expression(Precedence.LOWEST)
+        return_value = yield Precedence.LOWEST
 
         if self.peek_token_is(TokenType.SEMICOLON):
             self.next_token()
@@ -177,34 +271,63 @@ class Parser:
     def parse_expression_statement(self):
         token = self.token
 
-        expression = self.parse_expression(Precedence.LOWEST)
+        expression = yield Precedence.LOWEST
 
         if self.peek_token_is(TokenType.SEMICOLON):
             self.next_token()
 
         return ExpressionStatement(token=token, expression=expression)
 
-    def parse_expression(self, precedence: Precedence) -> Expression | None:
+    def parse_expression(self, precedence: Precedence) -> Generator:
+        """
+        Parse an expression whose operators bind tighter than precedence.
+
+        A prefix or infix parse function that yields a precedence waits on
+        operators, along with the precedence it was parsed at, until its
+        operand has been parsed at the one it asked for. Anything else that
+        parse functions yield is passed on to run.
+        """
+        operators: list[tuple[Generator, Precedence]] = []
+        routine, left = None, self.parse_prefix()
+        while True:
+            if routine is None and type(left) is GeneratorType:
+                routine, left = left, None
+
+            if routine is not None:
+                try:
+                    request = routine.send(left)
+                except StopIteration as stop:
+                    routine, left = None, stop.value
+                    continue
+
+                if type(request) is Precedence:
+                    operators.append((routine, precedence))
+                    routine, precedence = None, request
+                    left = self.parse_prefix()
+                else:
+                    left = yield request
+                continue
+
+            if (
+                not self.peek_token_is(TokenType.SEMICOLON)
+                and precedence < self.peek_precedence()
+                and (infix := self.infix_parse_functions.get(self.next.type))
+            ):
+                self.next_token()
+                left = infix(left)
+            elif operators:
+                routine, precedence = operators.pop()
+            else:
+                return left
+
+    def parse_prefix(self) -> Expression | Generator | None:
         prefix = self.prefix_parse_functions.get(self.token.type, None)
         if prefix is None:
-            self.errors.append(
-                ParseError(f"no prefix parse function for {self.token.type} found")
+            self.error(
+                f"no prefix parse function for {self.token.type} found", self.token
             )
             return None
-
-        left = prefix()
-
-        while (
-            not self.peek_token_is(TokenType.SEMICOLON)
-            and precedence < self.peek_precedence()
-        ):
-            infix = self.infix_parse_functions.get(self.next.type)
-            if infix is None:
-                return left
-            self.next_token()
-            left = infix(left)
-
-        return left
+        return prefix()
 
     def parse_identifier(self) -> Identifier:
         return Identifier(token=self.token, value=self.token.literal)
@@ -213,17 +336,16 @@ class Parser:
         try:
             value = int(self.token.literal)
         except ValueError:
-            error = ParseError(f"Could not parse {self.token.literal} as integer")
-            self.errors.append(error)
+            self.error(f"Could not parse {self.token.literal} as integer", self.token)
             return None
 
         return IntegerLiteral(token=self.token, value=value)
 
-    def parse_prefix_expression(self) -> PrefixExpression:
+    def parse_prefix_expression(self) -> Generator:
         token = self.token
         operator = self.token.literal
         self.next_token()
-        right = self.parse_expression(Precedence.PREFIX)
+        right = yield Precedence.PREFIX
 
         return PrefixExpression(token=token, operator=operator, right=right)
 
@@ -233,13 +355,13 @@ class Parser:
     def current_precedence(self) -> Precedence:
         return precedences.get(self.token.type, Precedence.LOWEST)
 
-    def parse_infix_expression(self, left: Expression) -> InfixExpression:
+    def parse_infix_expression(self, left: Expression) -> Generator:
         token = self.token
         operator = self.token.literal
         precedence = self.current_precedence()
 
         self.next_token()
-        right = self.parse_expression(precedence)
+        right = yield precedence
 
         return InfixExpression(token=token, left=left, operator=operator, right=right)
 
@@ -248,24 +370,24 @@ class Parser:
             token=self.token, value=self.current_token_is(TokenType.TRUE)
         )
 
-    def parse_grouped_expression(self) -> Expression | None:
+    def parse_grouped_expression(self) -> Generator:
         self.next_token()
 
-        expression = self.parse_expression(Precedence.LOWEST)
+        expression = yield Precedence.LOWEST
 
         if not self.expect_peek(TokenType.RPAREN):
             return None
 
         return expression
 
-    def parse_if_expression(self) -> Expression | None:
+    def parse_if_expression(self) -> Generator:
         token = self.token
 
         if not self.expect_peek(TokenType.LPAREN):
             return None
         self.next_token()
 
-        condition = self.parse_expression(Precedence.LOWEST)
+        condition = yield Precedence.LOWEST
 
         if not self.expect_peek(TokenType.RPAREN):
             return None
@@ -273,7 +395,7 @@ class Parser:
         if not self.expect_peek(TokenType.LBRACE):
             return None
 
-        consequence = self.parse_block_statement()
+        consequence = yield self.parse_block_statement()
 
         if self.next.type == TokenType.ELSE:
             self.next_token()
@@ -281,7 +403,7 @@ class Parser:
             if not self.expect_peek(TokenType.LBRACE):
                 return None
 
-            alternative = self.parse_block_statement()
+            alternative = yield self.parse_block_statement()
         else:
             alternative = None
 
@@ -292,19 +414,19 @@ class Parser:
             alternative=alternative,
         )
 
-    def parse_block_statement(self):
+    def parse_block_statement(self) -> Generator:
         token = self.token
         statements = []
 
         self.next_token()
         while self.token.type not in [TokenType.RBRACE, TokenType.EOF]:
-            statement = self.parse_statement()
+            statement = yield self.parse_statement()
             if statement:
                 statements.append(statement)
             self.next_token()
         return BlockStatement(token=token, statements=statements)
 
-    def parse_function_literal(self):
+    def parse_function_literal(self) -> Generator:
         token = self.token
 
         if not self.expect_peek(TokenType.LPAREN):
@@ -314,7 +436,9 @@ class Parser:
         if not self.expect_peek(TokenType.LBRACE):
             return None
 
-        body = self.parse_block_statement()
+        self.function_depth += 1
+        body = yield self.parse_block_statement()
+        self.function_depth -= 1
 
         return FunctionLiteral(token=token, parameters=parameters, body=body)
 
@@ -337,28 +461,24 @@ class Parser:
 
         return identifiers
 
-    def parse_call_expression(self, function: FunctionLiteral | Identifier):
+    def parse_call_expression(
+        self, function: FunctionLiteral | Identifier
+    ) -> Generator:
         token = self.token
-        arguments = self.parse_expression_list(TokenType.RPAREN)
+        arguments = yield from self.parse_expression_list(TokenType.RPAREN)
         return CallExpression(token=token, function=function, arguments=arguments)
 
     def parse_string_literal(self):
         token = self.token
-        # escape sequences
-        literal = (
-            token.literal.replace("\\n", "\n")
-            .replace("\\r", "\r")
-            .replace("\\t", "\t")
-            .replace("\\\\", "\\")
-        )
-        return StringLiteral(token=token, value=literal)
+        # the lexer has already replaced escape sequences
+        return StringLiteral(token=token, value=token.value)
 
-    def parse_array_literal(self):
+    def parse_array_literal(self) -> Generator:
         token = self.token
-        elements = self.parse_expression_list(TokenType.RBRACKET)
+        elements = yield from self.parse_expression_list(TokenType.RBRACKET)
         return ArrayLiteral(token=token, elements=elements)
 
-    def parse_expression_list(self, end: TokenType):
+    def parse_expression_list(self, end: TokenType) -> Generator:
         output = []
 
         if self.peek_token_is(end):
@@ -366,41 +486,41 @@ class Parser:
             return output
 
         self.next_token()
-        output.append(self.parse_expression(Precedence.LOWEST))
+        output.append((yield Precedence.LOWEST))
 
         while self.peek_token_is(TokenType.COMMA):
             self.next_token()
             self.next_token()
-            output.append(self.parse_expression(Precedence.LOWEST))
+            output.append((yield Precedence.LOWEST))
 
         if not self.expect_peek(end):
             return None
 
         return output
 
-    def parse_index_expression(self, left: Expression):
+    def parse_index_expression(self, left: Expression) -> Generator:
         token = self.token
 
         self.next_token()
-        index_ = self.parse_expression(Precedence.LOWEST)
+        index_ = yield Precedence.LOWEST
 
         if not self.expect_peek(TokenType.RBRACKET):
             return None
 
         return IndexExpression(token, left=left, index=index_)
 
-    def parse_hash_literal(self):
+    def parse_hash_literal(self) -> Generator:
         token = self.token
         pairs = {}
         while not self.peek_token_is(TokenType.RBRACE):
             self.next_token()
-            key = self.parse_expression(Precedence.LOWEST)
+            key = yield Precedence.LOWEST
 
             if not self.expect_peek(TokenType.COLON):
                 return None
 
             self.next_token()
-            value = self.parse_expression(Precedence.LOWEST)
+            value = yield Precedence.LOWEST
 
             pairs[key] = value
 
@@ -412,3 +532,136 @@ class Parser:
             return None
 
         return HashLiteral(token=token, pairs=pairs)
+
+
+def token_end(token: Token) -> int:
+    """
+    Where token ends in the source, or one past it for an unterminated string
+    """
+    if token.type == TokenType.STRING:
+        return token.start + len(token.literal) + 2
+    return token.start + len(token.literal)
+
+
+@dataclass
+class SourceMap:
+    """
+    Where each top-level statement of a program came from.
+
+    The lists have an entry per top-level statement, including None for
+    those that failed to parse. A statement's reach is where the last token
+    looked at to parse it ends, which is the first token of the next one.
+    Offsets of tokens inside a statement are into the text it was parsed
+    from, and its shift is how far it has moved since.
+    """
+
+    text: str
+    starts: list[int]
+    reaches: list[int]
+    shifts: list[int]
+    statements: list[Statement | None]
+    errors: list[list[ParseError]]
+
+    def add(self, spans: Iterator[tuple[int, Statement | None, int, list]]):
+        for start, statement, reach, errors in spans:
+            self.starts.append(start)
+            self.statements.append(statement)
+            self.reaches.append(reach)
+            self.shifts.append(0)
+            self.errors.append(errors)
+
+    def offset(self, idx: int, token: Token) -> int:
+        """
+        Where token, from the statement at idx, is in the current text
+        """
+        return token.start + self.shifts[idx]
+
+    def program(self) -> Program:
+        statements = [s for s in self.statements if s is not None]
+        return Program(statements=statements, source=self)
+
+    def all_errors(self) -> list[ParseError]:
+        return [error for errors in self.errors for error in errors]
+
+
+def parse_source(text: str) -> Program:
+    """
+    Parse text, keeping where each top-level statement came from so that
+    the program can be updated after an edit with reparse
+    """
+    source = SourceMap(text, [], [], [], [], [])
+    source.add(Parser(Lexer(text)).parse_spans())
+    return source.program()
+
+
+def reparse(program: Program, offset: int, removed: int, inserted: str) -> Program:
+    """
+    Parse a program from parse_source again after replacing the removed
+    characters at offset in its text by inserted.
+
+    Statements are kept while they and the token after them end before the
+    edit. The text after them is lexed and parsed again until a statement
+    starts where an old one did after the edit, from which point the old
+    statements are kept too, moved by the change in length, and the tokens
+    in them keep their old offsets, which SourceMap.offset corrects. Only
+    the statements the edit touches are lexed and parsed again, but building
+    the new text and the lists of offsets is still linear in the length of
+    the program.
+    """
+    old = program.source
+    if old is None:
+        raise ValueError("only programs from parse_source can be reparsed")
+    if offset < 0 or removed < 0 or offset + removed > len(old.text):
+        raise ValueError(f"edit at {offset} removing {removed} is outside the text")
+
+    text = old.text[:offset] + inserted + old.text[offset + removed :]
+    delta = len(inserted) - removed
+    edit_end = offset + len(inserted)
+
+    keep = bisect_left(old.reaches, offset)
+    source = SourceMap(
+        text,
+        old.starts[:keep],
+        old.reaches[:keep],
+        old.shifts[:keep],
+        old.statements[:keep],
+        old.errors[:keep],
+    )
+
+    restart = old.starts[keep] if keep else 0
+    for span in Parser(Lexer(text, restart)).parse_spans():
+        start = span[0]
+        if start >= edit_end:
+            idx = bisect_left(old.starts, start - delta)
+            if idx < len(old.starts) and old.starts[idx] == start - delta:
+                lines = inserted.count("\n") - old.text.count(
+                    "\n", offset, offset + removed
+                )
+                add_moved(source, old, idx, delta, lines)
+                break
+        source.add([span])
+    return source.program()
+
+
+def add_moved(source: SourceMap, old: SourceMap, idx: int, delta: int, lines: int):
+    """
+    Add the statements of old from idx on to source, moved by delta
+    characters and lines
+    """
+    source.starts.extend(start + delta for start in old.starts[idx:])
+    source.reaches.extend(reach + delta for reach in old.reaches[idx:])
+    source.shifts.extend(shift + delta for shift in old.shifts[idx:])
+    source.statements.extend(old.statements[idx:])
+    for errors in old.errors[idx:]:
+        source.errors.append(
+            [move_error(error, source.text, delta, lines) for error in errors]
+        )
+
+
+def move_error(error: ParseError, text: str, delta: int, lines: int) -> ParseError:
+    if error.offset is None:
+        return error
+    offset = error.offset + delta
+    line = error.line + lines
+    column = offset - text.rfind("\n", 0, offset)
+    return ParseError(error.args[0], line, column, offset)
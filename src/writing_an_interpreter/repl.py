@@ -1,13 +1,34 @@
 import sys
 from pathlib import Path
 
+from writing_an_interpreter import (
+    closure_compiler,
+    optimizer,
+    stackless,
+    transpiler,
+    unboxed,
+    vm,
+)
 from writing_an_interpreter.environment import Environment
 from writing_an_interpreter.evaluator import monkey_eval
-from writing_an_interpreter.lexer import Lexer
-from writing_an_interpreter.objects import Object
+from writing_an_interpreter.ast import Program
+from writing_an_interpreter.lexer import Lexer, Source
+from writing_an_interpreter.objects import Error, Object
 from writing_an_interpreter.parser import ParseError, Parser
 
 PROMPT = ">> "
+# top-level statements run together, so that engines and the optimizer see
+# whole programs without a large file being held in memory at once
+BATCH_SIZE = 1024
+
+ENGINES = {
+    "tree": monkey_eval,
+    "vm": vm.run,
+    "closures": closure_compiler.run,
+    "python": transpiler.run,
+    "stackless": stackless.run,
+    "unboxed": unboxed.run,
+}
 
 
 MONKEY_FACE = r'''           __,__ 
@@ -24,22 +45,65 @@ MONKEY_FACE = r'''           __,__
 '''
 
 
-def execute_string(text, environment) -> Object | None | list[Exception]:
-    lexer = Lexer(text)
-    parser = Parser(lexer)
-    program = parser.parse_program()
+def execute_string(
+    text: Source, environment, engine: str = "tree"
+) -> Object | None | list[Exception]:
+    """
+    Run the top-level statements of text in batches of BATCH_SIZE as they
+    are parsed.
+
+    text can also be a file or memory map, which is then read as it is
+    parsed. The statements parsed before a parse error still run. A return
+    at the top level may stop the program part way through a statement, so
+    from the first such statement onwards the rest of the program is parsed
+    and run with the current batch as one.
+    """
+    parser = Parser(Lexer(text))
+    statements = parser.parse_statements()
+
+    result, batch = None, []
+    for statement in statements:
+        if parser.errors:
+            break
+        if parser.top_level_return:
+            rest = [statement, *statements]
+            if parser.errors:
+                break
+            program = Program(statements=batch + rest)
+            return run_program(program, environment, engine)
+
+        batch.append(statement)
+        if len(batch) == BATCH_SIZE:
+            result = run_program(Program(statements=batch), environment, engine)
+            batch = []
+            if isinstance(result, Error):
+                return result
+
+    if batch:
+        result = run_program(Program(statements=batch), environment, engine)
+        if isinstance(result, Error):
+            return result
+
     if parser.errors:
+        # parse the rest of the program to report all of its errors
+        for _ in statements:
+            pass
         print(MONKEY_FACE)
         print("Woops! We ran into some monkey business here!")
         print("    parser errors:")
         for error in parser.errors:
             print("        " + str(error))
         return parser.errors
+    return result
+
 
-    return monkey_eval(program, environment)
+def run_program(program: Program, environment, engine: str) -> Object | None:
+    if optimizer.ENABLED:
+        program = optimizer.optimize(program)
+    return ENGINES[engine](program, environment)
 
 
-def load_standard_library(environment):
+def load_standard_library(environment, engine: str = "tree"):
     # Try to get the PyInstaller bundle path first
     if getattr(sys, 'frozen', False):
         base_path = Path(sys._MEIPASS)
@@ -49,7 +113,7 @@ def load_standard_library(environment):
         stdlib_path = Path(__file__).parent / "standard_library.🐵"
     
     try:
-        out = execute_string(stdlib_path.read_text(), environment)
+        out = execute_string(stdlib_path.read_text(), environment, engine)
         if isinstance(out, list):
             # failed to read standard library
             exit(1)
@@ -59,14 +123,14 @@ def load_standard_library(environment):
         exit(1)
 
 
-def start():
+def start(engine: str = "tree"):
     environment = Environment()
-    environment = load_standard_library(environment)
+    environment = load_standard_library(environment, engine)
 
     while True:
         print(PROMPT, end="")
         scanned = input()
-        evaluated = execute_string(scanned, environment)
+        evaluated = execute_string(scanned, environment, engine)
         if isinstance(evaluated, list):
             continue
         elif evaluated is not None:
@@ -0,0 +1,84 @@
+from writing_an_interpreter.ast import (
+    FunctionLiteral,
+    Identifier,
+    LetStatement,
+    Node,
+    children,
+    let_names,
+)
+
+
+class Resolver:
+    """
+    Assigns every Identifier inside a function a (depth, slot) address.
+
+    depth counts the function scopes between a use and the scope that binds
+    the name, and slot is the name's index in that scope's frame. Names bound
+    at the top level are left without an address and are looked up by name,
+    so the REPL can keep adding globals between programs.
+
+    Every let in a function gets its slot before any use is resolved, so a
+    function can use a local defined further down its body. Until the let
+    runs the slot is empty, and a lookup falls back on the enclosing
+    functions that bind the same name, and then on the globals, as it would
+    through a chain of Environments.
+    """
+
+    scopes: list[dict[str, int]]
+
+    def __init__(self):
+        self.scopes = []
+
+    def define(self, identifier: Identifier):
+        scope = self.scopes[-1]
+        if identifier.value not in scope:
+            scope[identifier.value] = len(scope)
+        set_address(identifier, (0, scope[identifier.value]))
+
+    def resolve_identifier(self, identifier: Identifier):
+        name = identifier.value
+        addresses = [
+            (depth, scope[name])
+            for depth, scope in enumerate(reversed(self.scopes))
+            if name in scope
+        ]
+        if addresses:
+            set_address(identifier, addresses[0], tuple(addresses[1:]))
+        else:
+            set_address(identifier, None)
+
+    def resolve(self, node: Node):
+        match node:
+            case Identifier():
+                self.resolve_identifier(node)
+            case LetStatement() if not self.scopes:
+                set_address(node.name, None)
+                self.resolve(node.value)
+            case LetStatement():
+                self.resolve(node.value)
+                self.define(node.name)
+            case FunctionLiteral():
+                scope = {p.value: idx for idx, p in enumerate(node.parameters)}
+                for name in let_names(node):
+                    scope.setdefault(name, len(scope))
+                self.scopes.append(scope)
+                self.resolve(node.body)
+                object.__setattr__(node, "num_locals", len(self.scopes.pop()))
+            case _:
+                for child in children(node):
+                    self.resolve(child)
+
+
+def set_address(
+    identifier: Identifier,
+    address: tuple[int, int] | None,
+    fallbacks: tuple[tuple[int, int], ...] = (),
+):
+    # addresses are annotations added after parsing, not part of the node's value
+    object.__setattr__(identifier, "address", address)
+    object.__setattr__(identifier, "fallbacks", fallbacks)
+
+
+def resolve(node: Node) -> Node:
+    Resolver().resolve(node)
+    return node
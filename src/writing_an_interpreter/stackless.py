@@ -0,0 +1,308 @@
+from enum import IntEnum, auto
+
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    Identifier,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    Node,
+    PrefixExpression,
+    Program,
+    ReturnStatement,
+    StringLiteral,
+)
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.evaluator import (
+    NULL,
+    eval_identifier,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    extend_function_environment,
+    is_error,
+    is_truthy,
+    native_bool_to_bool_object,
+    new_error,
+)
+from writing_an_interpreter.objects import (
+    Array,
+    Builtin,
+    Function,
+    Hash,
+    Integer,
+    Object,
+    String,
+    is_hashable,
+)
+
+# the deepest chain of non-tail calls a program may build before it gets an
+# Error instead of exhausting memory
+MAX_DEPTH = 100_000
+
+
+class Task(IntEnum):
+    EVAL = auto()  # (EVAL, node, environment)
+    POP = auto()
+    PREFIX = auto()  # (PREFIX, operator)
+    INFIX = auto()  # (INFIX, operator)
+    IF = auto()  # (IF, node, environment)
+    LET = auto()  # (LET, name, environment)
+    RETURN = auto()
+    CALL = auto()  # (CALL, argument count)
+    ARRAY = auto()  # (ARRAY, element count)
+    HASH = auto()  # (HASH, pair count)
+    INDEX = auto()
+    BOUNDARY = auto()  # (BOUNDARY, value stack height), ends a function call
+
+
+class Machine:
+    """
+    Evaluates the AST with explicit control and value stacks on the heap.
+
+    Every pending piece of work is a Task on the control stack instead of a
+    Python frame, so recursion depth is bounded by memory and max_depth rather
+    than by the interpreter's recursion limit.
+    """
+
+    control: list[tuple]
+    values: list[Object | None]
+    depth: int
+    max_depth: int
+
+    def __init__(self, max_depth: int = MAX_DEPTH):
+        self.control = []
+        self.values = []
+        self.depth = 0
+        self.max_depth = max_depth
+
+    def run(self, program: Program, environment: Environment) -> Object | None:
+        control = self.control
+        values = self.values
+        self.push_statements(program.statements, environment)
+
+        while control:
+            task = control.pop()
+            kind = task[0]
+
+            if kind == Task.EVAL:
+                result = self.eval(task[1], task[2])
+                if result is not None and is_error(result):
+                    return result
+            elif kind == Task.POP:
+                values.pop()
+            elif kind == Task.INFIX:
+                right = values.pop()
+                left = values.pop()
+                result = eval_infix_expression(task[1], left, right)
+                if is_error(result):
+                    return result
+                values.append(result)
+            elif kind == Task.IF:
+                condition = values.pop()
+                node, env = task[1], task[2]
+                if is_truthy(condition):
+                    self.push_statements(node.consequence.statements, env)
+                elif node.alternative is not None:
+                    self.push_statements(node.alternative.statements, env)
+                else:
+                    values.append(NULL)
+            elif kind == Task.CALL:
+                result = self.call(task[1])
+                if result is not None and is_error(result):
+                    return result
+            elif kind == Task.BOUNDARY:
+                self.depth -= 1
+            elif kind == Task.LET:
+                task[2][task[1]] = values.pop()
+                values.append(None)
+            elif kind == Task.RETURN:
+                value = values.pop()
+                while control and control[-1][0] != Task.BOUNDARY:
+                    control.pop()
+                if not control:
+                    return value
+                del values[control[-1][1] :]
+                values.append(value)
+            elif kind == Task.PREFIX:
+                result = eval_prefix_expression(task[1], values.pop())
+                if is_error(result):
+                    return result
+                values.append(result)
+            elif kind == Task.INDEX:
+                index_ = values.pop()
+                left = values.pop()
+                result = eval_index_expression(left, index_)
+                if is_error(result):
+                    return result
+                values.append(result)
+            elif kind == Task.ARRAY:
+                count = task[1]
+                elements = values[len(values) - count :]
+                del values[len(values) - count :]
+                values.append(Array(elements=elements))
+            elif kind == Task.HASH:
+                result = self.build_hash(task[1])
+                if is_error(result):
+                    return result
+                values.append(result)
+
+        return values[-1] if values else None
+
+    def push_statements(self, statements: list, environment: Environment):
+        """
+        Schedule a block so that exactly its last value is left behind.
+        """
+        control = self.control
+        if not statements:
+            self.values.append(None)
+            return
+
+        for idx in range(len(statements) - 1, -1, -1):
+            control.append((Task.EVAL, statements[idx], environment))
+            if idx != 0:
+                control.append((Task.POP,))
+
+    def eval(self, node: Node, environment: Environment) -> Object | None:
+        """
+        Push the value of a leaf node or schedule the work for a compound one.
+        """
+        control = self.control
+        values = self.values
+
+        match node:
+            case ExpressionStatement():
+                control.append((Task.EVAL, node.expression, environment))
+            case Identifier():
+                result = eval_identifier(node, environment)
+                if is_error(result):
+                    return result
+                values.append(result)
+            case IntegerLiteral():
+                values.append(Integer(value=node.value))
+            case InfixExpression():
+                control.append((Task.INFIX, node.operator))
+                control.append((Task.EVAL, node.right, environment))
+                control.append((Task.EVAL, node.left, environment))
+            case CallExpression():
+                control.append((Task.CALL, len(node.arguments)))
+                for argument in reversed(node.arguments):
+                    control.append((Task.EVAL, argument, environment))
+                control.append((Task.EVAL, node.function, environment))
+            case IfExpression():
+                control.append((Task.IF, node, environment))
+                control.append((Task.EVAL, node.condition, environment))
+            case ReturnStatement():
+                control.append((Task.RETURN,))
+                control.append((Task.EVAL, node.return_value, environment))
+            case LetStatement():
+                control.append((Task.LET, node.name.value, environment))
+                control.append((Task.EVAL, node.value, environment))
+            case BlockStatement():
+                self.push_statements(node.statements, environment)
+            case BooleanExpression():
+                values.append(native_bool_to_bool_object(node.value))
+            case StringLiteral():
+                values.append(String(value=node.value))
+            case PrefixExpression():
+                control.append((Task.PREFIX, node.operator))
+                control.append((Task.EVAL, node.right, environment))
+            case FunctionLiteral():
+                values.append(
+                    Function(
+                        parameters=node.parameters,
+                        body=node.body,
+                        environment=environment,
+                    )
+                )
+            case ArrayLiteral():
+                control.append((Task.ARRAY, len(node.elements)))
+                for element in reversed(node.elements):
+                    control.append((Task.EVAL, element, environment))
+            case IndexExpression():
+                control.append((Task.INDEX,))
+                control.append((Task.EVAL, node.index, environment))
+                control.append((Task.EVAL, node.left, environment))
+            case HashLiteral():
+                control.append((Task.HASH, len(node.pairs)))
+                for key, val in reversed(list(node.pairs.items())):
+                    control.append((Task.EVAL, val, environment))
+                    control.append((Task.EVAL, key, environment))
+            case _:
+                values.append(None)
+        return None
+
+    def call(self, num_args: int) -> Object | None:
+        control = self.control
+        values = self.values
+
+        args = values[len(values) - num_args :]
+        del values[len(values) - num_args :]
+        function = values.pop()
+
+        match function:
+            case Function():
+                if len(args) < len(function.parameters):
+                    return new_error(
+                        "wrong number of arguments: want={want}, got={got}",
+                        want=len(function.parameters),
+                        got=len(args),
+                    )
+
+                if control and control[-1][0] == Task.RETURN:
+                    # `return f(x)`: everything up to the caller's boundary
+                    # would be discarded anyway
+                    idx = len(control) - 1
+                    while idx >= 0 and control[idx][0] != Task.BOUNDARY:
+                        idx -= 1
+                    if idx >= 0:
+                        del control[idx + 1 :]
+                        del values[control[idx][1] :]
+
+                if not control or control[-1][0] != Task.BOUNDARY:
+                    # calls in tail position reuse the caller's boundary
+                    if self.depth >= self.max_depth:
+                        return new_error(
+                            "maximum call depth exceeded: {max_depth}",
+                            max_depth=self.max_depth,
+                        )
+                    self.depth += 1
+                    control.append((Task.BOUNDARY, len(values)))
+
+                environment = extend_function_environment(function, args)
+                self.push_statements(function.body.statements, environment)
+            case Builtin():
+                result = function.function(*args)
+                if result is not None and is_error(result):
+                    return result
+                values.append(result)
+            case _:
+                return new_error("not a function: {type}", type=function.type)
+        return None
+
+    def build_hash(self, num_pairs: int) -> Hash:
+        values = self.values
+        items = values[len(values) - 2 * num_pairs :]
+        del values[len(values) - 2 * num_pairs :]
+
+        pairs = {}
+        for idx in range(0, len(items), 2):
+            key, val = items[idx], items[idx + 1]
+            if not is_hashable(key):
+                return new_error("unusable as hash key: {key_type}", key_type=type(key))
+            pairs[key.hash()] = val
+        return Hash(pairs=pairs)
+
+
+def run(
+    program: Program, environment: Environment, max_depth: int = MAX_DEPTH
+) -> Object | None:
+    return Machine(max_depth=max_depth).run(program, environment)
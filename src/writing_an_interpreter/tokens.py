@@ -1,8 +1,24 @@
-from dataclasses import dataclass
-from enum import Enum
+from dataclasses import dataclass, field
+from enum import IntEnum
 
 
-class TokenType(str, Enum):
+class TokenType(IntEnum):
+    """
+    The kind of a token.
+
+    Members are small ints, so comparing and hashing them costs no more than
+    for an int. Each also keeps the text it is shown as in messages.
+    """
+
+    text: str
+
+    def __new__(cls, text: str):
+        code = len(cls.__members__)
+        member = int.__new__(cls, code)
+        member._value_ = code
+        member.text = text
+        return member
+
     ILLEGAL = "ILLEGAL"
     EOF = "EOF"
 
@@ -44,14 +60,21 @@ class TokenType(str, Enum):
     RETURN = "RETURN"
     FOR = "FOR"
 
-    def __hash__(self):
-        return hash(self.value)
+    def __str__(self):
+        return self.text
+
+    def __format__(self, format_spec):
+        return format(self.text, format_spec)
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     type: TokenType
     literal: str
+    # the text of a string with its escape sequences replaced
+    value: str | None = field(default=None, compare=False, repr=False)
+    # offset of the token in the source, or -1 for one made by hand
+    start: int = field(default=-1, compare=False, repr=False)
 
     def __hash__(self):
         return hash((self.type, self.literal))
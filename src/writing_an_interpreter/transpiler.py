@@ -0,0 +1,483 @@
+from dataclasses import dataclass
+from types import CodeType
+from typing import Callable
+
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    Identifier,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    Node,
+    PrefixExpression,
+    Program,
+    ReturnStatement,
+    StringLiteral,
+    children,
+    let_names,
+)
+from writing_an_interpreter.builtins import builtins, function_callers
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    MonkeyError,
+    check,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    is_truthy,
+    new_error,
+)
+from writing_an_interpreter.objects import (
+    Array,
+    Builtin,
+    Hash,
+    Integer,
+    Object,
+    ObjectType,
+    String,
+    is_hashable,
+)
+
+# print the generated Python source before running it
+DEBUG = False
+
+INDENT = "    "
+
+# code and constants by program_key, so that a program parsed again from the
+# same source, or rebuilt by the optimizer, is not transpiled again
+compiled_programs: dict[tuple, tuple[CodeType, list]] = {}
+COMPILED_PROGRAMS_LIMIT = 256
+
+integer_operators = {"+": "+", "-": "-", "*": "*", "/": "//"}
+comparison_operators = {"<": "<", ">": ">", "==": "==", "!=": "!="}
+
+
+@dataclass
+class PythonFunction(Object):
+    parameters: list[Identifier]
+    body: BlockStatement
+    function: Callable
+    type: ObjectType = ObjectType.FUNCTION
+
+    def inspect(self):
+        args = ", ".join(str(p) for p in self.parameters)
+        body = self.body
+
+        return f"fn({args}){{\n{body}\n}}"
+
+
+def local_name(name: str, shadowed: int = 0) -> str:
+    """
+    The Python name of a local, numbered by how many enclosing functions bind
+    the same name so that it does not hide theirs. Monkey names have no
+    digits, so the numbered names cannot clash.
+    """
+    return f"m_{name}{shadowed or ''}"
+
+
+class Transpiler:
+    """
+    Translates a Program into the source of a Python function.
+
+    Inside a function, a let-bound local starts as None and is unset until
+    its let runs, when a lookup falls back on the enclosing functions that
+    bind the same name and then on the globals. Reads are only guarded for
+    that until the let has run at the top level of the function's body.
+    """
+
+    lines: list[str]
+    indent: int
+    constants: list
+    # the Python name of each local, and whether it is sure to be set
+    scopes: list[dict[str, tuple[str, bool]]]
+    # how many if blocks enclose the current line in its function
+    branches: int
+    counter: int
+
+    def __init__(self):
+        self.lines = []
+        self.indent = 0
+        self.constants = []
+        self.scopes = []
+        self.branches = 0
+        self.counter = 0
+
+    def emit(self, line: str):
+        self.lines.append(INDENT * self.indent + line)
+
+    def temp(self) -> str:
+        self.counter += 1
+        return f"_t{self.counter}"
+
+    def local(self, name: str) -> str:
+        return local_name(name, sum(name in scope for scope in self.scopes))
+
+    def constant(self, obj) -> str:
+        self.constants.append(obj)
+        return f"_k{len(self.constants) - 1}"
+
+    def is_stable(self, expression: str) -> bool:
+        """
+        Constants and temporaries never change once assigned, so they can be
+        reordered or dropped freely.
+        """
+        return expression.startswith(("_k", "_t")) or expression in (
+            "TRUE",
+            "FALSE",
+            "NULL",
+            "None",
+        )
+
+    def transpile(self, program: Program) -> str:
+        self.emit("def __program__(__env__):")
+        self.indent += 1
+        self.emit("__store__ = __env__.store")
+        result = self.statements(program.statements)
+        if result is not None:
+            self.emit(f"return {result}")
+        self.indent -= 1
+        return "\n".join(self.lines) + "\n"
+
+    def statements(self, statements: list) -> str | None:
+        """
+        Emit every statement and return an expression for the last value, or
+        None when the last statement already returned.
+        """
+        result = "None"
+        for idx, statement in enumerate(statements):
+            is_last = idx == len(statements) - 1
+            match statement:
+                case ExpressionStatement():
+                    expression = self.expression(statement.expression)
+                    if is_last:
+                        result = expression
+                    elif not self.is_stable(expression):
+                        self.emit(expression)
+                case LetStatement():
+                    self.let_statement(statement)
+                case ReturnStatement():
+                    self.emit(f"return {self.expression(statement.return_value)}")
+                    if is_last:
+                        result = None
+        return result
+
+    def let_statement(self, node: LetStatement):
+        value = self.expression(node.value)
+        name = node.name.value
+        if self.scopes:
+            local, _ = self.scopes[-1][name]
+            self.emit(f"{local} = {value}")
+            if not self.branches:
+                self.scopes[-1][name] = (local, True)
+        else:
+            self.emit(f"__store__[{name!r}] = {value}")
+
+    def expressions(self, nodes: list[Node]) -> list[str]:
+        """
+        Compile sibling expressions, spilling earlier ones to temporaries
+        whenever a later sibling has to emit statements first.
+        """
+        results = []
+        for node in nodes:
+            mark = len(self.lines)
+            expression = self.expression(node)
+            if len(self.lines) != mark:
+                for idx, earlier in enumerate(results):
+                    if not self.is_stable(earlier):
+                        temp = self.temp()
+                        self.lines.insert(
+                            mark, INDENT * self.indent + f"{temp} = {earlier}"
+                        )
+                        mark += 1
+                        results[idx] = temp
+            results.append(expression)
+        return results
+
+    def expression(self, node: Node) -> str:
+        match node:
+            case IntegerLiteral():
+                return self.constant(Integer(value=node.value))
+            case StringLiteral():
+                return self.constant(String(value=node.value))
+            case BooleanExpression():
+                return "TRUE" if node.value else "FALSE"
+            case Identifier():
+                return self.identifier(node.value)
+            case PrefixExpression():
+                [right] = self.expressions([node.right])
+                if node.operator == "-":
+                    temp = self.temp()
+                    return (
+                        f"(Integer(-{temp}.value) if type({temp} := {right}) is Integer"
+                        f" else __prefix__('-', {temp}))"
+                    )
+                return f"__prefix__({node.operator!r}, {right})"
+            case InfixExpression():
+                return self.infix_expression(node)
+            case IfExpression():
+                return self.if_expression(node)
+            case FunctionLiteral():
+                return self.function_literal(node)
+            case CallExpression():
+                args = ", ".join(self.expressions([node.function, *node.arguments]))
+                return f"__call__({args})"
+            case ArrayLiteral():
+                elements = ", ".join(self.expressions(node.elements))
+                return f"Array(elements=[{elements}])"
+            case IndexExpression():
+                left, index_ = self.expressions([node.left, node.index])
+                return f"__index__({left}, {index_})"
+            case HashLiteral():
+                items = self.expressions(
+                    [n for pair in node.pairs.items() for n in pair]
+                )
+                pairs = ", ".join(
+                    f"({items[idx]}, {items[idx + 1]})"
+                    for idx in range(0, len(items), 2)
+                )
+                return f"__hash__([{pairs}])"
+            case _:
+                return "None"
+
+    def identifier(self, name: str) -> str:
+        expression = f"(__store__[{name!r}] if {name!r} in __store__ else __global__(__env__, {name!r}))"
+        for scope in self.scopes:
+            if name in scope:
+                local, is_set = scope[name]
+                if is_set:
+                    expression = local
+                else:
+                    expression = f"({local} if {local} is not None else {expression})"
+        return expression
+
+    def infix_expression(self, node: InfixExpression) -> str:
+        left, right = self.expressions([node.left, node.right])
+        op = node.operator
+        lhs, rhs = self.temp(), self.temp()
+        guard = (
+            f"(type({lhs} := {left}) is Integer) & (type({rhs} := {right}) is Integer)"
+        )
+        fallback = f"__infix__({op!r}, {lhs}, {rhs})"
+
+        if op in integer_operators:
+            python_op = integer_operators[op]
+            return f"(Integer({lhs}.value {python_op} {rhs}.value) if {guard} else {fallback})"
+        if op in comparison_operators:
+            python_op = comparison_operators[op]
+            return f"((TRUE if {lhs}.value {python_op} {rhs}.value else FALSE) if {guard} else {fallback})"
+        return f"__infix__({op!r}, {left}, {right})"
+
+    def condition(self, node: Node) -> str:
+        """
+        Comparisons on integers can skip the Boolean object entirely.
+        """
+        if isinstance(node, InfixExpression) and node.operator in comparison_operators:
+            left, right = self.expressions([node.left, node.right])
+            lhs, rhs = self.temp(), self.temp()
+            python_op = comparison_operators[node.operator]
+            guard = f"(type({lhs} := {left}) is Integer) & (type({rhs} := {right}) is Integer)"
+            fallback = f"__truthy__(__infix__({node.operator!r}, {lhs}, {rhs}))"
+            return f"({lhs}.value {python_op} {rhs}.value if {guard} else {fallback})"
+        return f"__truthy__({self.expression(node)})"
+
+    def block(self, block: BlockStatement | None) -> tuple[list[str], str | None]:
+        lines = self.lines
+        self.lines = []
+        self.indent += 1
+        self.branches += 1
+        if block is None:
+            result = "NULL"
+        else:
+            result = self.statements(block.statements)
+        self.branches -= 1
+        self.indent -= 1
+        emitted = self.lines
+        self.lines = lines
+        return emitted, result
+
+    def if_expression(self, node: IfExpression) -> str:
+        condition = self.condition(node.condition)
+        consequence_lines, consequence = self.block(node.consequence)
+        alternative_lines, alternative = self.block(node.alternative)
+
+        if not consequence_lines and not alternative_lines:
+            return f"({consequence} if {condition} else {alternative})"
+
+        temp = self.temp()
+        self.emit(f"if {condition}:")
+        self.lines.extend(consequence_lines)
+        if consequence is not None:
+            self.emit(f"{INDENT}{temp} = {consequence}")
+        self.emit("else:")
+        self.lines.extend(alternative_lines)
+        if alternative is not None:
+            self.emit(f"{INDENT}{temp} = {alternative}")
+        return temp
+
+    def function_literal(self, node: FunctionLiteral) -> str:
+        self.counter += 1
+        name = f"_fn{self.counter}"
+        scope = {}
+        for parameter in node.parameters:
+            scope[parameter.value] = (self.local(parameter.value), True)
+        params = "".join(f"{local}, " for local, _ in scope.values())
+        self.emit(f"def {name}({params}*_):")
+
+        self.indent += 1
+        for let_name in let_names(node):
+            if let_name not in scope:
+                scope[let_name] = (self.local(let_name), False)
+                self.emit(f"{scope[let_name][0]} = None")
+        self.scopes.append(scope)
+        branches, self.branches = self.branches, 0
+        result = self.statements(node.body.statements)
+        if result is not None:
+            self.emit(f"return {result}")
+        self.branches = branches
+        self.scopes.pop()
+        self.indent -= 1
+
+        parameters = self.constant(node.parameters)
+        body = self.constant(node.body)
+        return f"PythonFunction(parameters={parameters}, body={body}, function={name})"
+
+
+def lookup_global(environment: Environment, name: str) -> Object:
+    try:
+        return environment[name]
+    except KeyError:
+        if name in builtins:
+            return builtins[name]
+        raise MonkeyError(new_error(f"identifier not found: {name}"))
+
+
+def call(function: Object, *args: Object) -> Object | None:
+    if type(function) is PythonFunction:
+        if len(args) < len(function.parameters):
+            raise MonkeyError(
+                new_error(
+                    "wrong number of arguments: want={want}, got={got}",
+                    want=len(function.parameters),
+                    got=len(args),
+                )
+            )
+        return function.function(*args)
+    if type(function) is Builtin:
+        return check(function.function(*args))
+    raise MonkeyError(new_error("not a function: {type}", type=function.type))
+
+
+def call_python_function(function: PythonFunction, args: list[Object]) -> Object | None:
+    """
+    Call function from a builtin, which reports errors by returning them
+    """
+    try:
+        return call(function, *args)
+    except MonkeyError as e:
+        return e.error
+
+
+function_callers[PythonFunction] = call_python_function
+
+
+def build_hash(items: list[tuple[Object, Object]]) -> Hash:
+    pairs = {}
+    for key, val in items:
+        if not is_hashable(key):
+            raise MonkeyError(
+                new_error("unusable as hash key: {key_type}", key_type=type(key))
+            )
+        pairs[key.hash()] = val
+    return Hash(pairs=pairs)
+
+
+runtime = {
+    "Integer": Integer,
+    "Array": Array,
+    "PythonFunction": PythonFunction,
+    "TRUE": TRUE,
+    "FALSE": FALSE,
+    "NULL": NULL,
+    "__truthy__": is_truthy,
+    "__global__": lookup_global,
+    "__call__": call,
+    "__hash__": build_hash,
+    "__prefix__": lambda op, right: check(eval_prefix_expression(op, right)),
+    "__infix__": lambda op, left, right: check(eval_infix_expression(op, left, right)),
+    "__index__": lambda left, index_: check(eval_index_expression(left, index_)),
+}
+
+
+def transpile(program: Program) -> tuple[str, list]:
+    transpiler = Transpiler()
+    source = transpiler.transpile(program)
+    return source, transpiler.constants
+
+
+def program_key(program: Program) -> tuple:
+    """
+    What the generated code depends on, node by node: unlike str(program) it
+    tells a string from an identifier, and unlike the nodes it ignores where
+    in the source they came from
+    """
+    key = []
+    stack: list[Node] = [program]
+    while stack:
+        node = stack.pop()
+        nodes = children(node)
+        match node:
+            case StringLiteral() | IntegerLiteral():
+                extra = node.value
+            case LetStatement():
+                extra = node.name.value
+            case FunctionLiteral():
+                extra = tuple(parameter.value for parameter in node.parameters)
+            case _:
+                extra = None
+        token = getattr(node, "token", None)
+        key.append((type(node), token, extra, len(nodes)))
+        stack.extend(reversed(nodes))
+    return tuple(key)
+
+
+def compile_program(program: Program) -> tuple[CodeType, list]:
+    """
+    The compiled code and constants of a program, shared by every program
+    with the same key so that running it again skips transpiling as well as
+    compiling
+    """
+    key = program_key(program)
+    compiled = compiled_programs.get(key)
+    if compiled is None:
+        source, constants = transpile(program)
+        if DEBUG:
+            print(source)
+        if len(compiled_programs) >= COMPILED_PROGRAMS_LIMIT:
+            compiled_programs.clear()
+        code = compile(source, "<monkey>", "exec")
+        compiled = compiled_programs[key] = (code, constants)
+    return compiled
+
+
+def run(program: Program, environment: Environment) -> Object | None:
+    code, constants = compile_program(program)
+
+    namespace = dict(runtime)
+    namespace.update({f"_k{idx}": c for idx, c in enumerate(constants)})
+    exec(code, namespace)
+
+    try:
+        return namespace["__program__"](environment)
+    except MonkeyError as e:
+        return e.error
@@ -0,0 +1,679 @@
+import operator
+
+from writing_an_interpreter.ast import (
+    ArrayLiteral,
+    BlockStatement,
+    BooleanExpression,
+    CallExpression,
+    ExpressionStatement,
+    FunctionLiteral,
+    HashLiteral,
+    Identifier,
+    IfExpression,
+    IndexExpression,
+    InfixExpression,
+    IntegerLiteral,
+    LetStatement,
+    Node,
+    PrefixExpression,
+    Program,
+    ReturnStatement,
+    StringLiteral,
+)
+from writing_an_interpreter.builtins import builtins
+from writing_an_interpreter.environment import Environment, Frame
+from writing_an_interpreter.evaluator import (
+    MonkeyError,
+    TailCall,
+    check,
+    eval_global,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    new_error,
+)
+from writing_an_interpreter.hamt import PersistentMap
+from writing_an_interpreter.objects import (
+    BOOLEAN_KEYS,
+    FALSE,
+    NULL,
+    TRUE,
+    Array,
+    Boolean,
+    Builtin,
+    Function,
+    Hash,
+    Integer,
+    Null,
+    Object,
+    ReturnValue,
+    String,
+)
+from writing_an_interpreter.resolver import resolve
+from writing_an_interpreter.vector import PersistentVector, VectorSlice
+
+Value = (
+    int | str | bool | None | PersistentVector | VectorSlice | PersistentMap | Object
+)
+
+
+class NoValue:
+    """
+    The result of a statement that produces nothing, such as a let. None is
+    taken by null.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "NO_VALUE"
+
+
+NO_VALUE = NoValue()
+
+
+class Unbound:
+    """
+    The contents of a slot whose let has not run yet
+    """
+
+    __slots__ = ()
+
+
+UNBOUND = Unbound()
+
+# globals bound from Python, such as by a benchmark, hold boxed objects
+BOXED_TYPES = frozenset({Null, Boolean, Integer, String, Array, Hash})
+# the unboxed form of boxed globals by id, with the object to check the id
+# against, so that reading one in a loop only converts it once
+unboxed_globals: dict[int, tuple[Object, Value]] = {}
+UNBOXED_GLOBALS_LIMIT = 64
+
+integer_operators = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.floordiv,
+    "<": operator.lt,
+    ">": operator.gt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+string_operators = {
+    "+": operator.add,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def box(value: Value) -> Object | None:
+    match value:
+        case None:
+            return NULL
+        case bool():
+            return TRUE if value else FALSE
+        case int():
+            return Integer(value)
+        case str():
+            return String(value)
+        case PersistentVector() | VectorSlice():
+            return Array([box(element) for element in value])
+        case PersistentMap():
+            return Hash(PersistentMap((k, box(v)) for k, v in value.items()))
+        case NoValue():
+            return None
+        case _:
+            return value
+
+
+def unbox(obj: Object | None) -> Value:
+    match obj:
+        case None:
+            return NO_VALUE
+        case Null():
+            return None
+        case Boolean() | Integer() | String():
+            return obj.value
+        case Array():
+            return PersistentVector(unbox(element) for element in obj.elements)
+        case Hash():
+            return PersistentMap((k, unbox(v)) for k, v in obj.pairs.items())
+        case _:
+            return obj
+
+
+def hash_key(value: Value) -> int | str | tuple | None:
+    """
+    The key value is stored under in a hash, or None if it is not hashable
+    """
+    value_type = type(value)
+    if value_type is int or value_type is str:
+        return value
+    if value_type is bool:
+        return BOOLEAN_KEYS[value]
+    return None
+
+
+def unboxed_eval(node: Node, environment: Environment | Frame) -> Value:
+    evaluate = node_evaluators.get(type(node))
+    if evaluate is None:
+        return NO_VALUE
+    return evaluate(node, environment)
+
+
+def eval_program(program: Program, environment: Environment) -> Value:
+    result = NO_VALUE
+    for statement in program.statements:
+        result = unboxed_eval(statement, environment)
+        if type(result) is ReturnValue:
+            return result.value
+    return result
+
+
+def eval_block_statement(block: BlockStatement, environment: Environment | Frame):
+    result = NO_VALUE
+    for statement in block.statements:
+        result = unboxed_eval(statement, environment)
+        if type(result) is ReturnValue:
+            return result
+    return result
+
+
+def eval_expression_statement(node: ExpressionStatement, environment):
+    return unboxed_eval(node.expression, environment)
+
+
+def eval_integer_literal(node: IntegerLiteral, environment) -> int:
+    return node.value
+
+
+def eval_string_literal(node: StringLiteral, environment) -> str:
+    return node.value
+
+
+def eval_boolean_expression(node: BooleanExpression, environment) -> bool:
+    return node.value
+
+
+def eval_prefix_node(node: PrefixExpression, environment) -> Value:
+    right = unboxed_eval(node.right, environment)
+    if node.operator == "!":
+        return right is None or right is False
+    if node.operator == "-" and type(right) is int:
+        return -right
+    return unbox(check(eval_prefix_expression(node.operator, box(right))))
+
+
+def eval_infix_node(node: InfixExpression, environment) -> Value:
+    left = unboxed_eval(node.left, environment)
+    right = unboxed_eval(node.right, environment)
+
+    left_type = type(left)
+    if left_type is type(right):
+        if left_type is int:
+            fast = integer_operators.get(node.operator)
+        elif left_type is str:
+            fast = string_operators.get(node.operator)
+        else:
+            fast = None
+        if fast is not None:
+            return fast(left, right)
+    return unbox(check(eval_infix_expression(node.operator, box(left), box(right))))
+
+
+def eval_if_expression(node: IfExpression, environment) -> Value:
+    condition = unboxed_eval(node.condition, environment)
+    if condition is not None and condition is not False:
+        return unboxed_eval(node.consequence, environment)
+    elif node.alternative is not None:
+        return unboxed_eval(node.alternative, environment)
+    return None
+
+
+def eval_return_statement(node: ReturnStatement, environment) -> ReturnValue:
+    return ReturnValue(unboxed_eval(node.return_value, environment))
+
+
+def eval_let_statement(node: LetStatement, environment) -> NoValue:
+    val = unboxed_eval(node.value, environment)
+    address = node.name.address
+    if address is not None and type(environment) is Frame:
+        environment.slots[address[1]] = val
+    else:
+        environment[node.name.value] = val
+    return NO_VALUE
+
+
+def eval_identifier(identifier: Identifier, environment) -> Value:
+    if type(environment) is Frame:
+        address = identifier.address
+        if address is not None:
+            frame = environment
+            depth, slot = address
+            for _ in range(depth):
+                frame = frame.outer
+            value = frame.slots[slot]
+            if value is UNBOUND:
+                return eval_unbound(identifier, environment)
+            return value
+        environment = environment.globals
+    return eval_name(identifier, environment)
+
+
+def eval_unbound(identifier: Identifier, frame: Frame) -> Value:
+    """
+    Look up a local whose let has not run in the enclosing functions that
+    bind the same name and then by name
+    """
+    for depth, slot in identifier.fallbacks:
+        outer = frame
+        for _ in range(depth):
+            outer = outer.outer
+        value = outer.slots[slot]
+        if value is not UNBOUND:
+            return value
+    return eval_name(identifier, frame.globals)
+
+
+def eval_name(identifier: Identifier, environment: Environment) -> Value:
+    name = identifier.value
+    while environment.outer is not None:
+        if name in environment.store:
+            return unbox_global(environment.store[name])
+        environment = environment.outer
+    return unbox_global(check(eval_global(identifier, environment)))
+
+
+def unbox_global(value: Object | Value) -> Value:
+    """
+    Unbox a global as it is read, leaving the caller's object in place
+    """
+    if type(value) not in BOXED_TYPES:
+        return value
+    entry = unboxed_globals.get(id(value))
+    if entry is None or entry[0] is not value:
+        if len(unboxed_globals) >= UNBOXED_GLOBALS_LIMIT:
+            unboxed_globals.clear()
+        entry = unboxed_globals[id(value)] = (value, unbox(value))
+    return entry[1]
+
+
+def eval_function_literal(node: FunctionLiteral, environment) -> Function:
+    return Function(
+        parameters=node.parameters,
+        body=node.body,
+        environment=environment,
+        num_locals=node.num_locals,
+    )
+
+
+def eval_call_expression(node: CallExpression, environment) -> Value:
+    function = unboxed_eval(node.function, environment)
+    args = [unboxed_eval(argument, environment) for argument in node.arguments]
+    return apply_function(function, args)
+
+
+def eval_array_literal(node: ArrayLiteral, environment) -> PersistentVector:
+    return PersistentVector(unboxed_eval(e, environment) for e in node.elements)
+
+
+def eval_hash_literal(node: HashLiteral, environment) -> PersistentMap:
+    pairs = {}
+    for key_node, value_node in node.pairs.items():
+        key = unboxed_eval(key_node, environment)
+        hashed = hash_key(key)
+        if hashed is None:
+            raise MonkeyError(
+                new_error("unusable as hash key: {key_type}", key_type=type(box(key)))
+            )
+        pairs[hashed] = unboxed_eval(value_node, environment)
+    return PersistentMap(pairs)
+
+
+def eval_index_node(node: IndexExpression, environment) -> Value:
+    left = unboxed_eval(node.left, environment)
+    index_ = unboxed_eval(node.index, environment)
+
+    left_type = type(left)
+    if left_type is PersistentMap:
+        hashed = hash_key(index_)
+        if hashed is not None:
+            return left.get(hashed)
+    elif type(index_) is int and (
+        left_type is PersistentVector or left_type is VectorSlice or left_type is str
+    ):
+        if 0 <= index_ < len(left):
+            return left[index_]
+        return None
+    return unbox(check(eval_index_expression(box(left), box(index_))))
+
+
+def apply_function(function: Value, args: list[Value]) -> Value:
+    while type(function) is Function:
+        if len(args) < len(function.parameters):
+            raise MonkeyError(
+                new_error(
+                    "wrong number of arguments: want={want}, got={got}",
+                    want=len(function.parameters),
+                    got=len(args),
+                )
+            )
+        frame = extend_function_environment(function, args)
+        result = eval_tail_block(function.body, frame)
+        if type(result) is TailCall:
+            function, args = result.function, result.args
+            continue
+        if type(result) is ReturnValue:
+            return result.value
+        return result
+
+    if type(function) is Builtin:
+        return call_builtin(function, args)
+    raise MonkeyError(new_error("not a function: {type}", type=box(function).type))
+
+
+def eval_tail_block(block: BlockStatement, frame: Frame, tail: bool = True) -> Value:
+    """
+    Evaluate a function body, returning calls in tail position as TailCalls,
+    as evaluator.eval_tail_block does
+    """
+    result = NO_VALUE
+    last = len(block.statements) - 1
+
+    for idx, statement in enumerate(block.statements):
+        match statement:
+            case ReturnStatement(return_value=CallExpression()):
+                return eval_tail_call(statement.return_value, frame)
+            case ExpressionStatement(expression=CallExpression()) if (
+                tail and idx == last
+            ):
+                return eval_tail_call(statement.expression, frame)
+            case ExpressionStatement(expression=IfExpression()):
+                result = eval_tail_if(statement.expression, frame, tail and idx == last)
+            case _:
+                result = unboxed_eval(statement, frame)
+
+        if type(result) is TailCall or type(result) is ReturnValue:
+            return result
+
+    return result
+
+
+def eval_tail_if(node: IfExpression, frame: Frame, tail: bool) -> Value:
+    condition = unboxed_eval(node.condition, frame)
+    if condition is not None and condition is not False:
+        return eval_tail_block(node.consequence, frame, tail)
+    elif node.alternative is not None:
+        return eval_tail_block(node.alternative, frame, tail)
+    return None
+
+
+def eval_tail_call(node: CallExpression, frame: Frame) -> TailCall:
+    function = unboxed_eval(node.function, frame)
+    args = [unboxed_eval(argument, frame) for argument in node.arguments]
+    return TailCall(function=function, args=args)
+
+
+def extend_function_environment(function: Function, args: list[Value]) -> Frame:
+    slots = args[: len(function.parameters)]
+    slots.extend([UNBOUND] * (function.num_locals - len(slots)))
+    outer = function.environment
+    if type(outer) is Frame:
+        return Frame(slots, outer, outer.globals)
+    return Frame(slots, None, outer)
+
+
+def call_builtin(builtin: Builtin, args: list[Value]) -> Value:
+    native = native_builtins.get(builtin.function)
+    if native is not None:
+        result = native(*args)
+        if result is not NotImplemented:
+            return result
+    return unbox(check(builtin.function(*[box(arg) for arg in args])))
+
+
+def is_sequence(value: Value) -> bool:
+    value_type = type(value)
+    return (
+        value_type is PersistentVector or value_type is VectorSlice or value_type is str
+    )
+
+
+# Versions of builtins that work on unboxed values directly. Each returns
+# NotImplemented for arguments it does not handle, including every error
+# case, and the boxed builtin is called instead.
+
+
+def native_len(*args):
+    if len(args) == 1 and (is_sequence(args[0]) or type(args[0]) is PersistentMap):
+        return len(args[0])
+    return NotImplemented
+
+
+def native_first(*args):
+    if len(args) == 1 and is_sequence(args[0]):
+        return args[0][0] if len(args[0]) else None
+    return NotImplemented
+
+
+def native_last(*args):
+    if len(args) == 1 and is_sequence(args[0]):
+        return args[0][-1] if len(args[0]) else None
+    return NotImplemented
+
+
+def native_rest(*args):
+    if len(args) == 1 and is_sequence(args[0]):
+        return args[0][1:] if len(args[0]) else None
+    return NotImplemented
+
+
+def native_slice(*args):
+    if len(args) == 3 and type(args[1]) is int and type(args[2]) is int:
+        [arg, start, stop] = args
+        if type(arg) is str:
+            start, stop, _ = slice(start, stop).indices(len(arg))
+            return arg[start : max(start, stop)]
+        if is_sequence(arg):
+            return arg[start:stop]
+    return NotImplemented
+
+
+def native_push(*args):
+    if len(args) == 2 and is_sequence(args[0]) and type(args[0]) is not str:
+        return args[0].append(args[1])
+    return NotImplemented
+
+
+def native_contains(*args):
+    if len(args) == 2 and type(args[0]) is PersistentMap:
+        hashed = hash_key(args[1])
+        if hashed is not None:
+            return hashed in args[0]
+    return NotImplemented
+
+
+def native_keys(*args):
+    if len(args) == 1 and type(args[0]) is PersistentMap:
+        return PersistentVector(k[1] if type(k) is tuple else k for k in args[0])
+    return NotImplemented
+
+
+def native_values(*args):
+    if len(args) == 1 and type(args[0]) is PersistentMap:
+        return PersistentVector(args[0].values())
+    return NotImplemented
+
+
+def native_put(*args):
+    if len(args) == 3 and type(args[0]) is PersistentMap:
+        hashed = hash_key(args[1])
+        if hashed is not None:
+            return args[0].put(hashed, args[2])
+    return NotImplemented
+
+
+def native_delete(*args):
+    if len(args) == 2 and type(args[0]) is PersistentMap:
+        hashed = hash_key(args[1])
+        if hashed is not None:
+            return args[0].delete(hashed)
+    return NotImplemented
+
+
+def native_merge(*args):
+    if len(args) == 2 and type(args[0]) is type(args[1]) is PersistentMap:
+        return args[0].merge(args[1])
+    return NotImplemented
+
+
+def integer_list(value: Value) -> list[int] | None:
+    if type(value) is PersistentVector or type(value) is VectorSlice:
+        values = list(value)
+        if all(type(v) is int for v in values):
+            return values
+    return None
+
+
+def native_sum(*args):
+    values = integer_list(args[0]) if len(args) == 1 else None
+    return NotImplemented if values is None else sum(values)
+
+
+def native_min(*args):
+    values = integer_list(args[0]) if len(args) == 1 else None
+    return NotImplemented if values is None else min(values, default=None)
+
+
+def native_max(*args):
+    values = integer_list(args[0]) if len(args) == 1 else None
+    return NotImplemented if values is None else max(values, default=None)
+
+
+def native_map(*args):
+    if len(args) != 2 or not is_sequence(args[0]):
+        return NotImplemented
+    [values, function] = args
+    return PersistentVector(apply_function(function, [value]) for value in values)
+
+
+def native_filter(*args):
+    if len(args) != 2 or not is_sequence(args[0]):
+        return NotImplemented
+    [values, function] = args
+    kept = []
+    for value in values:
+        keep = apply_function(function, [value])
+        if keep is not None and keep is not False:
+            kept.append(value)
+    return PersistentVector(kept)
+
+
+def native_reduce(*args):
+    if len(args) != 3 or not is_sequence(args[0]):
+        return NotImplemented
+    [values, result, function] = args
+    for value in values:
+        result = apply_function(function, [result, value])
+    return result
+
+
+def are_strings(args: tuple, count: int) -> bool:
+    return len(args) == count and all(type(arg) is str for arg in args)
+
+
+def native_split(*args):
+    if are_strings(args, 2) and args[1]:
+        return PersistentVector(args[0].split(args[1]))
+    return NotImplemented
+
+
+def native_join(*args):
+    if len(args) == 2 and is_sequence(args[0]) and type(args[1]) is str:
+        values = list(args[0])
+        if all(type(value) is str for value in values):
+            return args[1].join(values)
+    return NotImplemented
+
+
+def native_trim(*args):
+    return args[0].strip() if are_strings(args, 1) else NotImplemented
+
+
+def native_find(*args):
+    return args[0].find(args[1]) if are_strings(args, 2) else NotImplemented
+
+
+def native_lines(*args):
+    if are_strings(args, 1):
+        return PersistentVector(args[0].splitlines())
+    return NotImplemented
+
+
+def native_starts_with(*args):
+    return args[0].startswith(args[1]) if are_strings(args, 2) else NotImplemented
+
+
+def native_chars(*args):
+    return PersistentVector(args[0]) if are_strings(args, 1) else NotImplemented
+
+
+native_builtins = {
+    builtins[name].function: native
+    for name, native in [
+        ("len", native_len),
+        ("first", native_first),
+        ("last", native_last),
+        ("rest", native_rest),
+        ("slice", native_slice),
+        ("push", native_push),
+        ("contains", native_contains),
+        ("keys", native_keys),
+        ("values", native_values),
+        ("put", native_put),
+        ("delete", native_delete),
+        ("merge", native_merge),
+        ("sum", native_sum),
+        ("min", native_min),
+        ("max", native_max),
+        ("map", native_map),
+        ("filter", native_filter),
+        ("reduce", native_reduce),
+        ("split", native_split),
+        ("join", native_join),
+        ("trim", native_trim),
+        ("find", native_find),
+        ("lines", native_lines),
+        ("starts_with", native_starts_with),
+        ("chars", native_chars),
+    ]
+}
+
+node_evaluators = {
+    Program: eval_program,
+    BlockStatement: eval_block_statement,
+    ExpressionStatement: eval_expression_statement,
+    IntegerLiteral: eval_integer_literal,
+    BooleanExpression: eval_boolean_expression,
+    PrefixExpression: eval_prefix_node,
+    InfixExpression: eval_infix_node,
+    IfExpression: eval_if_expression,
+    ReturnStatement: eval_return_statement,
+    LetStatement: eval_let_statement,
+    Identifier: eval_identifier,
+    FunctionLiteral: eval_function_literal,
+    CallExpression: eval_call_expression,
+    StringLiteral: eval_string_literal,
+    ArrayLiteral: eval_array_literal,
+    IndexExpression: eval_index_node,
+    HashLiteral: eval_hash_literal,
+}
+
+
+def run(program: Program, environment: Environment) -> Object | None:
+    resolve(program)
+    try:
+        return box(eval_program(program, environment))
+    except MonkeyError as e:
+        return e.error
@@ -0,0 +1,220 @@
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class PersistentVector(Sequence):
+    """
+    An immutable sequence stored as a 32-way trie with a tail buffer.
+
+    append returns a new vector that shares every full leaf with the old one,
+    copying only the tail and the path to it, so building a vector one element
+    at a time is linear rather than quadratic. Nodes are plain lists that are
+    never mutated once a vector refers to them.
+    """
+
+    __slots__ = ("count", "shift", "root", "tail")
+
+    count: int
+    shift: int
+    root: list
+    tail: list
+
+    def __init__(self, items: Iterable[Any] = ()):
+        items = list(items)
+        self.count = len(items)
+        tail_offset = (self.count - 1) & ~MASK if self.count else 0
+
+        nodes = [items[i : i + WIDTH] for i in range(0, tail_offset, WIDTH)]
+        shift = BITS
+        while len(nodes) > WIDTH:
+            nodes = [nodes[i : i + WIDTH] for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+
+        self.shift = shift
+        self.root = nodes
+        self.tail = items[tail_offset:]
+
+    @classmethod
+    def from_parts(
+        cls, count: int, shift: int, root: list, tail: list
+    ) -> "PersistentVector":
+        vector = cls.__new__(cls)
+        vector.count = count
+        vector.shift = shift
+        vector.root = root
+        vector.tail = tail
+        return vector
+
+    def tail_offset(self) -> int:
+        return self.count - len(self.tail)
+
+    def leaf_for(self, idx: int) -> list:
+        if idx >= self.count - len(self.tail):
+            return self.tail
+        node = self.root
+        for level in range(self.shift, 0, -BITS):
+            node = node[(idx >> level) & MASK]
+        return node
+
+    def append(self, value: Any) -> "PersistentVector":
+        count, shift, root, tail = self.count, self.shift, self.root, self.tail
+        if len(tail) < WIDTH:
+            return self.from_parts(count + 1, shift, root, [*tail, value])
+
+        # the tail is full: it becomes a leaf of the trie and a new tail starts
+        if count >> BITS > 1 << shift:
+            root = [root, new_path(shift, tail)]
+            shift += BITS
+        else:
+            root = push_tail(count, shift, root, tail)
+        return self.from_parts(count + 1, shift, root, [value])
+
+    def iter_range(self, start: int, stop: int):
+        idx = start
+        while idx < stop:
+            leaf = self.leaf_for(idx)
+            offset = idx & MASK
+            end = min(len(leaf), offset + stop - idx)
+            yield from leaf[offset:end]
+            idx += end - offset
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self.count)
+            if step == 1:
+                return slice_vector(self, start, max(start, stop))
+            return PersistentVector(self[i] for i in range(start, stop, step))
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError("vector index out of range")
+        return self.leaf_for(idx)[idx & MASK]
+
+    def __iter__(self):
+        return self.iter_range(0, self.count)
+
+    def __eq__(self, other) -> bool:
+        return sequence_equal(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PersistentVector({list(self)!r})"
+
+
+class VectorSlice(Sequence):
+    """
+    A window onto part of a PersistentVector that shares its storage.
+
+    Appending to a slice that runs to the end of its vector appends to the
+    vector, so a slice can keep growing in O(1); any other append copies the
+    slice first.
+    """
+
+    __slots__ = ("vector", "start", "stop")
+
+    vector: PersistentVector
+    start: int
+    stop: int
+
+    def __init__(self, vector: PersistentVector, start: int, stop: int):
+        self.vector = vector
+        self.start = start
+        self.stop = stop
+
+    def append(self, value: Any) -> "VectorSlice | PersistentVector":
+        if self.stop == len(self.vector):
+            return VectorSlice(self.vector.append(value), self.start, self.stop + 1)
+        return PersistentVector(self).append(value)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, idx):
+        length = self.stop - self.start
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(length)
+            if step == 1:
+                return slice_vector(self, start, max(start, stop))
+            return PersistentVector(self[i] for i in range(start, stop, step))
+        if idx < 0:
+            idx += length
+        if not 0 <= idx < length:
+            raise IndexError("vector index out of range")
+        return self.vector[self.start + idx]
+
+    def __iter__(self):
+        return self.vector.iter_range(self.start, self.stop)
+
+    def __eq__(self, other) -> bool:
+        return sequence_equal(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"VectorSlice({list(self)!r})"
+
+
+def slice_vector(
+    elements: PersistentVector | VectorSlice, start: int, stop: int
+) -> PersistentVector | VectorSlice:
+    """
+    Elements start to stop of a vector, sharing its storage when the result
+    is a large enough part of it.
+
+    A slice shorter than a quarter of its vector is copied instead, so a small
+    slice never keeps a much larger vector alive. Repeatedly taking the rest
+    of a vector copies a quarter, then a sixteenth and so on of it, so the
+    copying stays linear overall.
+    """
+    if isinstance(elements, VectorSlice):
+        vector = elements.vector
+        start, stop = elements.start + start, elements.start + stop
+    else:
+        vector = elements
+
+    if start == 0 and stop == len(vector):
+        return vector
+    if (stop - start) * 4 < len(vector):
+        return PersistentVector(vector.iter_range(start, stop))
+    return VectorSlice(vector, start, stop)
+
+
+def sequence_equal(left: Sequence, right) -> bool:
+    if not isinstance(right, (PersistentVector, VectorSlice, list, tuple)):
+        return NotImplemented
+    return len(left) == len(right) and all(a == b for a, b in zip(left, right))
+
+
+def new_path(level: int, node: list) -> list:
+    while level > 0:
+        node = [node]
+        level -= BITS
+    return node
+
+
+def push_tail(count: int, level: int, parent: list, tail: list) -> list:
+    """
+    Copy the path from parent down to the leaf that the full tail fills
+    """
+    subidx = (count - 1) >> level & MASK
+    if level == BITS:
+        child = tail
+    elif subidx < len(parent):
+        child = push_tail(count, level - BITS, parent[subidx], tail)
+    else:
+        child = new_path(level - BITS, tail)
+
+    node = list(parent)
+    if subidx < len(node):
+        node[subidx] = child
+    else:
+        node.append(child)
+    return node
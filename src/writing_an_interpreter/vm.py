@@ -0,0 +1,386 @@
+from dataclasses import dataclass
+
+from writing_an_interpreter.ast import Program
+from writing_an_interpreter.builtins import builtins, function_callers
+from writing_an_interpreter.compiler import (
+    Bytecode,
+    CompiledFunction,
+    Opcode,
+    compile_program,
+)
+from writing_an_interpreter.environment import UNBOUND, Environment, Unbound
+from writing_an_interpreter.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    eval_index_expression,
+    eval_infix_expression,
+    eval_prefix_expression,
+    is_truthy,
+    new_error,
+)
+from writing_an_interpreter.objects import (
+    Array,
+    Builtin,
+    Error,
+    Hash,
+    Integer,
+    Object,
+    ObjectType,
+    is_hashable,
+)
+
+CONSTANT = int(Opcode.CONSTANT)
+POP = int(Opcode.POP)
+PUSH_TRUE = int(Opcode.TRUE)
+PUSH_FALSE = int(Opcode.FALSE)
+PUSH_NULL = int(Opcode.NULL)
+PUSH_NONE = int(Opcode.NONE)
+ADD = int(Opcode.ADD)
+SUB = int(Opcode.SUB)
+MUL = int(Opcode.MUL)
+DIV = int(Opcode.DIV)
+EQ = int(Opcode.EQ)
+NOT_EQ = int(Opcode.NOT_EQ)
+LT = int(Opcode.LT)
+GT = int(Opcode.GT)
+MINUS = int(Opcode.MINUS)
+BANG = int(Opcode.BANG)
+JUMP = int(Opcode.JUMP)
+JUMP_NOT_TRUTHY = int(Opcode.JUMP_NOT_TRUTHY)
+GET_GLOBAL = int(Opcode.GET_GLOBAL)
+SET_GLOBAL = int(Opcode.SET_GLOBAL)
+GET_LOCAL = int(Opcode.GET_LOCAL)
+SET_LOCAL = int(Opcode.SET_LOCAL)
+GET_CELL = int(Opcode.GET_CELL)
+SET_CELL = int(Opcode.SET_CELL)
+LOAD_CELL = int(Opcode.LOAD_CELL)
+GET_FREE = int(Opcode.GET_FREE)
+LOAD_FREE = int(Opcode.LOAD_FREE)
+ARRAY = int(Opcode.ARRAY)
+HASH = int(Opcode.HASH)
+INDEX = int(Opcode.INDEX)
+CALL = int(Opcode.CALL)
+RETURN_VALUE = int(Opcode.RETURN_VALUE)
+CLOSURE = int(Opcode.CLOSURE)
+
+infix_operators = {
+    ADD: "+",
+    SUB: "-",
+    MUL: "*",
+    DIV: "/",
+    EQ: "==",
+    NOT_EQ: "!=",
+    LT: "<",
+    GT: ">",
+}
+
+
+class Cell:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Object | Unbound | None = UNBOUND):
+        self.value = value
+
+
+@dataclass
+class Closure(Object):
+    function: CompiledFunction
+    free: list[Cell]
+    environment: Environment | None = None
+    type: ObjectType = ObjectType.FUNCTION
+
+    def inspect(self):
+        args = ", ".join(str(p) for p in self.function.literal.parameters)
+        body = self.function.literal.body
+
+        return f"fn({args}){{\n{body}\n}}"
+
+
+class Frame:
+    __slots__ = ("closure", "ip", "locals")
+
+    def __init__(self, closure: Closure | None, ip: int, locals: list):
+        self.closure = closure
+        self.ip = ip
+        self.locals = locals
+
+
+class VM:
+    constants: list
+    instructions: list[int]
+    environment: Environment
+
+    def __init__(self, bytecode: Bytecode, environment: Environment):
+        self.constants = bytecode.constants
+        self.instructions = bytecode.instructions
+        self.environment = environment
+
+    def run(self) -> Object | None:
+        constants = self.constants
+        environment = self.environment
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+
+        closure = None
+        instructions = self.instructions
+        locals_ = []
+        free = []
+        ip = 0
+
+        while True:
+            if ip >= len(instructions):
+                return stack[-1] if stack else None
+
+            op = instructions[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                value = locals_[instructions[ip]]
+                ip += 1
+                if value is UNBOUND:
+                    value = self.unbound(closure, instructions[ip - 1])
+                    if is_error(value):
+                        return value
+                push(value)
+            elif op == CONSTANT:
+                push(constants[instructions[ip]])
+                ip += 1
+            elif op == GET_GLOBAL:
+                name = constants[instructions[ip]]
+                ip += 1
+                try:
+                    push(environment[name])
+                except KeyError:
+                    if name not in builtins:
+                        return new_error(f"identifier not found: {name}")
+                    push(builtins[name])
+            elif op == POP:
+                pop()
+            elif op in infix_operators:
+                right = pop()
+                left = pop()
+                if type(left) is Integer and type(right) is Integer:
+                    if op == ADD:
+                        push(Integer(left.value + right.value))
+                    elif op == SUB:
+                        push(Integer(left.value - right.value))
+                    elif op == LT:
+                        push(TRUE if left.value < right.value else FALSE)
+                    elif op == EQ:
+                        push(TRUE if left.value == right.value else FALSE)
+                    elif op == GT:
+                        push(TRUE if left.value > right.value else FALSE)
+                    elif op == MUL:
+                        push(Integer(left.value * right.value))
+                    elif op == DIV:
+                        push(Integer(left.value // right.value))
+                    else:
+                        push(TRUE if left.value != right.value else FALSE)
+                    continue
+
+                result = eval_infix_expression(infix_operators[op], left, right)
+                if is_error(result):
+                    return result
+                push(result)
+            elif op == JUMP_NOT_TRUTHY:
+                if is_truthy(pop()):
+                    ip += 1
+                else:
+                    ip = instructions[ip]
+            elif op == JUMP:
+                ip = instructions[ip]
+            elif op == CALL:
+                num_args = instructions[ip]
+                ip += 1
+                callee = stack[-num_args - 1]
+
+                if type(callee) is Closure:
+                    function = callee.function
+                    if num_args < function.num_parameters:
+                        return new_error(
+                            "wrong number of arguments: want={want}, got={got}",
+                            want=function.num_parameters,
+                            got=num_args,
+                        )
+                    args = stack[len(stack) - num_args :]
+                    del stack[len(stack) - num_args - 1 :]
+
+                    frames.append(Frame(closure, ip, locals_))
+                    locals_ = args[: function.num_parameters]
+                    locals_.extend([UNBOUND] * (function.num_locals - len(locals_)))
+                    for slot in function.cell_slots:
+                        locals_[slot] = Cell(locals_[slot])
+                    closure = callee
+                    free = callee.free
+                    instructions = function.instructions
+                    constants = function.constants
+                    ip = 0
+                elif type(callee) is Builtin:
+                    args = stack[len(stack) - num_args :]
+                    del stack[len(stack) - num_args - 1 :]
+                    result = callee.function(*args)
+                    if is_error(result):
+                        return result
+                    push(result)
+                else:
+                    return new_error("not a function: {type}", type=callee.type)
+            elif op == RETURN_VALUE:
+                if not frames:
+                    return pop()
+                frame = frames.pop()
+                closure = frame.closure
+                ip = frame.ip
+                locals_ = frame.locals
+                if closure is None:
+                    instructions = self.instructions
+                    constants = self.constants
+                    free = []
+                else:
+                    instructions = closure.function.instructions
+                    constants = closure.function.constants
+                    free = closure.free
+            elif op == SET_LOCAL:
+                locals_[instructions[ip]] = pop()
+                ip += 1
+            elif op == GET_CELL:
+                value = locals_[instructions[ip]].value
+                ip += 1
+                if value is UNBOUND:
+                    value = self.unbound(closure, instructions[ip - 1])
+                    if is_error(value):
+                        return value
+                push(value)
+            elif op == SET_CELL:
+                locals_[instructions[ip]].value = pop()
+                ip += 1
+            elif op == GET_FREE:
+                value = free[instructions[ip]].value
+                ip += 1
+                if value is UNBOUND:
+                    value = self.unbound_free(closure, instructions[ip - 1])
+                    if is_error(value):
+                        return value
+                push(value)
+            elif op == LOAD_CELL:
+                push(locals_[instructions[ip]])
+                ip += 1
+            elif op == LOAD_FREE:
+                push(free[instructions[ip]])
+                ip += 1
+            elif op == CLOSURE:
+                function = constants[instructions[ip]]
+                num_free = instructions[ip + 1]
+                ip += 2
+                if num_free:
+                    cells = stack[len(stack) - num_free :]
+                    del stack[len(stack) - num_free :]
+                else:
+                    cells = []
+                push(Closure(function=function, free=cells, environment=environment))
+            elif op == PUSH_TRUE:
+                push(TRUE)
+            elif op == PUSH_FALSE:
+                push(FALSE)
+            elif op == PUSH_NULL:
+                push(NULL)
+            elif op == PUSH_NONE:
+                push(None)
+            elif op == SET_GLOBAL:
+                environment[constants[instructions[ip]]] = pop()
+                ip += 1
+            elif op == MINUS or op == BANG:
+                operator = "-" if op == MINUS else "!"
+                result = eval_prefix_expression(operator, pop())
+                if is_error(result):
+                    return result
+                push(result)
+            elif op == INDEX:
+                index_ = pop()
+                left = pop()
+                result = eval_index_expression(left, index_)
+                if is_error(result):
+                    return result
+                push(result)
+            elif op == ARRAY:
+                num_elements = instructions[ip]
+                ip += 1
+                if num_elements:
+                    elements = stack[len(stack) - num_elements :]
+                    del stack[len(stack) - num_elements :]
+                else:
+                    elements = []
+                push(Array(elements=elements))
+            elif op == HASH:
+                num_pairs = instructions[ip]
+                ip += 1
+                items = stack[len(stack) - 2 * num_pairs :]
+                del stack[len(stack) - 2 * num_pairs :]
+                result = build_hash(items)
+                if is_error(result):
+                    return result
+                push(result)
+            else:
+                raise ValueError(f"unknown opcode: {op}")
+
+    def unbound(self, closure: Closure, slot: int) -> Object:
+        """
+        The value of a local that is empty because its let has not run, from
+        the bindings of the same name that it shadows or else the globals
+        """
+        function = closure.function
+        fallbacks = function.local_fallbacks.get(slot, [])
+        return self.fall_back(closure, fallbacks, function.local_names[slot])
+
+    def unbound_free(self, closure: Closure, index: int) -> Object:
+        function = closure.function
+        fallbacks = function.free_fallbacks.get(index, [])
+        return self.fall_back(closure, fallbacks, function.free_names[index])
+
+    def fall_back(self, closure: Closure, fallbacks: list[int], name: str) -> Object:
+        for index in fallbacks:
+            value = closure.free[index].value
+            if value is not UNBOUND:
+                return value
+        if name in self.environment:
+            return self.environment[name]
+        if name in builtins:
+            return builtins[name]
+        return new_error(f"identifier not found: {name}")
+
+
+def is_error(obj: Object | None) -> bool:
+    return type(obj) is Error
+
+
+def build_hash(items: list[Object]) -> Hash | Error:
+    pairs = {}
+    for idx in range(0, len(items), 2):
+        key, val = items[idx], items[idx + 1]
+        if not is_hashable(key):
+            return new_error("unusable as hash key: {key_type}", key_type=type(key))
+        pairs[key.hash()] = val
+    return Hash(pairs=pairs)
+
+
+def call_closure(closure: Closure, args: list[Object]) -> Object | None:
+    """
+    Call closure from Python by running a program that pushes it and its
+    arguments and then calls it
+    """
+    constants = [closure, *args]
+    instructions = []
+    for idx in range(len(constants)):
+        instructions.extend([CONSTANT, idx])
+    instructions.extend([CALL, len(args)])
+    return VM(Bytecode(instructions, constants), closure.environment).run()
+
+
+function_callers[Closure] = call_closure
+
+
+def run(program: Program, environment: Environment) -> Object | None:
+    bytecode = compile_program(program)
+    return VM(bytecode, environment).run()
@@ -0,0 +1,52 @@
+from writing_an_interpreter.closure_compiler import Procedure, compile_node, run
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.evaluator import monkey_eval
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.objects import Builtin, Error, Integer
+from writing_an_interpreter.parser import Parser
+
+
+def test_function_literals_are_compiled_once():
+    environment = Environment()
+    code = compile_node(parse("let f = fn(x) { x * 2 }; f"))
+
+    first = code(environment)
+    second = code(environment)
+
+    assert isinstance(first, Procedure)
+    assert first is not second
+    assert first.code is second.code
+
+
+def test_errors_abort_the_program():
+    got = run(parse("let f = fn() { 1 + true }; f(); 5"), Environment())
+
+    assert isinstance(got, Error)
+    assert got.message == "type mismatch: INTEGER + BOOLEAN"
+
+
+def test_can_run_recursive_functions():
+    string = """
+let fib = fn(n) { if (n < 2) { return n }; fib(n - 1) + fib(n - 2) };
+fib(15)
+"""
+    got = run(parse(string), Environment())
+    assert got == Integer(610)
+
+
+def test_lets_invalidate_cached_global_lookups():
+    environment = Environment()
+    program = parse("len")
+    assert isinstance(monkey_eval(program, environment), Builtin)
+
+    run(parse("let len = 42;"), environment)
+
+    assert monkey_eval(program, environment) == Integer(42)
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
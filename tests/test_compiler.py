@@ -0,0 +1,114 @@
+from writing_an_interpreter.compiler import (
+    CompiledFunction,
+    Opcode,
+    compile_program,
+    make,
+)
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.objects import Error, Integer
+from writing_an_interpreter.parser import Parser
+from writing_an_interpreter.repl import execute_string, load_standard_library
+from writing_an_interpreter.vm import run
+
+
+def test_can_compile_integer_arithmetic():
+    bytecode = compile_program(parse("1 + 2"))
+
+    assert bytecode.instructions == [
+        *make(Opcode.CONSTANT, 0),
+        *make(Opcode.CONSTANT, 1),
+        *make(Opcode.ADD),
+    ]
+    assert bytecode.constants == [Integer(1), Integer(2)]
+
+
+def test_can_compile_conditionals():
+    bytecode = compile_program(parse("if (true) { 10 }; 3333;"))
+
+    assert bytecode.instructions == [
+        *make(Opcode.TRUE),
+        *make(Opcode.JUMP_NOT_TRUTHY, 7),
+        *make(Opcode.CONSTANT, 0),
+        *make(Opcode.JUMP, 8),
+        *make(Opcode.NULL),
+        *make(Opcode.POP),
+        *make(Opcode.CONSTANT, 1),
+    ]
+
+
+def test_can_compile_globals_by_name():
+    bytecode = compile_program(parse("let one = 1; one;"))
+
+    assert bytecode.instructions == [
+        *make(Opcode.CONSTANT, 0),
+        *make(Opcode.SET_GLOBAL, 1),
+        *make(Opcode.GET_GLOBAL, 1),
+    ]
+    assert bytecode.constants == [Integer(1), "one"]
+
+
+def test_captured_locals_are_stored_in_cells():
+    bytecode = compile_program(parse("fn(a) { let b = 1; fn() { a } }"))
+
+    [outer] = [c for c in bytecode.constants if isinstance(c, CompiledFunction)][1:]
+    assert outer.local_names == ["a", "b"]
+    assert outer.cell_slots == [0]
+
+
+def test_closures_see_later_rebindings():
+    string = """
+let make = fn() {
+    let x = 1;
+    let get = fn() { x };
+    let x = 2;
+    get
+};
+make()()
+"""
+    got = run(parse(string), Environment())
+    assert got == Integer(2)
+
+
+def test_local_functions_can_recurse():
+    string = """
+let count = fn(n) {
+    let iter = fn(n, acc) { if (n == 0) { acc } else { iter(n - 1, acc + 1) } };
+    iter(n, 0)
+};
+count(10)
+"""
+    got = run(parse(string), Environment())
+    assert got == Integer(10)
+
+
+def test_recursion_is_not_limited_by_the_python_stack():
+    string = """
+let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } };
+count(5000)
+"""
+    got = run(parse(string), Environment())
+    assert got == Integer(5000)
+
+
+def test_reports_missing_arguments():
+    got = run(parse("fn(a, b) { a }(1)"), Environment())
+    assert isinstance(got, Error)
+    assert got.message == "wrong number of arguments: want=2, got=1"
+
+
+def test_can_run_standard_library():
+    string = "sum(map([1, 2, 3], fn(x) { x * 2 }))"
+
+    for engine in ["tree", "vm"]:
+        environment = load_standard_library(Environment(), engine)
+        got = execute_string(string, environment, engine)
+        assert got == Integer(12)
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
@@ -1,7 +1,9 @@
 from pathlib import Path
 
+import pytest
+
+from writing_an_interpreter import evaluator, repl
 from writing_an_interpreter.environment import Environment
-from writing_an_interpreter.evaluator import monkey_eval
 from writing_an_interpreter.lexer import Lexer
 from writing_an_interpreter.objects import (
     Array,
@@ -15,6 +17,25 @@ from writing_an_interpreter.objects import (
     String,
 )
 from writing_an_interpreter.parser import Parser
+from writing_an_interpreter.repl import ENGINES, execute_string
+
+ENGINE = "tree"
+
+
+@pytest.fixture(autouse=True, params=sorted(ENGINES))
+def engine(request):
+    """
+    Run every test against every execution engine
+    """
+    global ENGINE
+
+    marker = request.node.get_closest_marker("engines")
+    if marker is not None and request.param not in marker.args:
+        pytest.skip(f"not applicable to the {request.param} engine")
+
+    ENGINE = request.param
+    yield request.param
+    ENGINE = "tree"
 
 
 def test_can_eval_integer_expression():
@@ -203,6 +224,7 @@ def test_can_eval_let_statements():
                 assert is_string_object_valid(got, want)
 
 
+@pytest.mark.engines("tree", "stackless")
 def test_can_build_function_object():
     string = "fn(x) { x + 2; };"
 
@@ -312,6 +334,72 @@ def test_can_eval_builtin_functions():
                         raise TypeError(f"Unexpected type: {type(got)}")
 
 
+def test_can_slice_arrays_and_strings():
+    tests = [
+        ("slice([1, 2, 3, 4], 1, 3)", [2, 3]),
+        ("slice([1, 2, 3, 4], 0, 10)", [1, 2, 3, 4]),
+        ("slice([1, 2, 3, 4], -2, 4)", [3, 4]),
+        ("slice([1, 2, 3, 4], 3, 1)", []),
+        ("rest(rest([1, 2, 3]))", [3]),
+        ("push(rest([1, 2, 3]), 4)", [2, 3, 4]),
+        ("push(slice([1, 2, 3], 0, 2), 4)", [1, 2, 4]),
+        ("let a = [1, 2, 3]; let b = push(rest(a), 4); a", [1, 2, 3]),
+        ('slice("hello", 1, 3)', "el"),
+        ('slice("hello", -3, 5)', "llo"),
+        ('slice("hello", 4, 2)', ""),
+        ('rest(rest("hello"))', "llo"),
+        ('first(rest("hello"))', "e"),
+        ('last(slice("hello", 0, 4))', "l"),
+        ('len(rest("hello"))', 4),
+        ('rest("hello")[1]', "l"),
+        ('rest("hello") == "ello"', True),
+        ('{"ello": 1}[rest("hello")]', 1),
+        ("slice([1], 0)", "wrong number of arguments. got=2, want=3"),
+        ("slice(1, 0, 1)", "argument to 'slice' must be ARRAY or STRING, got INTEGER"),
+        (
+            'slice([1], "a", 1)',
+            "start and end of 'slice' must be INTEGER, got STRING and INTEGER",
+        ),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case list():
+                assert got == Array([Integer(x) for x in want])
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str() if isinstance(got, Error):
+                assert got.message == want
+            case str():
+                assert is_string_object_valid(got, want)
+
+
+def test_strings_built_by_repeated_concatenation():
+    build = (
+        'let digits = fn(n, s) { if (n == 0) { s } else { digits(n - 1, s + "ab") } };'
+    )
+    tests = [
+        (build + 'len(digits(200, ""))', 400),
+        (build + 'digits(100, "") == digits(50, digits(50, ""))', True),
+        (build + 'let s = digits(100, "x"); s[0] + s[199] + s[200]', "xab"),
+        (build + 'let k = digits(30, ""); {k: 1}[digits(30, "")]', 1),
+        (build + 'slice(digits(40, ""), 70, 80)', "ababababab"),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str():
+                assert is_string_object_valid(got, want)
+
+
 def test_can_build_array_literal():
     string = "[1, 2 * 2, 3 + 3]"
 
@@ -405,7 +493,7 @@ def test_can_eval_hash_literals():
         got.pairs.items(), want.items()
     ):
         assert got_key == want_key
-        assert got_val.value.value == want_val
+        assert got_val.value == want_val
 
 
 def test_can_eval_hash_indexes():
@@ -427,6 +515,437 @@ def test_can_eval_hash_indexes():
             assert is_null_object_valid(got)
 
 
+def test_hash_keys_of_different_types_never_collide():
+    tests = [
+        ('{1: "int", true: "bool", "1": "str"}[1]', "int"),
+        ('{1: "int", true: "bool", "1": "str"}[true]', "bool"),
+        ('{1: "int", true: "bool", "1": "str"}["1"]', "str"),
+        ('{0: "int"}[false]', None),
+        ('{false: "bool"}[0]', None),
+        ('len({1: 1, true: 2, "1": 3, 0: 4, false: 5, "": 6})', 6),
+        ("first(keys({true: 1}))", True),
+        ('last(keys({true: 1, "a": 2}))', "a"),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case None:
+                assert is_null_object_valid(got)
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str():
+                assert is_string_object_valid(got, want)
+
+
+def test_integer_array_builtins():
+    tests = [
+        ("sum([3, 1, 2])", 6),
+        ("sum([])", 0),
+        ("min([3, -1, 2])", -1),
+        ("max(rest([9, 1, 2]))", 2),
+        ("max([])", None),
+        ("abs(-3)", 3),
+        ("abs([1, -2, 3])", [1, 2, 3]),
+        ("add_arrays([1, 2, 3], [10, 20, 30])", [11, 22, 33]),
+        ("sub_arrays([1, 2, 3], rest([0, 1, 1, 1]))", [0, 1, 2]),
+        ("mul_arrays([1, 2, 3], [2, 2, 2])", [2, 4, 6]),
+        ("add_arrays(sort([3, 1, 2]), sort(push([2, 3], 1)))", [2, 4, 6]),
+        ("sum(abs(sub_arrays([1, 2], [4, 0])))", 5),
+        (
+            "mul_arrays([4611686018427387904, 1], [4, 1])",
+            [18446744073709551616, 1],
+        ),
+        (
+            "sum([1, true])",
+            "argument to 'sum' must be ARRAY of INTEGER, got [INTEGER, BOOLEAN]",
+        ),
+        ("min(1)", "argument to 'min' must be ARRAY, got INTEGER"),
+        ("max()", "wrong number of arguments. got=0, want=1"),
+        ('abs("a")', "argument to 'abs' must be INTEGER or ARRAY, got STRING"),
+        (
+            "add_arrays([1, 2], [1])",
+            "arguments to 'add_arrays' must have the same length, got 2 and 1",
+        ),
+        (
+            'mul_arrays([1, 2], ["a", 2])',
+            "argument to 'mul_arrays' must be ARRAY of INTEGER, got [STRING, INTEGER]",
+        ),
+        ("sub_arrays([1], 1)", "argument to 'sub_arrays' must be ARRAY, got INTEGER"),
+        ("add_arrays([1])", "wrong number of arguments. got=1, want=2"),
+        ("[1, 2] + [3, 4]", "unknown operator: ARRAY + ARRAY"),
+        ("[1, 2] - [3, 4]", "unknown operator: ARRAY - ARRAY"),
+        ("[1, 2] * [3, 4]", "unknown operator: ARRAY * ARRAY"),
+        ("[1] / [1]", "unknown operator: ARRAY / ARRAY"),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case None:
+                assert is_null_object_valid(got)
+            case list():
+                assert got == Array([Integer(x) for x in want])
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str():
+                assert got.message == want
+
+
+def test_higher_order_builtins_call_back_into_the_engine():
+    tests = [
+        ("map([1, 2, 3], fn(x) { x * 2 })", [2, 4, 6]),
+        ("map([], fn(x) { x })", []),
+        ("let k = 10; map([1, 2], fn(x) { x + k })", [11, 12]),
+        ('map(["a", "bc"], len)', [1, 2]),
+        ('map("12", fn(c) { c + c })', ["11", "22"]),
+        ("filter([1, 2, 3, 4], fn(x) { x > 2 })", [3, 4]),
+        ("filter([1, 2, 3], fn(x) { if (x == 2) { 1 } })", [2]),
+        ('filter("a1b", fn(c) { c != "1" })', ["a", "b"]),
+        ("reduce([1, 2, 3], 10, fn(acc, x) { acc + x })", 16),
+        ("reduce([], 10, len)", 10),
+        ('reduce("abc", "", fn(acc, c) { c + acc })', "cba"),
+        ("reduce(map([1, 2, 3], fn(x) { x + 1 }), 1, fn(a, b) { a * b })", 24),
+        (
+            "map(1, fn(x) { x })",
+            "argument to 'map' must be ARRAY or STRING, got INTEGER",
+        ),
+        ("filter([1])", "wrong number of arguments. got=1, want=2"),
+        ("reduce([1], 0, 1)", "not a function: INTEGER"),
+        ("map([1, 2], fn(x) { x + true })", "type mismatch: INTEGER + BOOLEAN"),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case list():
+                elements = [
+                    String(x) if isinstance(x, str) else Integer(x) for x in want
+                ]
+                assert got.inspect() == Array(elements).inspect()
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str() if isinstance(got, String):
+                assert got.value == want
+            case str():
+                assert got.message == want
+
+
+def test_higher_order_builtins_handle_long_arrays():
+    numbers = ", ".join(str(x) for x in range(20_000))
+    string = f"""
+let evens = filter([{numbers}], fn(x) {{ x / 2 * 2 == x }});
+reduce(map(evens, fn(x) {{ x + 1 }}), 0, fn(acc, x) {{ acc + x }})
+"""
+    got = run_eval(string)
+    assert is_integer_object_valid(got, sum(x + 1 for x in range(0, 20_000, 2)))
+
+
+def test_can_eval_string_builtins():
+    tests = [
+        ('split("a,b,,c", ",")', ["a", "b", "", "c"]),
+        ('split("a\\nb\\n", "\\n")', ["a", "b", ""]),
+        ('split("a  b", "  ")', ["a", "b"]),
+        ('split("", ",")', [""]),
+        ('join(["a", "b", "c"], ", ")', "a, b, c"),
+        ('join(split("a b", " "), "-")', "a-b"),
+        ('join([], ",")', ""),
+        ('trim("  a b \\n")', "a b"),
+        ('find("hello", "l")', 2),
+        ('find("hello", "z")', -1),
+        ('replace("a-b-c", "-", "+")', "a+b+c"),
+        ('substr("hello", 1, 3)', "ell"),
+        ('substr("hello", -3, 10)', "llo"),
+        ('substr("hello", 2, -1)', ""),
+        ('lines("a\\nb\\r\\nc\\n")', ["a", "b", "c"]),
+        ('starts_with("hello", "he")', True),
+        ('starts_with("hello", "lo")', False),
+        ('chars("abc")', ["a", "b", "c"]),
+        ('len(chars(""))', 0),
+        ('split("a", "")', "separator for 'split' must not be empty"),
+        ('split(1, ",")', "argument to 'split' must be STRING, got INTEGER"),
+        ('join([1], ",")', "argument to 'join' must be ARRAY of STRING, got [INTEGER]"),
+        ('trim("a", "b")', "wrong number of arguments. got=2, want=1"),
+        ('substr("a", "b", 1)', "argument to 'substr' must be INTEGER, got STRING"),
+        ('replace("a", "", "b")', "string to 'replace' must not be empty"),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case list():
+                assert got == Array([String(x) for x in want])
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str() if isinstance(got, String):
+                assert got.value == want
+            case str():
+                assert got.message == want
+
+
+def test_can_update_hashes_persistently():
+    tests = [
+        ('put({}, "a", 1)["a"]', 1),
+        ('put({"a": 1}, "a", 2)["a"]', 2),
+        ('len(put({"a": 1}, "b", 2))', 2),
+        ('let h = {"a": 1}; let g = put(h, "b", 2); len(h)', 1),
+        ('delete({"a": 1, "b": 2}, "a")["a"]', None),
+        ('len(delete({"a": 1}, "b"))', 1),
+        ('let h = {"a": 1}; let g = delete(h, "a"); h["a"]', 1),
+        ("contains(delete({1: 1, 2: 2}, 1), 2)", True),
+        ('merge({"a": 1, "b": 2}, {"b": 3})["b"]', 3),
+        ('len(merge({"a": 1}, {"b": 2}))', 2),
+        ("keys(merge({1: 1, 2: 2}, {3: 3, 1: 4}))", [1, 2, 3]),
+        ("values(put(put({}, 2, 20), 1, 10))", [20, 10]),
+        ("put({}, 1)", "wrong number of arguments. got=2, want=3"),
+        ("put(1, 1, 1)", "argument to 'put' must be HASH, got INTEGER"),
+        ("put({}, [1], 1)", "unusable as hash key: ARRAY"),
+        ("delete({})", "wrong number of arguments. got=1, want=2"),
+        ("delete([], 1)", "argument to 'delete' must be HASH, got ARRAY"),
+        ("merge({}, 1)", "arguments to 'merge' must be HASH, got HASH and INTEGER"),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case None:
+                assert is_null_object_valid(got)
+            case list():
+                assert got == Array([Integer(x) for x in want])
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+            case str():
+                assert got.message == want
+
+
+def test_counting_with_put_shares_structure():
+    string = """
+let count = fn(xs, idx, counts) {
+    if (idx == len(xs)) {
+        counts
+    } else {
+        let x = xs[idx];
+        let seen = if (contains(counts, x)) { counts[x] } else { 0 };
+        count(xs, idx + 1, put(counts, x, seen + 1))
+    }
+};
+count([1, 2, 1, 3, 1, 2], 0, {})
+"""
+    got = run_eval(string)
+    assert isinstance(got, Hash)
+    assert [value.value for value in got.pairs.values()] == [3, 2, 1]
+
+
+@pytest.mark.engines("tree", "vm", "stackless", "unboxed")
+def test_tail_calls_run_in_constant_stack_space():
+    tests = [
+        (
+            "let count = fn(n, acc) { if (n == 0) { acc } else { count(n - 1, acc + 1) } };"
+            "count(5000, 0)",
+            5000,
+        ),
+        (
+            "let count = fn(n, acc) { if (n == 0) { return acc }; return count(n - 1, acc + 1) };"
+            "count(5000, 0)",
+            5000,
+        ),
+        (
+            "let even = fn(n) { if (n == 0) { true } else { odd(n - 1) } };"
+            "let odd = fn(n) { if (n == 0) { false } else { even(n - 1) } };"
+            "even(5001)",
+            False,
+        ),
+        (
+            "let iter = fn(n, acc) { if (n == 0) { acc } else { let acc = acc + n; iter(n - 1, acc) } };"
+            "iter(5000, 0)",
+            12502500,
+        ),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+
+
+def test_calls_outside_tail_position_still_return_to_the_caller():
+    tests = [
+        ("let f = fn(x) { x * 2 }; let g = fn(x) { f(x); x }; g(3)", 3),
+        ("let f = fn(x) { x * 2 }; let g = fn(x) { if (true) { f(x) }; x }; g(3)", 3),
+        ("let f = fn(x) { x * 2 }; let g = fn(x) { f(x) + 1 }; g(3)", 7),
+        (
+            "let f = fn(x) { x * 2 }; let g = fn(x) { if (true) { return f(x) }; x }; g(3)",
+            6,
+        ),
+        ("let g = fn(x) { len([x]) }; g(3)", 1),
+    ]
+
+    for string, want in tests:
+        got = run_eval(string)
+        assert is_integer_object_valid(got, want)
+
+
+def test_new_globals_shadow_builtins_seen_earlier():
+    environment = Environment()
+    programs = [
+        ("let f = fn(x) { len(x) }; f([1, 2])", 2),
+        ("let len = fn(x) { 99 }; f([1, 2])", 99),
+        ("let len = fn(x) { 100 }; f([1, 2])", 100),
+    ]
+
+    for string, want in programs:
+        program = Parser(Lexer(string)).parse_program()
+        got = ENGINES[ENGINE](program, environment)
+        assert is_integer_object_valid(got, want)
+
+
+def test_locals_can_be_used_before_their_let_runs():
+    tests = [
+        (
+            "let f = fn() { let g = fn() { h() }; let h = fn() { 4 }; g() }; f()",
+            4,
+        ),
+        (
+            "let f = fn(n) {"
+            "  let ev = fn(n) { if (n == 0) { true } else { od(n - 1) } };"
+            "  let od = fn(n) { if (n == 0) { false } else { ev(n - 1) } };"
+            "  ev(n)"
+            "}; f(10)",
+            True,
+        ),
+        ("let x = 1; let f = fn(c) { if (c) { let x = 2; }; x }; f(false)", 1),
+        ("let x = 1; let f = fn(c) { if (c) { let x = 2; }; x }; f(true)", 2),
+        (
+            "let f = fn(c) { let x = 1; fn() { if (c) { let x = 2; }; x }() };"
+            "f(false) + f(true)",
+            3,
+        ),
+        ("let x = 10; let f = fn() { let x = x + 1; x }; f()", 11),
+        (
+            "let x = 5; let f = fn() { let x = fn() { let a = 1; }(); x }; f();",
+            None,
+        ),
+    ]
+    for string, want in tests:
+        got = run_eval(string)
+        match want:
+            case bool():
+                assert is_boolean_object_valid(got, want)
+            case int():
+                assert is_integer_object_valid(got, want)
+            case None:
+                assert got is None, string
+
+
+@pytest.mark.engines("tree", "stackless")
+def test_global_lookups_are_cached_on_the_identifier():
+    environment = Environment()
+    program = Parser(Lexer("let x = 1; len([x])")).parse_program()
+    call = program.statements[1].expression
+
+    ENGINES[ENGINE](program, environment)
+    len_cache = call.function.cache
+    x_cache = call.arguments[0].elements[0].cache
+    assert len_cache[0] is environment and len_cache[2].function.__name__ == "run_len"
+    assert x_cache == (environment, environment.epoch, None)
+
+    environment["x"] = Integer(2)
+    assert call.function.cache[1] == environment.epoch
+    environment["y"] = Integer(3)
+    assert call.function.cache[1] != environment.epoch
+
+
+def test_statements_run_as_soon_as_they_are_parsed(capsys):
+    tests = [
+        ('puts("a"); let x = 1; x + 1', 2, '"a"\n'),
+        ('puts("a"); x + true; puts("b")', "identifier not found: x", '"a"\n'),
+        ('puts("a"); if (true) { return 1; }; puts("b"); 2', 1, '"a"\n'),
+        ("let f = fn() { return 1; }; f() + 1", 2, ""),
+        ('puts("a"); let = 1', None, '"a"\n'),
+    ]
+
+    for string, want, output in tests:
+        got = execute_string(string, Environment(), ENGINE)
+        captured = capsys.readouterr().out
+        match want:
+            case int():
+                assert is_integer_object_valid(got, want)
+                assert captured == output
+            case str():
+                assert got.message == want
+                assert captured == output
+            case None:
+                assert isinstance(got, list) and got
+                assert captured.startswith(output)
+
+
+def test_files_run_through_the_engine_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(repl, "BATCH_SIZE", 4)
+    sizes = []
+    run_program = repl.run_program
+
+    def record(program, *args):
+        sizes.append(len(program.statements))
+        return run_program(program, *args)
+
+    monkeypatch.setattr(repl, "run_program", record)
+    path = tmp_path / "program.🐵"
+    path.write_text(
+        'let total = 0;\nputs("start");\n'
+        + "let total = total + 1;\n" * 9
+        + "let f = fn(x) { x + total };\nf(1)\n"
+    )
+
+    with path.open() as source:
+        got = execute_string(source, Environment(), ENGINE)
+    assert is_integer_object_valid(got, 10)
+    assert sizes == [4, 4, 4, 1]
+
+
+@pytest.mark.engines("tree")
+def test_infix_nodes_specialize_on_integer_operands():
+    counters = evaluator.specialization_counters
+    specialized, deoptimized = counters.specialized, counters.deoptimized
+    program = Parser(Lexer("let add = fn(a, b) { a + b }; add(1, 2)")).parse_program()
+    environment = Environment()
+
+    got = ENGINES[ENGINE](program, environment)
+    assert is_integer_object_valid(got, 3)
+    add = program.statements[0].value.body.statements[0].expression
+    assert add.specialization
+    assert counters.specialized == specialized + 1
+
+    got = execute_string('add("a", "b")', environment)
+    assert is_string_object_valid(got, "ab")
+    assert add.specialization is evaluator.GENERIC
+    assert counters.deoptimized == deoptimized + 1
+
+    got = execute_string("add(2, 3)", environment)
+    assert is_integer_object_valid(got, 5)
+    assert add.specialization is evaluator.GENERIC
+    assert counters.specialized == specialized + 1
+
+
+@pytest.mark.engines("tree")
+def test_infix_nodes_stay_generic_after_non_integer_operands():
+    program = Parser(Lexer('"a" == "a"; 1 == 1')).parse_program()
+
+    got = ENGINES[ENGINE](program, Environment())
+    assert is_boolean_object_valid(got, True)
+    strings, integers = [s.expression for s in program.statements]
+    assert strings.specialization is evaluator.GENERIC
+    assert integers.specialization
+
+
 # --------helper functions---------
 def run_eval(string: str) -> Object:
     environment = Environment()
@@ -436,7 +955,7 @@ def run_eval(string: str) -> Object:
     program = parser.parse_program()
     assert not parser.errors
 
-    return monkey_eval(program, environment)
+    return ENGINES[ENGINE](program, environment)
 
 
 def is_integer_object_valid(got: Integer, want: int):
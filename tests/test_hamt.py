@@ -0,0 +1,117 @@
+import pytest
+
+from writing_an_interpreter.hamt import BitmapNode, CollisionNode, PersistentMap
+from writing_an_interpreter.objects import Hash, Integer
+
+SIZES = [0, 1, 31, 32, 33, 1024, 1025, 20_000]
+
+
+class Colliding:
+    """
+    A key whose hash is shared with every other Colliding key
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 7
+
+    def __eq__(self, other):
+        return isinstance(other, Colliding) and self.name == other.name
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_putting_matches_building_from_a_dict(size):
+    mapping = PersistentMap()
+    for idx in range(size):
+        mapping = mapping.put(f"key{idx}", idx)
+
+    want = {f"key{idx}": idx for idx in range(size)}
+    assert mapping == PersistentMap(want)
+    assert dict(mapping.items()) == want
+    assert list(mapping) == list(want)
+    assert len(mapping) == size
+    assert all(mapping[f"key{idx}"] == idx for idx in range(0, size, 7))
+    assert "missing" not in mapping
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_updates_leave_the_original_unchanged(size):
+    mapping = PersistentMap((idx, idx) for idx in range(size))
+
+    changed = mapping.put("new", "value").delete(0)
+    assert dict(mapping.items()) == {idx: idx for idx in range(size)}
+    assert changed["new"] == "value"
+    assert 0 not in changed
+    assert len(changed) == max(size, 1)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_deleting_every_key_empties_the_map(size):
+    mapping = PersistentMap((idx, idx) for idx in range(size))
+
+    for idx in range(0, size, 2):
+        mapping = mapping.delete(idx)
+    assert list(mapping) == list(range(1, size, 2))
+
+    for idx in range(1, size, 2):
+        mapping = mapping.delete(idx)
+    assert len(mapping) == 0
+    assert mapping.root.bitmap == 0
+
+
+def test_keys_keep_their_first_insertion_order():
+    mapping = PersistentMap({"b": 1, "a": 2, "c": 3})
+
+    assert list(mapping.put("a", 4)) == ["b", "a", "c"]
+    assert list(mapping.delete("a").put("a", 4)) == ["b", "c", "a"]
+    assert list(mapping.merge({"d": 5, "b": 6}).items()) == [
+        ("b", 6),
+        ("a", 2),
+        ("c", 3),
+        ("d", 5),
+    ]
+
+
+def test_ordered_leaves_are_gathered_once():
+    mapping = PersistentMap({"a": 1, "b": 2})
+
+    assert mapping.leaves() is mapping.leaves()
+    assert list(mapping.put("c", 3)) == ["a", "b", "c"]
+    assert list(mapping.delete("a").items()) == [("b", 2)]
+    assert list(mapping.put("a", 0).values()) == [0, 2]
+    assert list(mapping) == ["a", "b"]
+
+
+def test_updates_share_untouched_nodes():
+    mapping = PersistentMap((idx, idx) for idx in range(1000))
+    changed = mapping.put(0, "zero")
+
+    shared = [a is b for a, b in zip(mapping.root.children, changed.root.children)]
+    assert shared.count(False) == 1
+    assert mapping.delete("missing") is mapping
+
+
+def test_keys_with_equal_hashes_are_kept_apart():
+    keys = [Colliding(name) for name in "abcde"]
+    mapping = PersistentMap((key, key.name) for key in keys).put(32 + 7, "int")
+
+    assert [mapping[key] for key in keys] == list("abcde")
+    assert mapping[39] == "int"
+    assert Colliding("z") not in mapping
+
+    [child] = [c for c in mapping.root.children if not isinstance(c, tuple)]
+    assert isinstance(child, (BitmapNode, CollisionNode))
+
+    for key in keys[:-1]:
+        mapping = mapping.delete(key)
+    assert list(mapping.items()) == [(keys[-1], "e"), (39, "int")]
+
+
+def test_hashes_store_their_pairs_in_a_persistent_map():
+    key = Integer(1)
+    hash_ = Hash(pairs={key.hash(): Integer(2)})
+
+    assert isinstance(hash_.pairs, PersistentMap)
+    assert hash_.inspect() == "{1: 2}"
@@ -1,4 +1,8 @@
-from writing_an_interpreter.lexer import Lexer
+import io
+import mmap
+
+from writing_an_interpreter import lexer
+from writing_an_interpreter.lexer import Lexer, tokenize
 from writing_an_interpreter.tokens import Token, TokenType
 
 
@@ -235,3 +239,70 @@ for(let i = 0; i < 10; i = i + 1;){}
 
     for token in want:
         assert lexer.next_token() == token
+
+
+def test_lexing_in_chunks_matches_lexing_a_string(monkeypatch, tmp_path):
+    string = 'let s = "a\\"b\\\\c é"; # note\nif (x == 10) { y != [1, 2] } "open'
+    path = tmp_path / "script.🐵"
+    path.write_text(string, encoding="utf-8")
+    want = lex_all(string)
+
+    for size in [1, 2, 3, 7, 64]:
+        monkeypatch.setattr(lexer, "CHUNK_SIZE", size)
+        with path.open(encoding="utf-8") as file:
+            assert lex_all(file) == want
+        with path.open("rb") as file:
+            assert lex_all(file) == want
+            assert lex_all(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)) == want
+
+
+def test_sources_are_read_as_tokens_are_needed(monkeypatch):
+    monkeypatch.setattr(lexer, "CHUNK_SIZE", 16)
+    source = io.StringIO("let x = 1;\n" * 1000)
+
+    tokens = Lexer(source)
+    assert tokens.next_token() == Token(TokenType.LET, "let")
+    assert source.tell() <= 2 * 16
+
+
+def lex_all(source):
+    tokens = Lexer(source)
+    got = [tokens.next_token()]
+    while got[-1].type != TokenType.EOF:
+        got.append(tokens.next_token())
+    return [(token.type, token.literal, token.value) for token in got]
+
+
+def test_token_tables_hold_the_same_tokens():
+    string = 'let s = "a\\tb";\nif (s != "") { puts(s) } é'
+
+    table, end = tokenize(string)
+    assert end == len(string)
+    assert [table.token(idx) for idx in range(len(table))] == list(table)
+    assert lex_all(string)[:-1] == [
+        (token.type, token.literal, token.value) for token in table
+    ]
+
+    assert table.type(3) == TokenType.STRING
+    assert table.literal(3) == "a\\tb"
+    assert table.token(3).value == "a\tb"
+    assert table.types.itemsize == 1
+
+
+def test_tokens_record_where_they_start():
+    string = 'let x = 1;\n  "two"\n\n# comment\nx'
+    tokens = Lexer(string)
+
+    got = []
+    while (token := tokens.next_token()).type != TokenType.EOF:
+        got.append((token.literal, tokens.line_column(token.start)))
+    assert got == [
+        ("let", (1, 1)),
+        ("x", (1, 5)),
+        ("=", (1, 7)),
+        ("1", (1, 9)),
+        (";", (1, 10)),
+        ("two", (2, 3)),
+        ("x", (5, 1)),
+    ]
+    assert string[token.start :] == ""
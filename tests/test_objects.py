@@ -1,4 +1,24 @@
-from writing_an_interpreter.objects import String
+from writing_an_interpreter import builtins, evaluator
+from writing_an_interpreter.objects import (
+    FALSE,
+    NULL,
+    SHORT_STRING,
+    SMALL_INTEGER_MAX,
+    SMALL_INTEGER_MIN,
+    TRUE,
+    Array,
+    Boolean,
+    Hash,
+    Integer,
+    IntArray,
+    Null,
+    ObjectType,
+    String,
+    StringRope,
+    StringView,
+    concat,
+)
+from writing_an_interpreter.vector import PersistentVector
 
 
 def test_can_hash_string_keys():
@@ -10,3 +30,110 @@ def test_can_hash_string_keys():
     assert hello_1.hash() == hello_2.hash()
     assert diff_1.hash() == diff_2.hash()
     assert hello_1.hash() != diff_1.hash()
+
+
+def test_string_slices_share_their_text():
+    text = "hello world"
+    view = String(text).slice(1, 11)
+
+    assert isinstance(view, StringView)
+    assert view.text is text
+    assert view == String("ello world")
+    assert view.hash() == String("ello world").hash()
+    assert view.slice(1, 10).text is text
+    assert view.char_at(-1) == String("d")
+
+
+def test_small_string_slices_are_copied():
+    view = String("hello world").slice(0, 2)
+
+    assert type(view) is String
+    assert view.value == "he"
+
+
+def test_short_concatenations_stay_flat():
+    joined = concat(String("hello "), String("world"))
+
+    assert type(joined) is String
+    assert joined.value == "hello world"
+
+
+def test_long_concatenations_build_a_rope():
+    left, right = String("a" * 20), String("b" * 20)
+    joined = concat(left, right)
+
+    assert isinstance(joined, StringRope)
+    assert joined.length() == 40
+    assert joined.flat is None
+    assert joined == String("a" * 20 + "b" * 20)
+    assert joined.hash() == String("a" * 20 + "b" * 20).hash()
+    assert joined.flat is not None and joined.left is None
+
+
+def test_ropes_built_a_character_at_a_time_flatten_without_recursion():
+    string = String("")
+    for idx in range(100_000):
+        string = concat(string, String(str(idx % 10)))
+
+    assert isinstance(string, StringRope)
+    assert string.left.length() % SHORT_STRING == 0
+    assert string.length() == 100_000
+    assert string.value == "0123456789" * 10_000
+    assert string.char_at(-1) == String("9")
+
+
+def test_values_have_no_instance_dict():
+    values = [Integer(1000), Boolean(True), Null(), String("a"), Array([]), Hash({})]
+
+    for value in values:
+        assert not hasattr(value, "__dict__")
+    assert Integer(1000).type == ObjectType.INTEGER
+    assert Array([]).type == ObjectType.ARRAY
+
+
+def test_small_integers_are_shared():
+    assert Integer(SMALL_INTEGER_MIN) is Integer(SMALL_INTEGER_MIN)
+    assert Integer(SMALL_INTEGER_MAX) is Integer(value=SMALL_INTEGER_MAX)
+    assert Integer(SMALL_INTEGER_MAX + 1) is not Integer(SMALL_INTEGER_MAX + 1)
+    assert Integer(SMALL_INTEGER_MAX + 1) == Integer(SMALL_INTEGER_MAX + 1)
+    assert Integer(1) != Boolean(True)
+
+
+def test_booleans_and_null_are_singletons():
+    assert Boolean(True) is TRUE and Boolean(False) is FALSE
+    assert Null() is NULL
+    assert builtins.TRUE is evaluator.TRUE is TRUE
+    assert builtins.NULL is evaluator.NULL is NULL
+    assert builtins.builtins["contains"].function(Hash({}), Integer(1)) is FALSE
+
+
+def test_integer_arrays_are_stored_unboxed():
+    array = Array([Integer(3), Integer(1), Integer(2)])
+
+    assert isinstance(array.elements, IntArray)
+    assert array.elements[0] == Integer(3)
+    assert list(array.elements) == [Integer(3), Integer(1), Integer(2)]
+    assert array.inspect() == "[3, 1, 2]"
+    assert array == Array(PersistentVector([Integer(3), Integer(1), Integer(2)]))
+    assert isinstance(Array([Integer(1), String("a")]).elements, PersistentVector)
+    assert isinstance(Array([Integer(1 << 64)]).elements, PersistentVector)
+
+
+def test_integer_array_slices_share_their_data():
+    elements = Array([Integer(i) for i in range(100)]).elements
+
+    view = elements[1:][1:]
+    assert view.data is elements.data
+    assert (view.start, view.stop) == (2, 100)
+    assert view[-1] == Integer(99)
+    assert elements[10:12].data is not elements.data
+    assert elements[10:12] == [Integer(10), Integer(11)]
+
+
+def test_appending_to_an_integer_array_makes_a_vector():
+    elements = Array([Integer(1), Integer(2)]).elements
+
+    longer = elements.append(String("a"))
+    assert isinstance(longer, PersistentVector)
+    assert longer == [Integer(1), Integer(2), String("a")]
+    assert elements == [Integer(1), Integer(2)]
@@ -0,0 +1,106 @@
+import pytest
+
+from writing_an_interpreter import optimizer
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.optimizer import PassManager, Rewriter, optimize
+from writing_an_interpreter.parser import Parser
+from writing_an_interpreter.repl import ENGINES, execute_string, load_standard_library
+
+
+@pytest.mark.parametrize(
+    "string, expected",
+    [
+        ("1 + 2 * 3", "7"),
+        ("-(4 - 10)", "6"),
+        ("!true", "false"),
+        ("1 < 2 == true", "true"),
+        ('"a" + "b" + "c"', "abc"),
+        ("x + 1 * 2", "(x + 2)"),
+        ("1 / 0", "(1 / 0)"),
+        ("1 + true", "(1 + true)"),
+        ("-true", "(-true)"),
+    ],
+)
+def test_folds_constant_expressions(string, expected):
+    assert str(optimize(parse(string))) == expected
+
+
+@pytest.mark.parametrize(
+    "string, expected",
+    [
+        ("if (true) { a } else { b }", "a"),
+        ("if (1 > 2) { a } else { b }", "b"),
+        ("if (x) { a } else { b }", "ifxab"),
+        ("let y = if (false) { a };", "let y = iffalseaNone;"),
+        ("if (true) { let a = 1; a } ; b", "let a = 1;ab"),
+        ("if (false) { a }; b", "b"),
+        ("fn() { if (true) { return f(1) }; 2 }", "fn()return f(1);2"),
+    ],
+)
+def test_prunes_constant_branches(string, expected):
+    assert str(optimize(parse(string))) == expected
+
+
+@pytest.mark.parametrize(
+    "string, expected",
+    [
+        ("1; 2; 3", "3"),
+        ('[1, "a"]; {1: fn(x) { x }}; x', "x"),
+        ("x; y", "xy"),
+        ("f(); 1", "f()1"),
+        ("{f: 2}; 3", "{f: 2}3"),
+    ],
+)
+def test_drops_unused_pure_statements(string, expected):
+    assert str(optimize(parse(string))) == expected
+
+
+def test_can_register_passes():
+    class Reverser(Rewriter):
+        def rewrite_statements(self, statements):
+            return list(reversed(statements))
+
+    passes = PassManager()
+    passes.register(Reverser())
+
+    assert str(passes.run(parse("a; b; c"))) == "cba"
+
+
+PROGRAMS = [
+    "1 + 2 * 3 - 4 / 2",
+    "let debug = false; if (debug) { puts(1) } else { 10 }",
+    "if (true) { let a = 5 * 5; a } ; a + 1",
+    "let f = fn(x) { if (1 < 2) { return x * (2 + 3) }; 0 }; f(4)",
+    "let f = fn() { 1; 2; if (false) { 3 } }; f()",
+    "len([1, 2 + 3, 4]) + -(1 - 2)",
+    '"hello" + " " + "world"',
+    '{"a" + "b": 1 + 1}["ab"]',
+    "if (!true) { 1 }",
+    "if (true) { }",
+    "1 + true",
+    "10 / (5 - 5 + 2)",
+    "sum(map([1, 2, 3], fn(x) { x * (1 + 1) }))",
+    "let f = fn(n) { if (true) { if (n == 0) { 0 } else { f(n - 1) } } }; f(100)",
+]
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("string", PROGRAMS)
+def test_optimized_programs_give_identical_results(monkeypatch, engine, string):
+    results = []
+    for enabled in [False, True]:
+        monkeypatch.setattr(optimizer, "ENABLED", enabled)
+        environment = load_standard_library(Environment(), engine)
+        result = execute_string(string, environment, engine)
+        results.append(None if result is None else result.inspect())
+
+    assert results[0] == results[1]
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
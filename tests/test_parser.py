@@ -1,3 +1,6 @@
+import io
+import random
+
 from writing_an_interpreter.ast import (
     ArrayLiteral,
     BooleanExpression,
@@ -18,7 +21,12 @@ from writing_an_interpreter.ast import (
     StringLiteral,
 )
 from writing_an_interpreter.lexer import Lexer
-from writing_an_interpreter.parser import ParseError, Parser
+from writing_an_interpreter.parser import (
+    ParseError,
+    Parser,
+    parse_source,
+    reparse,
+)
 from writing_an_interpreter.tokens import Token, TokenType
 
 
@@ -641,6 +649,196 @@ def test_can_parse_hash_literal_mixed_keys():
     assert is_infix_expression_valid(pairs[keys[2]], 15, "/", 5)
 
 
+def test_string_escape_sequences_are_replaced():
+    tests = [
+        (r'"a\nb"', "a\nb"),
+        (r'"\t\r"', "\t\r"),
+        (r'"say \"hi\""', 'say "hi"'),
+        (r'"back\\slash"', "back\\slash"),
+        (r'"\\n"', "\\n"),
+        (r'"\q"', "\\q"),
+    ]
+
+    for string, want in tests:
+        parser = Parser(Lexer(string))
+        program = parser.parse_program()
+        assert not parser.errors
+
+        [statement] = program.statements
+        assert isinstance(statement.expression, StringLiteral)
+        assert statement.expression.value == want
+
+
+def test_comments_run_to_the_end_of_the_line():
+    string = """# leading comment
+let x = 1; # trailing comment
+# another
+x"""
+
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+
+    assert len(program) == 2
+    assert is_identifier_valid(program.statements[1].expression, "x")
+
+
+def test_parse_errors_give_their_location():
+    string = "let x = 1;\nlet y 2;\n  let = 3;"
+
+    parser = Parser(Lexer(string))
+    parser.parse_program()
+
+    first, second, *_ = parser.errors
+    assert (first.line, first.column) == (2, 7)
+    assert (
+        str(first) == "line 2, column 7: expected next token to be =, got INT instead"
+    )
+    assert (second.line, second.column) == (3, 7)
+    assert str(ParseError("no location")) == "no location"
+
+
+def test_statements_are_yielded_as_they_are_parsed():
+    source = io.StringIO("let x = 1;\n" * 100_000)
+
+    parser = Parser(Lexer(source))
+    statements = parser.parse_statements()
+    first = next(statements)
+    assert isinstance(first, LetStatement)
+    assert source.tell() < 1_000_000
+
+    assert sum(1 for _ in statements) == 99_999
+    assert not parser.errors
+
+
+def test_parser_records_returns_outside_functions():
+    tests = [
+        ("let f = fn() { return 1; }; f()", False),
+        ("if (true) { return 1; }", True),
+        ("return fn() { 2 };", True),
+    ]
+
+    for string, want in tests:
+        parser = Parser(Lexer(string))
+        parser.parse_program()
+        assert parser.top_level_return == want
+
+
+INCREMENTAL_SOURCE = """let add = fn(a, b) { a + b };
+# a comment; with "quotes"
+let words = ["one", "two;", "three\\"];
+let x = add(1, 2)
+puts(x)
+if (x > 2) { return x; } else { 0 };
+let table = {"key": words[0]};
+"""
+
+
+def assert_reparse_matches(program, offset, removed, inserted):
+    text = program.source.text
+    new_text = text[:offset] + inserted + text[offset + removed :]
+
+    updated = reparse(program, offset, removed, inserted)
+    expected = parse_source(new_text)
+    assert updated == expected, (offset, removed, inserted)
+    assert updated.source.starts == expected.source.starts
+    assert updated.source.reaches == expected.source.reaches
+    for idx, statement in enumerate(updated.source.statements):
+        if statement is not None:
+            token = expected.source.statements[idx].token
+            assert updated.source.offset(idx, statement.token) == token.start
+    errors = [(str(e), e.offset) for e in updated.source.all_errors()]
+    assert errors == [(str(e), e.offset) for e in expected.source.all_errors()]
+    return updated
+
+
+def test_reparsing_an_edit_matches_parsing_the_new_text():
+    program = parse_source(INCREMENTAL_SOURCE)
+    edits = [
+        (0, 0, "let y = 3;\n"),
+        (len(INCREMENTAL_SOURCE), 0, "puts(1)"),
+        (INCREMENTAL_SOURCE.index("1, 2"), 1, "10"),
+        (INCREMENTAL_SOURCE.index("puts"), 0, "+ "),
+        (INCREMENTAL_SOURCE.index("# a"), 1, ""),
+        (INCREMENTAL_SOURCE.index('"two'), 1, ""),
+        (INCREMENTAL_SOURCE.index("};\n") + 1, 1, ""),
+        (INCREMENTAL_SOURCE.index("let x"), 4, "let"),
+        (0, len(INCREMENTAL_SOURCE), ""),
+    ]
+    for edit in edits:
+        assert_reparse_matches(program, *edit)
+
+
+def test_reparsing_random_edits_matches_parsing_the_new_text():
+    pieces = ["let", " ", "\n", ";", "x", "1", '"', "#", "(", ")", "{", "}", "fn"]
+    rng = random.Random(0)
+    program = parse_source(INCREMENTAL_SOURCE)
+    for _ in range(500):
+        text = program.source.text
+        offset = rng.randint(0, len(text))
+        removed = rng.randint(0, min(3, len(text) - offset))
+        inserted = "".join(rng.choices(pieces, k=rng.randint(0, 3)))
+        program = assert_reparse_matches(program, offset, removed, inserted)
+
+
+def test_reparsing_keeps_statements_the_edit_does_not_touch():
+    text = "let x = 1;\n" * 1000
+    program = parse_source(text)
+    offset = text.index("1", len(text) // 2)
+
+    updated = reparse(program, offset, 1, "200")
+
+    changed = [
+        idx for idx, (old, new) in enumerate(zip(program, updated)) if old is not new
+    ]
+    assert changed == [500]
+    assert updated[500].value.value == 200
+    assert updated.source.starts[-1] == program.source.starts[-1] + 2
+    name = updated[999].name.token
+    assert name.start == text.rindex("x")
+    assert updated.source.offset(999, name) == text.rindex("x") + 2
+
+
+def test_deeply_nested_input_parses_without_recursing():
+    depth = 10_000
+    tests = [
+        "(" * depth + "1" + ")" * depth,
+        "[" * depth + "]" * depth,
+        "f(" * depth + "1" + ")" * depth,
+        '{"a": ' * depth + "1" + "}" * depth,
+        "fn() { " * depth + "1" + " }" * depth,
+        "if (x) { " * depth + "1" + " }" * depth,
+    ]
+    for string in tests:
+        parser = Parser(Lexer(string))
+        program = parser.parse_program()
+        assert not parser.errors
+        assert len(program.statements) == 1
+
+    program = Parser(Lexer("-" * depth + "1 + 2")).parse_program()
+    expression = program.statements[0].expression
+    assert expression.operator == "+"
+    expression, count = expression.left, 0
+    while isinstance(expression, PrefixExpression):
+        expression, count = expression.right, count + 1
+    assert count == depth
+    assert expression.value == 1
+
+
+def test_long_chains_of_operators_group_to_the_left():
+    terms = 100_000
+    parser = Parser(Lexer(" + ".join(["1 * 2"] * terms)))
+    program = parser.parse_program()
+    assert not parser.errors
+
+    expression, count = program.statements[0].expression, 1
+    while expression.operator == "+":
+        assert is_infix_expression_valid(expression.right, 1, "*", 2)
+        expression, count = expression.left, count + 1
+    assert count == terms
+    assert is_infix_expression_valid(expression, 1, "*", 2)
+
+
 # -------helper functions-------
 def is_identifier_valid(expression: Identifier, value: str):
     assert isinstance(expression, Identifier)
@@ -0,0 +1,106 @@
+from writing_an_interpreter.ast import ExpressionStatement, LetStatement
+from writing_an_interpreter.environment import Environment, Frame
+from writing_an_interpreter.evaluator import apply_function, monkey_eval
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.objects import Error, Integer
+from writing_an_interpreter.parser import Parser
+from writing_an_interpreter.resolver import resolve
+
+
+def test_globals_have_no_address():
+    program = resolve(parse("let a = 1; a;"))
+
+    let, statement = program.statements
+    assert let.name.address is None
+    assert statement.expression.address is None
+
+
+def test_parameters_and_locals_get_slots():
+    program = resolve(parse("fn(a, b) { let c = a; c + b }"))
+
+    function = program.statements[0].expression
+    let, statement = function.body.statements
+    assert function.num_locals == 3
+    assert let.name.address == (0, 2)
+    assert let.value.address == (0, 0)
+    assert statement.expression.left.address == (0, 2)
+    assert statement.expression.right.address == (0, 1)
+
+
+def test_captured_names_count_scope_hops():
+    program = resolve(parse("fn(a) { fn(b) { fn() { a + b + c } } }"))
+
+    outer = program.statements[0].expression
+    middle = outer.body.statements[0].expression
+    inner = middle.body.statements[0].expression
+    expression = inner.body.statements[0].expression
+    assert expression.left.left.address == (2, 0)
+    assert expression.left.right.address == (1, 0)
+    assert expression.right.address is None
+
+
+def test_rebinding_reuses_the_slot():
+    program = resolve(parse("fn(x) { let x = x + 1; let x = x * 2; x }"))
+
+    function = program.statements[0].expression
+    first, second, _ = function.body.statements
+    assert function.num_locals == 1
+    assert first.name.address == (0, 0)
+    assert second.name.address == (0, 0)
+
+
+def test_let_value_sees_the_outer_binding():
+    program = resolve(parse("fn(x) { fn() { let x = x; x } }"))
+
+    outer = program.statements[0].expression
+    inner = outer.body.statements[0].expression
+    let = inner.body.statements[0]
+    assert isinstance(let, LetStatement)
+    assert let.value.address == (0, 0)
+    assert let.value.fallbacks == ((1, 0),)
+    assert let.name.address == (0, 0)
+
+
+def test_locals_get_slots_before_any_use():
+    program = resolve(parse("fn() { let g = fn() { h() }; let h = fn() { 4 }; g }"))
+
+    outer = program.statements[0].expression
+    let_g, let_h, _ = outer.body.statements
+    call = let_g.value.body.statements[0].expression
+    assert outer.num_locals == 2
+    assert call.function.address == (1, 1)
+    assert let_h.name.address == (0, 1)
+
+
+def test_functions_run_in_frames():
+    environment = Environment()
+    function = monkey_eval(parse("let f = fn(a) { fn() { a } }; f(3)"), environment)
+
+    assert isinstance(function.environment, Frame)
+    assert function.environment.slots == [Integer(3)]
+    assert function.environment.globals is environment
+    assert apply_function(function, []) == Integer(3)
+
+
+def test_unbound_slots_are_reported_by_name():
+    got = monkey_eval(parse("fn() { if (false) { let x = 1 }; x }()"), Environment())
+
+    assert isinstance(got, Error)
+    assert got.message == "identifier not found: x"
+
+
+def test_unresolved_functions_fall_back_to_names():
+    statement = parse("fn(a) { a * 2 }").statements[0]
+    assert isinstance(statement, ExpressionStatement)
+
+    function = monkey_eval(statement, Environment())
+    assert function.num_locals is None
+    assert apply_function(function, [Integer(4)]) == Integer(8)
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
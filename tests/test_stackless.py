@@ -0,0 +1,51 @@
+from writing_an_interpreter import stackless
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.objects import Error, Integer
+from writing_an_interpreter.parser import Parser
+
+
+def test_deep_recursion_does_not_use_the_python_stack():
+    string = """
+let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } };
+count(20000)
+"""
+    got = stackless.run(parse(string), Environment())
+    assert got == Integer(20000)
+
+
+def test_exceeding_max_depth_is_an_error():
+    string = """
+let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } };
+count(200)
+"""
+    got = stackless.run(parse(string), Environment(), max_depth=100)
+    assert isinstance(got, Error)
+    assert got.message == "maximum call depth exceeded: 100"
+
+
+def test_tail_calls_do_not_count_towards_max_depth():
+    string = """
+let count = fn(n, acc) { if (n == 0) { return acc }; return count(n - 1, acc + 1) };
+let loop = fn(n) { if (n == 0) { 0 } else { loop(n - 1) } };
+count(1000, 0) + loop(1000)
+"""
+    got = stackless.run(parse(string), Environment(), max_depth=10)
+    assert got == Integer(1000)
+
+
+def test_return_unwinds_pending_work():
+    string = """
+let f = fn(x) { if (x) { if (true) { return 10; }; 5 }; 3 };
+[f(true), f(false)]
+"""
+    got = stackless.run(parse(string), Environment())
+    assert got.inspect() == "[10, 3]"
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
@@ -0,0 +1,99 @@
+from writing_an_interpreter import transpiler
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.objects import Error, Integer, String
+from writing_an_interpreter.parser import Parser
+
+
+def test_functions_become_python_closures():
+    source, _ = transpiler.transpile(parse("let add = fn(x, y) { x + y };"))
+
+    assert "def _fn1(m_x, m_y, *_):" in source
+    assert "__store__['add'] = PythonFunction(" in source
+
+
+def test_pure_if_expressions_become_conditional_expressions():
+    source, _ = transpiler.transpile(parse("fn(x) { if (x) { 1 } else { 2 } }"))
+
+    assert "if __truthy__(m_x) else" in source
+    assert "\n        if " not in source
+
+
+def test_if_expressions_with_statements_become_blocks():
+    string = "let f = fn(x) { if (x > 1) { let y = x * 2; y } else { x } }; f(3)"
+    source, _ = transpiler.transpile(parse(string))
+
+    assert "        if " in source
+    assert transpiler.run(parse(string), Environment()) == Integer(6)
+
+
+def test_sibling_expressions_keep_evaluation_order():
+    string = """
+let x = 1;
+let f = fn() { let x = 10; x + if (true) { let x = 2; x } else { 0 } };
+f()
+"""
+    got = transpiler.run(parse(string), Environment())
+    assert got == Integer(12)
+
+
+def test_compiled_code_is_cached_per_source(monkeypatch):
+    monkeypatch.setattr(transpiler, "compiled_programs", {})
+    string = "let double = fn(x) { x * 2 }; double(21)"
+    calls = []
+    transpile = transpiler.transpile
+    monkeypatch.setattr(
+        transpiler,
+        "transpile",
+        lambda program: calls.append(program) or transpile(program),
+    )
+
+    for _ in range(3):
+        assert transpiler.run(parse(string), Environment()) == Integer(42)
+
+    assert len(calls) == 1
+
+
+def test_cache_tells_strings_from_identifiers(monkeypatch):
+    monkeypatch.setattr(transpiler, "compiled_programs", {})
+    environment = Environment()
+    environment["a"] = Integer(1)
+
+    assert str(parse('"a"')) == str(parse("a"))
+    assert transpiler.run(parse('"a"'), environment) == String("a")
+    assert transpiler.run(parse("a"), environment) == Integer(1)
+
+
+def test_debug_flag_dumps_generated_code(capsys, monkeypatch):
+    monkeypatch.setattr(transpiler, "DEBUG", True)
+    monkeypatch.setattr(transpiler, "compiled_programs", {})
+
+    transpiler.run(parse("1 + 2"), Environment())
+
+    assert "def __program__(__env__):" in capsys.readouterr().out
+
+
+def test_locals_shadowing_an_outer_binding_get_their_own_names():
+    string = "let f = fn(c, x) { fn() { if (c) { let x = 2; }; x } };"
+    source, _ = transpiler.transpile(parse(string))
+
+    assert "m_x1 = None" in source
+    assert "(m_x1 if m_x1 is not None else m_x)" in source
+    for call, want in [("f(false, 1)()", 1), ("f(true, 1)()", 2)]:
+        got = transpiler.run(parse(string + call), Environment())
+        assert got == Integer(want)
+
+
+def test_locals_read_before_assignment_are_errors():
+    got = transpiler.run(parse("fn() { let y = x; let x = 1; x }()"), Environment())
+
+    assert isinstance(got, Error)
+    assert got.message == "identifier not found: x"
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
@@ -0,0 +1,89 @@
+from writing_an_interpreter import unboxed
+from writing_an_interpreter.environment import Environment
+from writing_an_interpreter.lexer import Lexer
+from writing_an_interpreter.objects import (
+    NULL,
+    TRUE,
+    Array,
+    Error,
+    Hash,
+    Integer,
+    String,
+)
+from writing_an_interpreter.parser import Parser
+from writing_an_interpreter.vector import PersistentVector
+
+
+def test_globals_hold_native_values():
+    environment = Environment()
+    string = 'let n = 1 + 2; let s = "a" + "b"; let b = n > 2; let z = if (false) { 1 }'
+
+    got = unboxed.run(parse(string), environment)
+    assert got is None
+    assert environment.store == {"n": 3, "s": "ab", "b": True, "z": None}
+    assert type(environment["n"]) is int and type(environment["b"]) is bool
+
+
+def test_results_are_boxed_for_the_caller():
+    tests = [
+        ("1 + 2", Integer(3)),
+        ('"a"', String("a")),
+        ("1 < 2", TRUE),
+        ("if (false) { 1 }", NULL),
+        ("[1, [true, if (false) { 1 }]]", "[1, [True, null]]"),
+        ('{"a": 1, 2: [3]}', '{"a": 1, 2: [3]}'),
+        ("fn(x) { x }", "fn(x){\nx\n}"),
+    ]
+
+    for string, want in tests:
+        got = unboxed.run(parse(string), Environment())
+        match want:
+            case str():
+                assert got.inspect() == want
+            case _:
+                assert got == want
+
+
+def test_values_bound_from_python_are_unboxed():
+    environment = Environment()
+    environment["xs"] = Array([Integer(1), Integer(2)])
+    environment["h"] = Hash({"a": Integer(3)})
+
+    got = unboxed.run(parse('len(xs) + h["a"]'), environment)
+    assert got == Integer(5)
+    assert environment["xs"] == Array([Integer(1), Integer(2)])
+
+    got = unboxed.run(parse("let ys = push(xs, 3); ys"), environment)
+    assert got == Array([Integer(1), Integer(2), Integer(3)])
+    assert environment["ys"] == PersistentVector([1, 2, 3])
+
+
+def test_booleans_are_not_integers():
+    tests = [
+        ("1 == true", "type mismatch: INTEGER == BOOLEAN"),
+        ("true + 1", "type mismatch: BOOLEAN + INTEGER"),
+        ("-true", "unknown operator: -BOOLEAN"),
+    ]
+
+    for string, want in tests:
+        got = unboxed.run(parse(string), Environment())
+        assert isinstance(got, Error)
+        assert got.message == want
+
+    got = unboxed.run(parse('{1: "int", true: "bool"}[true]'), Environment())
+    assert got == String("bool")
+
+
+def test_box_and_unbox_round_trip():
+    values = [0, -7, "text", True, False, None, PersistentVector([1, "a", None])]
+
+    for value in values:
+        assert unboxed.unbox(unboxed.box(value)) == value
+
+
+# --------helper functions---------
+def parse(string: str):
+    parser = Parser(Lexer(string))
+    program = parser.parse_program()
+    assert not parser.errors
+    return program
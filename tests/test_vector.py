@@ -0,0 +1,89 @@
+import pytest
+
+from writing_an_interpreter.objects import Array, Integer, String
+from writing_an_interpreter.vector import PersistentVector, VectorSlice
+
+SIZES = [0, 1, 31, 32, 33, 64, 65, 1024, 1056, 1057, 33 * 32 + 1, 40_000]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_appending_matches_building_from_a_list(size):
+    vector = PersistentVector()
+    for idx in range(size):
+        vector = vector.append(idx)
+
+    built = PersistentVector(range(size))
+    assert vector == built
+    assert list(vector) == list(range(size))
+    assert len(vector) == size
+    assert all(vector[idx] == idx for idx in range(0, size, 7))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_append_leaves_the_original_unchanged(size):
+    vector = PersistentVector(range(size))
+    longer = vector.append("x").append("y")
+
+    assert len(vector) == size
+    assert list(vector) == list(range(size))
+    assert list(longer) == [*range(size), "x", "y"]
+
+
+def test_appended_vectors_share_leaves():
+    vector = PersistentVector(range(100))
+    longer = vector.append(100)
+
+    assert longer.root[0] is vector.root[0]
+
+
+def test_supports_negative_indexes_and_slices():
+    vector = PersistentVector(range(100))
+
+    assert vector[-1] == 99
+    assert vector[1:4] == [1, 2, 3]
+    assert isinstance(vector[1:], VectorSlice)
+    with pytest.raises(IndexError):
+        vector[100]
+
+
+def test_arrays_store_their_elements_in_a_vector():
+    array = Array(elements=[Integer(1), String("2")])
+
+    assert isinstance(array.elements, PersistentVector)
+    assert array == Array(elements=PersistentVector([Integer(1), String("2")]))
+    assert array.inspect() == '[1, "2"]'
+
+
+def test_slices_share_storage_with_their_vector():
+    vector = PersistentVector(range(100))
+
+    view = vector[1:][1:]
+    assert isinstance(view, VectorSlice)
+    assert view.vector is vector
+    assert (view.start, view.stop) == (2, 100)
+    assert view == list(range(2, 100))
+    assert view[-1] == 99 and view[0] == 2
+
+
+def test_small_slices_are_copied():
+    vector = PersistentVector(range(100))
+
+    assert isinstance(vector[10:20], PersistentVector)
+    assert vector[10:20] == list(range(10, 20))
+
+    view = vector
+    for _ in range(99):
+        view = view[1:]
+        assert isinstance(view, (PersistentVector, VectorSlice))
+    assert view == [99]
+    assert not isinstance(view, VectorSlice) or len(view.vector) <= 4
+
+
+def test_appending_to_a_slice_keeps_the_original():
+    vector = PersistentVector(range(10))
+
+    tail = vector[5:].append(10)
+    middle = vector[2:8].append(-1)
+    assert tail == [5, 6, 7, 8, 9, 10]
+    assert middle == [2, 3, 4, 5, 6, 7, -1]
+    assert vector == list(range(10))